@@ -1,13 +1,23 @@
 import streamlit as st
-import pandas as pd
 from components.veh_map import display_map
 from components.veh_data import display_vehicle_data
 from components.veh_metrics import display_vehicle_metrics
-from components.line_plot import display_multi_select_and_line_plot
+from components.line_plot import DEFAULT_COLUMNS, display_multi_select_and_line_plot
 from components.time_control import display_time_control
-from components.seg_plot import display_seg_plot
+from components.seg_plot import display_seg_plot, seg_frame
+from components.playback import display_playback_controls, schedule_next_frame
+from components.panels import panel
+from components.instrumentation import display_metrics_overlay, measure
+from data.catalog import session_stores
+from data.dataset import Dataset
+from data.live import FOLLOW_INTERVAL_S, LiveFeed
+from data.store import appended_to
+from data.watcher import StoreWatcher
+import contextlib
 import os
-import time
+
+# Seconds between each session's look at the shared watcher's version
+UPDATE_CHECK_S = 2
 
 # App information
 about_info = """
@@ -35,38 +45,304 @@ st.set_page_config(
 )
 
 
-# Load and cache vehicle driving dataset
-def load_data(file_path):
-    last_modified = os.path.getmtime(file_path)
-    df = pd.read_csv(file_path)
-    return df, last_modified
+@st.cache_resource
+def latest_datasets():
+    # Newest dataset loaded for each store, which the next version extends
+    # when rows were only appended
+    return {}
 
 
-def check_file_update(file_path, last_modified):
-    return os.path.getmtime(file_path) > last_modified
+# Load vehicle driving dataset from the memory-mapped columnar store, once per
+# store version for the whole process. Old versions are dropped once newer
+# ones have replaced them in every session.
+@st.cache_resource(max_entries=4)
+def shared_dataset(store_path, version):
+    latest = latest_datasets()
+    dataset = Dataset.from_store(store_path, previous=latest.get(store_path))
+    latest[store_path] = dataset
+    return dataset
 
 
-def main():
-    file_path = os.path.join(os.path.dirname(__file__), "data", "merged_cleaned.csv")
+@st.cache_resource
+def store_watcher(store_path):
+    # One watcher per store for the whole server process, shared by every
+    # session viewing it
+    return StoreWatcher(store_path)
 
-    if "df" not in st.session_state or "last_modified" not in st.session_state:
-        st.session_state.df, st.session_state.last_modified = load_data(file_path)
 
-    # Check for file updates
-    if check_file_update(file_path, st.session_state.last_modified):
-        st.cache_data.clear()
-        st.session_state.df, st.session_state.last_modified = load_data(file_path)
+@st.fragment(run_every=UPDATE_CHECK_S)
+def watch_for_updates(watcher):
+    # Only compares two counters, so idle sessions cost no disk access
+    if watcher.version != st.session_state.data_version:
         st.rerun()
 
-    df = st.session_state.df
+
+@st.cache_resource
+def live_feed():
+    # The live ring buffer, attached once per server process. Raises
+    # FileNotFoundError (and is retried on the next run) while no ingest
+    # service is running.
+    return LiveFeed()
+
+
+def live_available():
+    try:
+        live_feed()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+@st.fragment(run_every=FOLLOW_INTERVAL_S)
+def follow_live_updates(feed, manifest):
+    # Rerun when rows newer than the shown snapshot have been published
+    if (
+        feed.ring.count != manifest["first"] + manifest["rows"]
+        or feed.ring.generation != manifest["generation"]
+    ):
+        st.rerun()
+
+
+def live_dataset(feed):
+    # Following: the feed's latest shared snapshot. Paused: the snapshot that
+    # was shown when following stopped, so the view holds still while the
+    # ring keeps filling.
+    if st.session_state.follow_live or "live_dataset" not in st.session_state:
+        st.session_state.live_dataset = feed.dataset()
+    return st.session_state.live_dataset
+
+
+def reset_session_view():
+    # Forget the dataset and the per-dataset view state of the previous session
+    for key in (
+        "data_version",
+        "manifest",
+        "line_plot_agg",
+        "seg_plot_agg",
+        "line_plot_fig",
+        "current_time_index",
+        "scrubber_sent",
+        "playing",
+        "playback_clock",
+        "live_dataset",
+    ):
+        st.session_state.pop(key, None)
+
+
+# Dashboard panels. Each reruns on its own when one of its declared inputs
+# changes (a seek reruns every time-dependent panel, a map style change only
+# the map), and receives just the rows it draws.
+@panel("vehicle_data", inputs=("current_time_index",))
+def vehicle_data_panel(df, current_time_index):
+    display_vehicle_data(df.iloc[current_time_index])
+
+
+@panel("map", inputs=("current_time_index", "map_style"))
+def map_panel(dataset, current_time_index, map_style):
+    # Set CSS to ensure proper iframe sizing for the map
+    st.markdown(
+        """
+    <style>
+    iframe {
+        width: 100% !important;
+        height: 420px !important;
+    }
+    </style>
+    """,
+        unsafe_allow_html=True,
+    )
+
+    # Function to update map style
+    def update_map_style():
+        st.session_state.map_style = st.session_state.map_style_selector
+
+    # Add the selectbox for map style
+    st.selectbox(
+        "Select Map Style",
+        options=["Default", "Streets", "Satellite", "Terrain", "Dark"],
+        index=["Default", "Streets", "Satellite", "Terrain", "Dark"].index(map_style),
+        key="map_style_selector",
+        on_change=update_map_style,
+    )
+
+    display_map(dataset, current_time_index, map_style=map_style)
+
+
+@panel("vehicle_metrics", inputs=("current_time_index",))
+def vehicle_metrics_panel(df, current_time_index):
+    display_vehicle_metrics(
+        df.iloc[current_time_index], df.iloc[max(0, current_time_index - 1)]
+    )
+
+
+@panel("seg_plot", inputs=("current_time_index", "selected_time_range_seconds"))
+def seg_plot_panel(dataset, current_time_index, selected_time_range_seconds):
+    display_seg_plot(
+        seg_frame(dataset),
+        dataset.time_index,
+        current_time_index,
+        selected_time_range_seconds,
+    )
+
+
+@panel(
+    "time_control",
+    inputs=(
+        "current_time_index",
+        "playing",
+        "line_plot_columns",
+        "selected_time_range_seconds",
+    ),
+)
+def time_control_panel(
+    df,
+    time_index,
+    live_manifest,
+    current_time_index,
+    playing,
+    line_plot_columns,
+    selected_time_range_seconds,
+):
+    display_time_control(
+        df,
+        time_index,
+        line_plot_columns or DEFAULT_COLUMNS,
+        selected_time_range_seconds,
+        live_manifest,
+    )
+    if live_manifest is None:
+        display_playback_controls()
+
+
+@panel(
+    "line_plot",
+    inputs=("current_time_index", "selected_time_range_seconds", "line_plot_columns"),
+)
+def line_plot_panel(
+    df,
+    time_index,
+    store_path,
+    current_time_index,
+    selected_time_range_seconds,
+    line_plot_columns,
+):
+    display_multi_select_and_line_plot(df, time_index, current_time_index, store_path)
+
+
+# Drawn last: shows the render metrics when asked for and, while playing,
+# schedules the next frame once the other panels are done
+@panel("playback", inputs=("current_time_index", "playing", "show_metrics"))
+def playback_panel(time_index, current_time_index, playing, show_metrics):
+    if show_metrics:
+        display_metrics_overlay()
+    schedule_next_frame(time_index)
+
+
+def select_session():
+    # Sessions come from the batch catalog; the default store is always listed
+    # and "Live" while an ingest service is publishing. Live has no store path.
+    data_dir = os.path.join(os.path.dirname(__file__), "data")
+    stores = {}
+    if os.path.exists(os.path.join(data_dir, "merged_cleaned")):
+        stores["Default"] = os.path.join(data_dir, "merged_cleaned")
+    if live_available():
+        stores["Live"] = None
+    stores.update(session_stores(os.path.join(data_dir, "sessions")))
+
+    if len(stores) > 1:
+        session_id = st.sidebar.selectbox(
+            "Session", list(stores), key="session_id", on_change=reset_session_view
+        )
+    else:
+        session_id = next(iter(stores), "Default")
+    if session_id not in stores:
+        return os.path.join(data_dir, "merged_cleaned")
+    return stores[session_id]
+
+
+def main():
+    file_path = select_session()
+    st.sidebar.toggle(
+        "Render metrics",
+        value=st.query_params.get("debug") == "1",
+        key="show_metrics",
+    )
+
+    # The dataset is shared by all sessions; a session keeps only the version
+    # it shows, its cursor and its view settings. The version is read once,
+    # so a change made meanwhile shows up as a newer version on the next check.
+    if file_path is None:
+        feed = live_feed()
+        following = st.sidebar.toggle("Follow live", value=True, key="follow_live")
+        with measure("live_snapshot"):
+            dataset = live_dataset(feed)
+        manifest = dataset.manifest
+        version = (manifest["generation"], manifest["first"], manifest["rows"])
+        if len(dataset) == 0:
+            st.info("Waiting for the live feed to publish its first rows…")
+            follow_live_updates(feed, dataset.manifest)
+            return
+    else:
+        watcher = store_watcher(file_path)
+        version = watcher.version
+        # Timed only when this session moves to a version; otherwise the
+        # dataset is a cache hit
+        shown = st.session_state.get("data_version")
+        with (
+            measure("reload" if shown is not None else "load")
+            if shown != version
+            else contextlib.nullcontext()
+        ):
+            dataset = shared_dataset(file_path, version)
+
+    if st.session_state.get("data_version") != version:
+        previous = st.session_state.get("manifest")
+        st.session_state.data_version = version
+        st.session_state.manifest = dataset.manifest
+
+        # Rows appended to the same store: the new version's columns extend
+        # the old ones and per-session caches for seen rows stay valid. A
+        # rewritten store, or a ring buffer that dropped its oldest rows,
+        # invalidates them.
+        if previous is not None and not appended_to(dataset.manifest, previous):
+            for key in (
+                "line_plot_agg",
+                "seg_plot_agg",
+                "scrubber_sent",
+            ):
+                st.session_state.pop(key, None)
+            # A full ring drops rows on every refresh; rebuild in this run
+            # instead of running twice
+            if file_path is not None:
+                st.rerun()
+
+    df = dataset.df
+    time_index = dataset.time_index
+
+    if len(dataset) == 0:
+        # A store created ahead of its first rows (e.g. by a follow ingest)
+        st.info("This session has no rows yet; they appear here once written.")
+        watch_for_updates(watcher)
+        return
 
     # Initialize session state variables if they don't exist
     if "current_time_index" not in st.session_state:
         st.session_state.current_time_index = 0
+    st.session_state.current_time_index = max(
+        0, min(st.session_state.current_time_index, len(dataset) - 1)
+    )
+    live_manifest = None
+    if file_path is None and following:
+        # Follow live: stay on the newest row; playback does not apply
+        st.session_state.current_time_index = len(dataset) - 1
+        st.session_state.playing = False
+        live_manifest = dataset.manifest
     if "playing" not in st.session_state:
         st.session_state.playing = False
     if "map_style" not in st.session_state:
         st.session_state.map_style = "Default"
+    if "selected_time_range_seconds" not in st.session_state:
+        st.session_state.selected_time_range_seconds = 30
 
     # Display the dashboard title
     st.markdown(
@@ -83,65 +359,29 @@ def main():
         st.markdown(
             "<h3 style='text-align: center;'>Vehicle Data</h3>", unsafe_allow_html=True
         )
-        display_vehicle_data(df, st.session_state.current_time_index)
+        vehicle_data_panel(df)
 
     # Top-right section: Map and Map Style Selector
     with row1_cols[1]:
-        # Set CSS to ensure proper iframe sizing for the map
-        st.markdown(
-            """
-        <style>
-        iframe {
-            width: 100% !important;
-            height: 420px !important;
-        }
-        </style>
-        """,
-            unsafe_allow_html=True,
-        )
-
-        # Function to update map style
-        def update_map_style():
-            st.session_state.map_style = st.session_state.map_style_selector
-
-        # Add the selectbox for map style
-        st.selectbox(
-            "Select Map Style",
-            options=["Default", "Streets", "Satellite", "Terrain", "Dark"],
-            index=["Default", "Streets", "Satellite", "Terrain", "Dark"].index(
-                st.session_state.map_style
-            ),
-            key="map_style_selector",
-            on_change=update_map_style,
-        )
-
-        # Display the map directly in the top-right panel
-        if "current_time_index" in st.session_state:
-            display_map(
-                df,
-                st.session_state.current_time_index,
-                map_style=st.session_state.map_style,
-            )
+        map_panel(dataset)
 
     # Bottom-left section: Vehicle Metrics and Segment Plot
     with row2_cols[0]:
-        display_vehicle_metrics(df, st.session_state.current_time_index)
-        display_seg_plot(df, st.session_state.current_time_index)
+        vehicle_metrics_panel(df)
+        seg_plot_panel(dataset)
 
     # Bottom-right section: Time Control and Multi-select Line Plot
     with row2_cols[1]:
-        if "current_time_index" in st.session_state:
-            display_time_control(df)
+        time_control_panel(df, time_index, live_manifest)
+        line_plot_panel(df, time_index, file_path)
 
-        display_multi_select_and_line_plot(df, st.session_state.current_time_index)
+    playback_panel(time_index)
+    if file_path is None:
+        if following:
+            follow_live_updates(feed, dataset.manifest)
+    else:
+        watch_for_updates(watcher)
 
 
 if __name__ == "__main__":
     main()
-    while True:
-        time.sleep(3)
-        if check_file_update(
-            os.path.join(os.path.dirname(__file__), "data", "merged_cleaned.csv"),
-            st.session_state.last_modified,
-        ):
-            st.rerun()
@@ -0,0 +1,78 @@
+import argparse
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from data.gps_time import epoch_ns_to_timestamp_int, parse_gps_time
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+
+
+# Per-row conversion as it was done in data_cleaning.py before vectorization
+def legacy_gps_time_to_est(gps_time):
+    if isinstance(gps_time, str):
+        try:
+            week_number, tow = map(float, gps_time.split(":"))
+            gps_epoch = datetime(1980, 1, 6, tzinfo=pytz.utc)
+            gps_time_utc = gps_epoch + timedelta(weeks=week_number, seconds=tow)
+            gps_time_utc -= timedelta(seconds=18)  # Adjust for leap seconds
+            est = pytz.timezone("US/Eastern")
+            est_time = gps_time_utc.astimezone(est)  # Convert to EST/EDT
+            return est_time
+        except ValueError as e:
+            logger.error(f"Error converting GPS time '{gps_time}': {e}")
+
+
+def legacy_convert(gps_time):
+    converted = gps_time.astype(str).apply(legacy_gps_time_to_est)
+    return converted.dt.strftime("%Y%m%d%H%M%S")
+
+
+def vectorized_convert(gps_time):
+    return epoch_ns_to_timestamp_int(parse_gps_time(gps_time))
+
+
+def best_of(func, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GPS time conversion")
+    parser.add_argument("--input", default=os.path.join(DATA_DIR, "rover_09_04_24.csv"))
+    parser.add_argument("--scale", type=int, default=10, help="Repeat the log N times")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    gps_time = pd.read_csv(args.input, usecols=["GPS time"])["GPS time"]
+    gps_time = pd.concat([gps_time] * args.scale, ignore_index=True)
+
+    legacy_s, legacy = best_of(legacy_convert, gps_time, args.repeat)
+    vector_s, vector = best_of(vectorized_convert, gps_time, args.repeat)
+
+    # Both paths must agree on the second-resolution timestamps
+    legacy_int = pd.to_numeric(legacy, errors="coerce").to_numpy()
+    vector_int = vector.to_numpy(dtype=np.float64, na_value=np.nan)
+    matches = np.array_equal(legacy_int, vector_int, equal_nan=True)
+
+    rows = len(gps_time)
+    print(f"rows:       {rows}")
+    print(f"apply:      {legacy_s:.3f} s ({rows / legacy_s:,.0f} rows/s)")
+    print(f"vectorized: {vector_s:.3f} s ({rows / vector_s:,.0f} rows/s)")
+    print(f"speedup:    {legacy_s / vector_s:.1f}x")
+    print(f"identical:  {matches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from data.align import align_streams
+from data.data_cleaning import DATA_DIR, clean_frame
+from data.schema import build_dataset, memory_usage_mb
+
+
+# In-memory frame as the dashboard held it before the compact schema: zero
+# sentinels, float64 channels, the local "GPS time" integer, plus the columns
+# the line and segmentation plots used to add to the shared frame
+def legacy_frame(merged):
+    df = merged.fillna(0)
+    df["beta"] = df["relPosHeading"] - df["CoG_rover"]
+    df = df.astype({c: np.float64 for c in df.columns if c != "GPS time"})
+    df["datetime"] = pd.to_datetime(df["GPS time"], format="%Y%m%d%H%M%S")
+    df["rover_spd"] = np.sqrt(
+        df["VX_rover"] ** 2 + df["VY_rover"] ** 2 + df["VZ_rover"] ** 2
+    )
+    df["base_spd"] = np.sqrt(
+        df["VX_base"] ** 2 + df["VY_base"] ** 2 + df["VZ_base"] ** 2
+    )
+    for name, speed, angle in (
+        ("vel_cg", "rover_spd", "CoG_rover"),
+        ("chassis_psi", "rover_spd", "relPosHeading"),
+        ("vel_rear", "base_spd", "CoG_base"),
+    ):
+        df[f"{name}_X"] = df[speed] * np.sin(np.radians(df[angle]))
+        df[f"{name}_Y"] = df[speed] * np.cos(np.radians(df[angle]))
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dataset memory footprint")
+    parser.add_argument("--base", default=os.path.join(DATA_DIR, "base_09_04_24.csv"))
+    parser.add_argument("--rover", default=os.path.join(DATA_DIR, "rover_09_04_24.csv"))
+    parser.add_argument("--scale", type=int, default=10, help="Repeat the log N times")
+    args = parser.parse_args()
+
+    base = clean_frame(pd.read_csv(args.base))
+    rover = clean_frame(pd.read_csv(args.rover))
+    merged = align_streams(base, rover)
+    merged = pd.concat([merged] * args.scale, ignore_index=True)
+
+    legacy_mb = memory_usage_mb(legacy_frame(merged))
+    compact = build_dataset(merged)
+    compact_mb = memory_usage_mb(compact)
+
+    rows = len(merged)
+    print(f"rows:      {rows}")
+    print(f"legacy:    {legacy_mb:.1f} MB ({legacy_mb * 2**20 / rows:.0f} B/row)")
+    print(f"compact:   {compact_mb:.1f} MB ({compact_mb * 2**20 / rows:.0f} B/row)")
+    print(f"reduction: {legacy_mb / compact_mb:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import os
+import time
+
+import plotly.graph_objects as go
+
+from components.seg_plot import ARROW_SECONDS, SEG_COLUMNS, build_seg_figure, seg_frame
+from data.data_cleaning import DATA_DIR
+from data.dataset import Dataset
+from data.gps_time import NS_PER_SECOND
+
+
+# One trace per arrow, as create_seg_plot built the figure before batching
+def legacy_arrow(x, y, u, v, color, name, opacity=1, showlegend=True):
+    return go.Scatter(
+        x=[x, x + u],
+        y=[y, y + v],
+        mode="lines+markers",
+        line={"color": color, "width": 2},
+        marker={"size": [0, 8], "symbol": ["circle", "arrow-wide"], "color": color},
+        name=name,
+        showlegend=showlegend,
+        opacity=opacity,
+    )
+
+
+def legacy_figure(grouped_data):
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatter(
+            x=grouped_data["east_base"],
+            y=grouped_data["north_base"],
+            mode="lines",
+            name="Traveled Path",
+        )
+    )
+    for i, (_, row) in enumerate(grouped_data.iterrows()):
+        for prefix, color, name in (
+            ("vel_cg", "red", "Rover Velocity"),
+            ("chassis_psi", "green", "Chassis Orientation"),
+            ("vel_rear", "orange", "Base Velocity"),
+        ):
+            fig.add_trace(
+                legacy_arrow(
+                    row["east_base"],
+                    row["north_base"],
+                    row[f"{prefix}_X"] * ARROW_SECONDS,
+                    row[f"{prefix}_Y"] * ARROW_SECONDS,
+                    color,
+                    name,
+                    opacity=0.7,
+                    showlegend=i == 0,
+                )
+            )
+    return fig
+
+
+def measure(build, grouped_data):
+    start = time.perf_counter()
+    fig = build(grouped_data)
+    built = time.perf_counter()
+    payload = fig.to_json()
+    done = time.perf_counter()
+    return built - start, done - built, len(payload), len(fig.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark segmentation plot build")
+    parser.add_argument("--store", default=os.path.join(DATA_DIR, "merged_cleaned"))
+    parser.add_argument("--window-s", type=int, default=3600)
+    args = parser.parse_args()
+
+    dataset = Dataset.from_store(args.store)
+    time_index = dataset.time_index
+    rows = time_index.window(len(time_index) - 1, args.window_s)
+    grouped_data = (
+        seg_frame(dataset)
+        .iloc[rows][SEG_COLUMNS]
+        # Indexed by bucket start in epoch ns, as WindowAggregator.means()
+        .groupby(time_index.epoch_ns[rows] // NS_PER_SECOND * NS_PER_SECOND)
+        .mean()
+    )
+
+    print(f"window:  {args.window_s} s ({len(grouped_data)} one-second buckets)")
+    for label, build in (
+        ("legacy", legacy_figure),
+        ("batched", lambda g: build_seg_figure(g, args.window_s)),
+    ):
+        build_s, json_s, size, traces = measure(build, grouped_data)
+        print(
+            f"{label + ':':8} build {build_s:.3f} s, to_json {json_s:.3f} s, "
+            f"{size / 2**20:.2f} MB, {traces} traces"
+        )
+
+
+if __name__ == "__main__":
+    main()
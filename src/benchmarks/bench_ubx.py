@@ -0,0 +1,68 @@
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.data_cleaning import DATA_DIR, clean_frame
+from data.ubx import from_clean_frame, read_messages, to_clean_frame
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the UBX log parser")
+    parser.add_argument("--input", default=os.path.join(DATA_DIR, "rover_09_04_24.csv"))
+    parser.add_argument("--scale", type=int, default=10, help="Repeat the log N times")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # The same samples as a CSV export and as the receiver's UBX log
+    raw = pd.read_csv(args.input)
+    raw = pd.concat([raw] * args.scale, ignore_index=True)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "log.csv")
+        ubx_path = os.path.join(tmp, "log.ubx")
+        raw.to_csv(csv_path, index=False)
+        Path(ubx_path).write_bytes(from_clean_frame(clean_frame(raw)))
+
+        csv_s, from_csv = best_of(
+            lambda: clean_frame(pd.read_csv(csv_path)), args.repeat
+        )
+        scan_s, (messages, stats) = best_of(
+            lambda: read_messages(ubx_path), args.repeat
+        )
+        frame_s, from_ubx = best_of(lambda: to_clean_frame(messages), args.repeat)
+
+    # Both paths must agree on time and on the channels to the log's resolution
+    from_csv = from_csv.reset_index(drop=True)
+    same_time = np.array_equal(from_csv["epoch_ns"], from_ubx["epoch_ns"])
+    worst = max(
+        float(np.nanmax(np.abs(from_csv[c].to_numpy() - from_ubx[c].to_numpy())))
+        for c in ("CoG", "VX", "VY", "VZ")
+    )
+
+    rows = len(from_csv)
+    ubx_s = scan_s + frame_s
+    print(f"rows:       {rows}")
+    print(f"messages:   {stats['frames']} ({stats['bytes'] / 2**20:.1f} MB)")
+    print(f"csv:        {csv_s:.3f} s ({rows / csv_s:,.0f} rows/s)")
+    print(f"ubx scan:   {scan_s:.3f} s ({stats['frames'] / scan_s:,.0f} messages/s)")
+    print(f"ubx total:  {ubx_s:.3f} s ({rows / ubx_s:,.0f} rows/s)")
+    print(f"speedup:    {csv_s / ubx_s:.1f}x")
+    print(f"same time:  {same_time}")
+    print(f"max diff:   {worst:.4f}")
+
+
+if __name__ == "__main__":
+    main()
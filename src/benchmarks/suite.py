@@ -0,0 +1,294 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import streamlit as st
+
+from benchmarks.synthetic import SYNTHETIC_DIR, generate
+from components.line_plot import DEFAULT_COLUMNS, create_initial_plot, update_plot
+from components.seg_plot import create_seg_plot, seg_frame
+from components.veh_data import speedometer_figure
+from components.veh_map import base_map, map_path
+from components.veh_metrics import make_donut
+from data.data_cleaning import clean_and_convert_gps_time, full_join_and_mutate
+from data.dataset import Dataset
+
+logger = logging.getLogger(__name__)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_FORMAT = 1
+# A case regresses when it is this much slower than its baseline, and by more
+# than the noise floor
+TOLERANCE = 0.3
+NOISE_FLOOR_S = 0.005
+# Seconds of data shown by the windowed plots, as on the dashboard
+WINDOW_S = 30
+
+
+def best_of(func, repeat, setup=None, warmup=1):
+    # Fastest of `repeat` runs after `warmup` untimed ones (imports, page cache,
+    # first-call caches); setup() runs untimed before each run
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def forget(*keys):
+    # Panels keep incremental state in the session; drop it so a case is timed
+    # from scratch
+    def reset():
+        for key in keys:
+            st.session_state.pop(key, None)
+
+    return reset
+
+
+def run_scale(scale, repeat, root, work_dir):
+    # Time every case on logs `scale` times the sample size; returns
+    # {case: {"seconds": ..., ...}}
+    base_raw, rover_raw = generate(scale, root)["csv"]
+    base_clean = os.path.join(work_dir, "base_cleaned.csv")
+    rover_clean = os.path.join(work_dir, "rover_cleaned.csv")
+    store = os.path.join(work_dir, "merged_cleaned")
+    results = {}
+
+    def case(name, func, setup=None, **extra):
+        seconds = best_of(func, repeat, setup)
+        results[name] = {"seconds": seconds, **extra}
+        logger.info("%5dx %-22s %9.4f s", scale, name, seconds)
+
+    # Cleaning and merging overwrite their outputs on every run
+    case(
+        "clean_base",
+        lambda: clean_and_convert_gps_time(base_raw, base_clean),
+        bytes=os.path.getsize(base_raw),
+    )
+    case(
+        "clean_rover",
+        lambda: clean_and_convert_gps_time(rover_raw, rover_clean),
+        bytes=os.path.getsize(rover_raw),
+    )
+    case(
+        "full_join_and_mutate",
+        lambda: full_join_and_mutate(base_clean, rover_clean, store),
+    )
+
+    # What app.load_data did before the shared store: open one version
+    case("load_data", lambda: Dataset.from_store(store))
+    dataset = Dataset.from_store(store)
+    df, time_index = dataset.df, dataset.time_index
+    last = len(time_index) - 1
+    results["load_data"]["rows"] = len(df)
+
+    # Panel figures at the end of the session
+    case(
+        "line_plot_initial",
+        lambda: create_initial_plot(
+            df, time_index, DEFAULT_COLUMNS, last, WINDOW_S, store
+        ),
+        setup=forget("line_plot_agg"),
+    )
+    case(
+        "line_plot_initial_all",
+        lambda: create_initial_plot(df, time_index, DEFAULT_COLUMNS, last, None, store),
+    )
+    fig = create_initial_plot(df, time_index, DEFAULT_COLUMNS, last, WINDOW_S, store)
+    step = time_index.seek(last, -1)
+    case(
+        "line_plot_update",
+        lambda: update_plot(fig, df, time_index, DEFAULT_COLUMNS, last, WINDOW_S),
+        # Steady playback: the window moves by one second between frames
+        setup=lambda: update_plot(fig, df, time_index, DEFAULT_COLUMNS, step, WINDOW_S),
+    )
+    case(
+        "create_seg_plot",
+        lambda: create_seg_plot(seg_frame(dataset), time_index, last, WINDOW_S),
+        setup=forget("seg_plot_agg"),
+    )
+    case(
+        "map_path",
+        lambda: map_path(dataset),
+    )
+    path = map_path(dataset)
+    case(
+        "map_construction",
+        lambda: base_map(path, "Default").get_root().render(),
+    )
+    row = df.iloc[last]
+    case(
+        "make_donut",
+        lambda: make_donut(
+            float(np.nan_to_num(row["CoG_rover"])), "Rover CoG (°)", "red"
+        ).to_dict(),
+    )
+    case(
+        "speedometer",
+        lambda: speedometer_figure(float(np.nan_to_num(row["speed_mph"]))).to_json(),
+    )
+    return results
+
+
+def run(scales, repeat=3, root=SYNTHETIC_DIR):
+    results = {}
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as work_dir:
+            results[str(scale)] = run_scale(scale, repeat, root, work_dir)
+    return {
+        "format": RESULTS_FORMAT,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance=TOLERANCE, noise_floor=NOISE_FLOOR_S):
+    # (scale, case, baseline s, current s, ratio, regressed) for every case
+    # measured in both runs
+    rows = []
+    for scale, cases in current["results"].items():
+        for name, result in cases.items():
+            reference = baseline["results"].get(scale, {}).get(name)
+            if reference is None:
+                continue
+            before, after = reference["seconds"], result["seconds"]
+            ratio = after / before if before > 0 else float("inf")
+            regressed = ratio > 1 + tolerance and after - before > noise_floor
+            rows.append((scale, name, before, after, ratio, regressed))
+    return rows
+
+
+def machine_changes(current, baseline):
+    # Fields of the machine description that differ from the baseline's
+    before = baseline.get("machine", {})
+    return {
+        key: (before.get(key), value)
+        for key, value in current["machine"].items()
+        if before.get(key) != value
+    }
+
+
+def report(rows):
+    print(f"{'scale':>6} {'case':<22} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for scale, name, before, after, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(
+            f"{scale + 'x':>6} {name:<22} {before:>9.4f}s {after:>9.4f}s "
+            f"{ratio:>6.2f}x{flag}"
+        )
+
+
+def merge_baseline(path, current):
+    # Keep the baseline's other scales when only some were re-measured
+    try:
+        with open(path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        baseline["results"].update(current["results"])
+        baseline.update({k: v for k, v in current.items() if k != "results"})
+    except FileNotFoundError:
+        baseline = current
+    return baseline
+
+
+def write_json(data, path):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the ingest stages and panel builders on synthetic sessions"
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        nargs="+",
+        default=[1, 10],
+        help="Session sizes relative to the sample (1 10 100 1000)",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-dir", default=SYNTHETIC_DIR)
+    parser.add_argument("--out", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Store these results as the new baseline instead of comparing",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Panels run outside `streamlit run` here; its bare-mode warnings are noise
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+    current = run(args.scale, args.repeat, args.data_dir)
+    if args.out:
+        write_json(current, args.out)
+
+    if args.update_baseline:
+        write_json(merge_baseline(args.baseline, current), args.baseline)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+        return 1
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, args.tolerance)
+    report(rows)
+    regressions = [row for row in rows if row[-1]]
+    changes = machine_changes(current, baseline)
+    if changes:
+        # Timings from another machine may differ for that reason alone; say
+        # so next to the result, which still gates
+        print(file=sys.stderr)
+        for key, (before, after) in changes.items():
+            print(
+                f"Machine {key}: {before} in the baseline, {after} now", file=sys.stderr
+            )
+        print(
+            "The baseline was measured on another machine; if that explains a "
+            "regression, re-measure the baseline here with --update-baseline",
+            file=sys.stderr,
+        )
+    if regressions:
+        print(
+            f"\n{len(regressions)} case(s) more than {args.tolerance:.0%} slower "
+            "than the baseline",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
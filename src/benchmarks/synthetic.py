@@ -0,0 +1,138 @@
+import argparse
+import logging
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.data_cleaning import DATA_DIR, clean_frame
+from data.gps_time import SECONDS_PER_WEEK, split_gps_time
+from data.ubx import from_clean_frame
+
+logger = logging.getLogger(__name__)
+
+SAMPLE = "09_04_24"
+# Outside DATA_DIR, so data.batch does not take the logs for recorded sessions
+SYNTHETIC_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), ".cache", "synthetic"
+)
+# Pause between consecutive copies of the drive, as between two runs
+GAP_S = 60
+
+
+def load_sample(data_dir=DATA_DIR, session=SAMPLE):
+    # Header, data lines split after "Index,GPS time," and the (week, TOW in
+    # ms) of every line, for both receivers
+    sample = {}
+    for role in ("base", "rover"):
+        path = os.path.join(data_dir, f"{role}_{session}.csv")
+        header, *lines = Path(path).read_bytes().splitlines(keepends=True)
+        week, tow = split_gps_time(
+            pd.read_csv(path, usecols=["GPS time"], dtype=str)["GPS time"]
+        )
+        sample[role] = {
+            "path": path,
+            "header": header,
+            "rest": [line.split(b",", 2)[2] for line in lines],
+            "week": week,
+            "tow_ms": np.rint(tow * 1000),
+        }
+    return sample
+
+
+def repeat_offset_ms(sample):
+    # Time shift between copies: the span of both logs plus a gap, whole seconds
+    start = min(
+        np.nanmin(s["week"] * SECONDS_PER_WEEK * 1000 + s["tow_ms"])
+        for s in sample.values()
+    )
+    end = max(
+        np.nanmax(s["week"] * SECONDS_PER_WEEK * 1000 + s["tow_ms"])
+        for s in sample.values()
+    )
+    return int(-(-(end - start) // 1000) + GAP_S) * 1000
+
+
+def write_csv(stream, path, scale, offset_ms):
+    # The recorded log repeated `scale` times back to back, with times shifted
+    # by offset_ms per copy and a running Index; the Index 0 placeholder row
+    # only opens the file, as in a real export
+    gps_ms = stream["week"] * SECONDS_PER_WEEK * 1000 + stream["tow_ms"]
+    timed = np.isfinite(gps_ms)
+    first = int(np.argmax(timed))
+    index = 0
+    with open(path, "wb") as f:
+        f.write(stream["header"])
+        for copy in range(scale):
+            shifted = np.where(timed, gps_ms + copy * offset_ms, 0).astype(np.int64)
+            week, tow_ms = np.divmod(shifted, SECONDS_PER_WEEK * 1000)
+            seconds, millis = np.divmod(tow_ms, 1000)
+            lines = []
+            for i in range(0 if copy == 0 else first, len(shifted)):
+                if timed[i]:
+                    stamp = b"%d:%d.%03d" % (week[i], seconds[i], millis[i])
+                else:
+                    stamp = b""
+                lines.append(b"%d,%s,%s" % (index, stamp, stream["rest"][i]))
+                index += 1
+            f.write(b"".join(lines))
+
+
+def write_ubx(csv_path, path):
+    # The same samples as the receiver's UBX log, in bounded memory
+    with open(path, "wb") as f:
+        f.writelines(
+            from_clean_frame(clean_frame(chunk))
+            for chunk in pd.read_csv(csv_path, chunksize=500_000)
+        )
+
+
+def generate(scale, root=SYNTHETIC_DIR, formats=("csv",), data_dir=DATA_DIR):
+    # Base/rover logs `scale` times the size of the sample session, in
+    # root/<scale>x. Files are kept and reused on later runs; returns
+    # {format: (base, rover)}.
+    out_dir = os.path.join(root, f"{scale}x")
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {
+        fmt: tuple(
+            os.path.join(out_dir, f"{role}_synthetic.{fmt}")
+            for role in ("base", "rover")
+        )
+        for fmt in formats
+    }
+    csv_paths = tuple(
+        os.path.join(out_dir, f"{role}_synthetic.csv") for role in ("base", "rover")
+    )
+    if not all(os.path.exists(p) for p in csv_paths):
+        start = time.perf_counter()
+        sample = load_sample(data_dir)
+        offset_ms = repeat_offset_ms(sample)
+        for role, path in zip(("base", "rover"), csv_paths, strict=True):
+            write_csv(sample[role], path + ".tmp", scale, offset_ms)
+            os.replace(path + ".tmp", path)
+        logger.info("Generated %dx logs in %.1f s", scale, time.perf_counter() - start)
+    if "ubx" in formats:
+        for csv_path, path in zip(csv_paths, paths["ubx"], strict=True):
+            if not os.path.exists(path):
+                write_ubx(csv_path, path + ".tmp")
+                os.replace(path + ".tmp", path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate large base/rover logs from the sample session"
+    )
+    parser.add_argument("--scale", type=int, nargs="+", default=[1, 10])
+    parser.add_argument("--out", default=SYNTHETIC_DIR)
+    parser.add_argument("--ubx", action="store_true", help="Also write UBX logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for scale in args.scale:
+        formats = ("csv", "ubx") if args.ubx else ("csv",)
+        for files in generate(scale, args.out, formats).values():
+            for path in files:
+                logger.info("%s (%.1f MB)", path, os.path.getsize(path) / 2**20)
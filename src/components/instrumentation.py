@@ -0,0 +1,194 @@
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Append-only JSON lines file for the measurements of every session; off
+# unless set
+METRICS_FILE = os.environ.get("SIDE_SLIPPER_METRICS")
+# Recent runs per section the rolling percentiles are taken over
+ROLLING_SAMPLES = 200
+PERCENTILES = (50, 95, 99)
+
+
+def percentiles(samples):
+    return dict(
+        zip(
+            (f"p{q}" for q in PERCENTILES),
+            np.percentile(samples, PERCENTILES),
+            strict=True,
+        )
+    )
+
+
+class MetricsLog:
+    # Appends one line per measurement, with the rolling percentiles of its
+    # section over all sessions of this server process
+    def __init__(self, path, samples=ROLLING_SAMPLES):
+        self.path = path
+        self.samples = samples
+        self._recent = {}
+        self._lock = threading.Lock()
+
+    def append(self, record):
+        with self._lock:
+            recent = self._recent.setdefault(
+                record["section"], deque(maxlen=self.samples)
+            )
+            recent.append(record["ms"])
+            record = {**record, **percentiles(recent)}
+            # Opened per line, so no handle outlives the write
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+
+@st.cache_resource
+def metrics_log(path):
+    return MetricsLog(path)
+
+
+@contextlib.contextmanager
+def count_payload(ctx):
+    # Bytes of the messages this run sends to the browser while the block
+    # runs; messages the browser has cached go out as references and count as
+    # such. This wraps a private hook of Streamlit's script run context; where
+    # a Streamlit version lacks it, the bytes are unknown (None).
+    sent = [None]
+    enqueue = getattr(ctx, "_enqueue", None)
+    if not callable(enqueue):
+        yield sent
+        return
+
+    def counting(msg):
+        try:
+            sent[0] += msg.ByteSize()
+        except (AttributeError, TypeError):
+            sent[0] = None
+        enqueue(msg)
+
+    sent[0] = 0
+    try:
+        ctx._enqueue = counting
+    except AttributeError:
+        sent[0] = None
+        yield sent
+        return
+    try:
+        yield sent
+    finally:
+        ctx._enqueue = enqueue
+
+
+# Memory frames of the measure() blocks open on each thread, innermost last
+_open_blocks = threading.local()
+
+
+def fold_peak():
+    # Carry the traced peak so far into every open block before it is reset,
+    # so an inner block does not hide its outer blocks' peaks
+    peak = tracemalloc.get_traced_memory()[1]
+    for block in getattr(_open_blocks, "stack", ()):
+        block["peak"] = max(block["peak"], peak)
+
+
+@contextlib.contextmanager
+def measure(section):
+    # Wall time, payload bytes and, when tracemalloc is tracing (e.g.
+    # PYTHONTRACEMALLOC=1), net and peak Python allocations of the block.
+    # tracemalloc is process-wide, so the memory figures include whatever
+    # other sessions allocated meanwhile.
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        yield
+        return
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        fold_peak()
+        tracemalloc.reset_peak()
+        allocated0 = tracemalloc.get_traced_memory()[0]
+        block = {"peak": allocated0}
+        stack = _open_blocks.__dict__.setdefault("stack", [])
+        stack.append(block)
+    with count_payload(ctx) as sent:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            record = {
+                "time": time.time(),
+                "session": ctx.session_id,
+                "section": section,
+                "ms": (time.perf_counter() - start) * 1000,
+                "bytes": sent[0],
+            }
+            if tracing:
+                fold_peak()
+                stack.remove(block)
+                allocated = tracemalloc.get_traced_memory()[0]
+                record["alloc_bytes"] = allocated - allocated0
+                record["peak_bytes"] = block["peak"] - allocated0
+            record_measurement(record)
+
+
+def record_measurement(record):
+    # Run count and the most recent measurements of each section, per session
+    sections = st.session_state.setdefault("render_metrics", {})
+    section = sections.setdefault(
+        record["section"], {"runs": 0, "recent": deque(maxlen=ROLLING_SAMPLES)}
+    )
+    section["runs"] += 1
+    section["recent"].append(record)
+    if METRICS_FILE:
+        metrics_log(METRICS_FILE).append(record)
+
+
+def metrics_table(sections):
+    rows = []
+    for name, section in sections.items():
+        recent = section["recent"]
+        last = recent[-1]
+        ms = percentiles([r["ms"] for r in recent])
+        rows.append(
+            {
+                "Section": name,
+                "Runs": section["runs"],
+                "Last (ms)": last["ms"],
+                "p50 (ms)": ms["p50"],
+                "p95 (ms)": ms["p95"],
+                "p99 (ms)": ms["p99"],
+                "Sent (KB)": np.nan if last["bytes"] is None else last["bytes"] / 1024,
+                "Allocated (KB)": last.get("alloc_bytes", np.nan) / 1024,
+                "Peak (KB)": last.get("peak_bytes", np.nan) / 1024,
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def display_metrics_overlay():
+    # Per-panel and data-path measurements of this session, over its last
+    # ROLLING_SAMPLES runs of each
+    sections = st.session_state.get("render_metrics", {})
+    with st.expander("Render metrics", expanded=True):
+        if not sections:
+            st.caption("No measurements yet.")
+            return
+        st.dataframe(
+            metrics_table(sections),
+            hide_index=True,
+            use_container_width=True,
+        )
+        notes = []
+        if not tracemalloc.is_tracing():
+            notes.append("Start with PYTHONTRACEMALLOC=1 to record allocations.")
+        if METRICS_FILE:
+            notes.append(f"Appending to {METRICS_FILE}.")
+        if notes:
+            st.caption(" ".join(notes))
@@ -2,34 +2,58 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-
-
-@st.cache_data
-def prepare_line_plot_data(df, selected_columns):
-    return {col: df[col] for col in selected_columns}
-
-
-def create_initial_plot(df, selected_columns, time_range_seconds):
+from components.panels import rerun_dependents
+from data.gps_time import epoch_ns_to_local
+from data.pyramid import window_means
+from data.window_agg import WindowAggregator
+
+
+DEFAULT_COLUMNS = ["CoG_base", "CoG_rover"]
+
+
+def group_window(
+    df, time_index, selected_columns, current_time_index, time_range_seconds, store_path
+):
+    # Bucket means for the visible window
+    rows = time_index.window(current_time_index, time_range_seconds)
+    if time_range_seconds:
+        # Short ranges: per-second buckets kept up to date at the window
+        # edges, so a playback step costs O(step)
+        aggregator = st.session_state.get("line_plot_agg")
+        if aggregator is None or aggregator.columns != list(selected_columns):
+            aggregator = WindowAggregator(selected_columns)
+            st.session_state.line_plot_agg = aggregator
+        aggregator.update(df, time_index.epoch_ns, rows.start, rows.stop)
+        grouped_data = aggregator.means()
+    else:
+        # Whole session: buckets from the aggregate pyramid at the coarsest
+        # level that still gives ~1k+ points, so the cost does not grow with
+        # the session length
+        grouped_data = window_means(
+            df,
+            selected_columns,
+            time_index.epoch_ns[rows.start],
+            current_time_index,
+            store_path,
+        )
+    grouped_data.index = epoch_ns_to_local(grouped_data.index.to_numpy(), time_index.tz)
+    return grouped_data
+
+
+def create_initial_plot(
+    df,
+    time_index,
+    selected_columns,
+    current_time_index,
+    time_range_seconds,
+    store_path=None,
+):
     fig = make_subplots(specs=[[{"secondary_y": True}]])
 
-    current_time = df["datetime"].iloc[-1]
-    start_time = (
-        current_time - pd.Timedelta(seconds=time_range_seconds)
-        if time_range_seconds
-        else df["datetime"].iloc[0]
-    )
-    selected_data = df[
-        (df["datetime"] >= start_time) & (df["datetime"] <= current_time)
-    ]
-
-    # Group data by second and calculate mean values
-    grouped_data = selected_data.groupby(selected_data["datetime"].dt.floor("s")).mean()
-
+    # The traces are filled by update_plot, so the window is grouped once
     for column in selected_columns:
         fig.add_trace(
-            go.Scatter(
-                x=grouped_data.index, y=grouped_data[column], mode="lines", name=column
-            ),
+            go.Scatter(x=[], y=[], mode="lines", name=column),
             secondary_y=False,
         )
 
@@ -41,22 +65,35 @@ def create_initial_plot(df, selected_columns, time_range_seconds):
         legend=dict(orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5),
     )
 
-    return fig
+    return update_plot(
+        fig,
+        df,
+        time_index,
+        selected_columns,
+        current_time_index,
+        time_range_seconds,
+        store_path,
+    )
 
 
-def update_plot(fig, df, selected_columns, current_time_index, time_range_seconds):
-    current_time = df["datetime"].iloc[current_time_index]
-    start_time = (
-        current_time - pd.Timedelta(seconds=time_range_seconds)
-        if time_range_seconds
-        else df["datetime"].iloc[0]
+def update_plot(
+    fig,
+    df,
+    time_index,
+    selected_columns,
+    current_time_index,
+    time_range_seconds,
+    store_path=None,
+):
+    current_time = time_index.times([current_time_index])[0]
+    grouped_data = group_window(
+        df,
+        time_index,
+        selected_columns,
+        current_time_index,
+        time_range_seconds,
+        store_path,
     )
-    selected_data = df[
-        (df["datetime"] >= start_time) & (df["datetime"] <= current_time)
-    ]
-
-    # Group data by second and calculate mean values
-    grouped_data = selected_data.groupby(selected_data["datetime"].dt.floor("s")).mean()
 
     for i, column in enumerate(selected_columns):
         fig.data[i].x = grouped_data.index
@@ -92,7 +129,9 @@ def update_plot(fig, df, selected_columns, current_time_index, time_range_second
     return fig
 
 
-def display_multi_select_and_line_plot(df, current_time_index):
+def display_multi_select_and_line_plot(
+    df, time_index, current_time_index, store_path=None
+):
     plottable_columns = [
         "CoG_base",
         "Lat_base",
@@ -110,10 +149,14 @@ def display_multi_select_and_line_plot(df, current_time_index):
         "beta",
     ]
 
+    # The scrubber draws the same columns, so it reruns with the plot
+    st.session_state.setdefault("line_plot_columns", DEFAULT_COLUMNS)
     selected_columns = st.multiselect(
         "Select data to visualize:",
         plottable_columns,
-        default=["CoG_base", "CoG_rover"],
+        key="line_plot_columns",
+        on_change=rerun_dependents,
+        args=("line_plot_columns",),
     )
 
     # Add time range selector
@@ -131,6 +174,7 @@ def display_multi_select_and_line_plot(df, current_time_index):
         ]
         if "line_plot_fig" in st.session_state:
             del st.session_state.line_plot_fig
+        rerun_dependents("selected_time_range_seconds")
 
     selected_time_range = st.selectbox(
         "Select time range to display:",
@@ -146,28 +190,34 @@ def display_multi_select_and_line_plot(df, current_time_index):
     ]
 
     if selected_columns:
-        df["datetime"] = pd.to_datetime(df["GPS time"], format="%Y%m%d%H%M%S")
-
         # Use session state to store the figure
         if (
             "line_plot_fig" not in st.session_state
             or st.session_state.line_plot_selected_columns != selected_columns
             or st.session_state.line_plot_time_range != selected_time_range
         ):
-            st.session_state.line_plot_fig = create_initial_plot(
-                df, selected_columns, time_range_options[selected_time_range]
+            fig = create_initial_plot(
+                df,
+                time_index,
+                selected_columns,
+                current_time_index,
+                time_range_options[selected_time_range],
+                store_path,
             )
+            st.session_state.line_plot_fig = fig
             st.session_state.line_plot_selected_columns = selected_columns
             st.session_state.line_plot_time_range = selected_time_range
-
-        # Update the plot with current data
-        fig = update_plot(
-            st.session_state.line_plot_fig,
-            df,
-            selected_columns,
-            current_time_index,
-            time_range_options[selected_time_range],
-        )
+        else:
+            # Update the plot with current data
+            fig = update_plot(
+                st.session_state.line_plot_fig,
+                df,
+                time_index,
+                selected_columns,
+                current_time_index,
+                time_range_options[selected_time_range],
+                store_path,
+            )
 
         # Display the plot
         st.plotly_chart(fig, use_container_width=True)
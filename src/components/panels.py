@@ -0,0 +1,39 @@
+import functools
+
+import streamlit as st
+
+from components.instrumentation import measure
+
+# Panel key -> session-state keys the panel reads, in render order
+PANEL_INPUTS = {}
+
+
+def panel(key, inputs=()):
+    # Turn a render function into a dashboard panel that can rerun on its own
+    # (a keyed fragment). `inputs` are the session-state keys it depends on;
+    # they are read each time the panel runs and passed as keyword arguments,
+    # so a rerun of just this panel sees their current values. Widgets inside
+    # a panel rerun only that panel.
+    PANEL_INPUTS[key] = tuple(inputs)
+
+    def decorate(render):
+        @st.fragment(key=key)
+        @functools.wraps(render)
+        def run(*args):
+            with measure(key):
+                render(*args, **{name: st.session_state.get(name) for name in inputs})
+
+        return run
+
+    return decorate
+
+
+def dependents(*names):
+    # Panels that read any of the given session-state keys
+    return [key for key, inputs in PANEL_INPUTS.items() if set(inputs) & set(names)]
+
+
+def rerun_dependents(*names):
+    # Rerun only the panels that read the given keys, e.g. every time-dependent
+    # panel after a seek. Usable from widget callbacks.
+    st.rerun(scope=dependents(*names))
@@ -0,0 +1,148 @@
+import time
+from collections import deque
+
+import numpy as np
+import streamlit as st
+
+from components.instrumentation import measure
+from components.panels import rerun_dependents
+from data.gps_time import NS_PER_SECOND
+
+SPEEDS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+# Frames per second the playback aims for; one frame is one script run
+FRAME_RATE = 10
+
+
+class PlaybackClock:
+    # Maps wall-clock time to data time while playing. Every frame shows the
+    # row the wall clock has reached, so when a run takes longer than the
+    # frame budget the frames in between are dropped instead of falling
+    # behind.
+
+    def __init__(self, frame_rate=FRAME_RATE):
+        self.frame_s = 1.0 / frame_rate
+        self.speed = 1.0
+        self.index = None
+        self.frames = 0
+        self.dropped = 0
+        self._frame_times = deque(maxlen=2 * frame_rate)
+        self._wall0 = None
+        self._data0 = None
+        self._next_tick = None
+
+    def start(self, data_ns, speed):
+        # (Re)anchor the clock at a data time, e.g. after play, seek or a
+        # speed change
+        self.speed = speed
+        self._wall0 = self._next_tick = time.perf_counter()
+        self._data0 = int(data_ns)
+
+    def stop(self):
+        self._wall0 = None
+        self.index = None
+
+    @property
+    def running(self):
+        return self._wall0 is not None
+
+    def frame(self, epoch_ns):
+        # Row to show in this frame. Frame ticks that passed while the last
+        # frame was rendering are counted as dropped.
+        now = time.perf_counter()
+        late = int((now - self._next_tick) // self.frame_s)
+        if late > 0:
+            self.dropped += late
+        self._next_tick += (max(late, 0) + 1) * self.frame_s
+        self._frame_times.append(now)
+        self.frames += 1
+
+        data_ns = self._data0 + int((now - self._wall0) * self.speed * NS_PER_SECOND)
+        index = int(np.searchsorted(epoch_ns, data_ns, side="right")) - 1
+        self.index = min(max(index, 0), len(epoch_ns) - 1)
+        return self.index
+
+    def wait(self):
+        # Sleep until the next frame is due
+        time.sleep(max(self._next_tick - time.perf_counter(), 0.0))
+
+    def fps(self):
+        if len(self._frame_times) < 2:
+            return 0.0
+        span = self._frame_times[-1] - self._frame_times[0]
+        return (len(self._frame_times) - 1) / span if span > 0 else 0.0
+
+    def reset_stats(self):
+        self.frames = 0
+        self.dropped = 0
+        self._frame_times.clear()
+
+
+def playback_clock():
+    return st.session_state.setdefault("playback_clock", PlaybackClock())
+
+
+def advance_playback(time_index):
+    # Move current_time_index to this frame's row
+    clock = playback_clock()
+    index = st.session_state.current_time_index
+    speed = st.session_state.get("playback_speed", 1.0)
+    # Started, scrubbed with the slider/buttons or sped up since last frame
+    if not clock.running or index != clock.index or speed != clock.speed:
+        if not clock.running and index >= len(time_index) - 1:
+            index = 0
+        clock.start(time_index.epoch_ns[index], speed)
+
+    index = clock.frame(time_index.epoch_ns)
+    st.session_state.current_time_index = index
+    if index == len(time_index) - 1:
+        st.session_state.playing = False
+        clock.stop()
+
+
+def schedule_next_frame(time_index):
+    # Called once the page is drawn: wait for the next frame tick, advance to
+    # its row and rerun. Every panel but the page title depends on the time,
+    # so a frame reruns the app; keyed panel reruns are only available to
+    # widget callbacks.
+    if not st.session_state.get("playing"):
+        return
+    clock = playback_clock()
+    if clock.running:
+        clock.wait()
+    with measure("playback_step"):
+        advance_playback(time_index)
+    st.rerun()
+
+
+def toggle_playback():
+    clock = playback_clock()
+    st.session_state.playing = not st.session_state.get("playing", False)
+    clock.stop()
+    if st.session_state.playing:
+        clock.reset_stats()
+    rerun_dependents("playing")
+
+
+def display_playback_controls():
+    clock = playback_clock()
+    playing = st.session_state.get("playing", False)
+
+    cols = st.columns([1, 3, 2])
+    with cols[0]:
+        st.button(
+            "⏸ Pause" if playing else "▶ Play",
+            use_container_width=True,
+            on_click=toggle_playback,
+        )
+    with cols[1]:
+        st.session_state.setdefault("playback_speed", 1.0)
+        st.select_slider(
+            "Speed",
+            options=SPEEDS,
+            key="playback_speed",
+            format_func=lambda speed: f"{speed:g}×",
+            label_visibility="collapsed",
+        )
+    with cols[2]:
+        if clock.frames:
+            st.caption(f"{clock.fps():.1f} fps · {clock.dropped} dropped frames")
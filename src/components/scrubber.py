@@ -0,0 +1,81 @@
+import os
+
+import numpy as np
+import streamlit as st
+import streamlit.components.v1 as components
+
+from components.panels import rerun_dependents
+
+FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "scrubber_frontend")
+
+# Values shown under the scrubber while it is dragged: column, title, decimals
+READOUTS = (
+    ("speed_mph", "Speed (mph)", 1),
+    ("Lat_base", "Latitude (°)", 6),
+    ("Lon_base", "Longitude (°)", 6),
+    ("relPosHeading", "Relative Position Heading (°)", 2),
+    ("VX_base", "Velocity X (m/s)", 2),
+    ("VY_base", "Velocity Y (m/s)", 2),
+    ("VZ_base", "Velocity Z (m/s)", 2),
+    ("beta", "Side Slip Angle (β°)", 2),
+)
+
+_scrubber = components.declare_component("scrubber", path=FRONTEND_DIR)
+
+
+def pack_columns(df, time_index, columns):
+    # One little-endian buffer: seconds since the first row as float64, then
+    # each column in its own width (float64 for positions, float32 for the
+    # rest), every part starting on an 8-byte boundary
+    parts = [((time_index.epoch_ns - time_index.epoch_ns[0]) / 1e9).astype("<f8")]
+    layout = {"rows": len(time_index), "time": {"offset": 0}, "columns": []}
+    offset = parts[0].nbytes
+    for column in columns:
+        values = df[column].to_numpy()
+        dtype = "<f8" if values.dtype == np.float64 else "<f4"
+        values = values.astype(dtype, copy=False)
+        layout["columns"].append({"name": column, "dtype": dtype[1:], "offset": offset})
+        parts.append(values)
+        offset += values.nbytes
+        if offset % 8:
+            parts.append(np.zeros(8 - offset % 8, np.uint8))
+            offset += 8 - offset % 8
+    return b"".join(part.tobytes() for part in parts), layout
+
+
+def on_scrub():
+    value = st.session_state.scrubber
+    if value.get("need_data"):
+        # The browser lost the columns (e.g. the frame was remounted); the
+        # fragment rerun that follows sends them again
+        st.session_state.pop("scrubber_sent", None)
+        return
+    st.session_state.current_time_index = value["index"]
+    rerun_dependents("current_time_index")
+
+
+def display_scrubber(df, time_index, current_time_index, plot_columns, window_seconds):
+    # The columns are sent once per session, row count and column selection;
+    # later runs only move the cursor
+    columns = list(dict.fromkeys([name for name, _, _ in READOUTS] + plot_columns))
+    version = f"{time_index.epoch_ns[0]}:{len(time_index)}:{','.join(columns)}"
+    data, layout = b"", None
+    if st.session_state.get("scrubber_sent") != version:
+        data, layout = pack_columns(df, time_index, columns)
+        st.session_state.scrubber_sent = version
+        st.session_state.scrubber_layout = layout
+
+    _scrubber(
+        data=data,
+        layout=layout or st.session_state.scrubber_layout,
+        version=version,
+        index=int(current_time_index),
+        window=window_seconds,
+        plot_columns=plot_columns,
+        readouts=READOUTS,
+        t0_ms=int(time_index.epoch_ns[0] // 1_000_000),
+        tz=time_index.tz,
+        key="scrubber",
+        default=None,
+        on_change=on_scrub,
+    )
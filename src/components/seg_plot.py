@@ -1,127 +1,128 @@
 import streamlit as st
 import plotly.graph_objects as go
-import pandas as pd
 import numpy as np
-from datetime import timedelta
-
-
-@st.cache_data
-def prepare_seg_plot_data(df):
-    # Convert GPS time to datetime
-    df["datetime"] = pd.to_datetime(df["GPS time"], format="%Y%m%d%H%M%S")
-
-    # Calculate necessary data for vectors
-    df["rover_spd"] = np.sqrt(
-        df["VX_rover"] ** 2 + df["VY_rover"] ** 2 + df["VZ_rover"] ** 2
-    )
-    df["base_spd"] = np.sqrt(
-        df["VX_base"] ** 2 + df["VY_base"] ** 2 + df["VZ_base"] ** 2
+import pandas as pd
+from data.gps_time import NS_PER_SECOND
+from data.window_agg import WindowAggregator
+
+
+# Base position in metres east/north of the session origin, then the east
+# (X) and north (Y) components in m/s of the vectors drawn from it
+POSITION_COLUMNS = ["east_base", "north_base"]
+VECTOR_COLUMNS = [
+    "vel_cg_X",
+    "vel_cg_Y",
+    "chassis_psi_X",
+    "chassis_psi_Y",
+    "vel_rear_X",
+    "vel_rear_Y",
+]
+SEG_COLUMNS = POSITION_COLUMNS + VECTOR_COLUMNS
+
+
+def seg_frame(dataset):
+    # The plotted columns of a dataset in one frame; built once per dataset
+    return dataset.derived(
+        "seg_frame",
+        lambda d: pd.concat(
+            [d.kinematics()[POSITION_COLUMNS], d.df[VECTOR_COLUMNS]], axis=1
+        ),
     )
 
-    # Calculate vector components
-    df["vel_cg_X"] = df["rover_spd"] * np.sin(np.radians(df["CoG_rover"]))
-    df["vel_cg_Y"] = df["rover_spd"] * np.cos(np.radians(df["CoG_rover"]))
 
-    df["chassis_psi_X"] = df["rover_spd"] * np.sin(np.radians(df["relPosHeading"]))
-    df["chassis_psi_Y"] = df["rover_spd"] * np.cos(np.radians(df["relPosHeading"]))
-
-    df["vel_rear_X"] = df["base_spd"] * np.sin(np.radians(df["CoG_base"]))
-    df["vel_rear_Y"] = df["base_spd"] * np.cos(np.radians(df["CoG_base"]))
-
-    return df
-
-
-def create_arrow(x, y, u, v, color, name, opacity=1, showlegend=True):
+def group_window(df, time_index, current_time_index, time_range_seconds):
+    # Per-second means of the precomputed channels over the selected range.
+    # The aggregator lives in the session, so a playback step only adds and
+    # evicts the rows at the window edges.
+    if "seg_plot_agg" not in st.session_state:
+        st.session_state.seg_plot_agg = WindowAggregator(SEG_COLUMNS)
+    rows = time_index.window(current_time_index, time_range_seconds)
+    st.session_state.seg_plot_agg.update(df, time_index.epoch_ns, rows.start, rows.stop)
+    return st.session_state.seg_plot_agg.means()
+
+
+# (column prefix, color, legend name) of the three vector families
+ARROWS = (
+    ("vel_cg", "red", "Rover Velocity"),
+    ("chassis_psi", "green", "Chassis Orientation"),
+    ("vel_rear", "orange", "Base Velocity"),
+)
+# Positions and velocities share metres, so an arrow shows how far the
+# vehicle moves in this many seconds
+ARROW_SECONDS = 1.0
+MAX_ARROWS = 150  # per family; longer windows are decimated
+
+
+def decimate(grouped_data, max_arrows=MAX_ARROWS):
+    # Every n-th second so that at most max_arrows arrows are drawn. The
+    # seconds kept are multiples of n since the epoch, not counted from the
+    # window start, so arrows stay put while playback moves the window.
+    seconds = grouped_data.index.to_numpy() // NS_PER_SECOND
+    if len(seconds) == 0:
+        return grouped_data
+    step = max(1, -(-int(seconds[-1] - seconds[0] + 1) // max_arrows))
+    return grouped_data[seconds % step == 0]
+
+
+def arrow_segments(grouped_data, prefix, scale=ARROW_SECONDS):
+    # Tail, head and a NaN break per arrow, so one trace draws all of them
+    x = grouped_data["east_base"].to_numpy(dtype=np.float64)
+    y = grouped_data["north_base"].to_numpy(dtype=np.float64)
+    u = grouped_data[f"{prefix}_X"].to_numpy(dtype=np.float64) * scale
+    v = grouped_data[f"{prefix}_Y"].to_numpy(dtype=np.float64) * scale
+    xs = np.full(3 * len(x), np.nan)
+    ys = np.full(3 * len(y), np.nan)
+    xs[0::3], xs[1::3] = x, x + u
+    ys[0::3], ys[1::3] = y, y + v
+    return xs, ys
+
+
+def create_arrows(grouped_data, prefix, color, name, opacity=1, showlegend=True):
+    xs, ys = arrow_segments(grouped_data, prefix)
     return go.Scatter(
-        x=[x, x + u],
-        y=[y, y + v],
+        x=xs,
+        y=ys,
         mode="lines+markers",
         line=dict(color=color, width=2),
-        marker=dict(size=[0, 8], symbol=["circle", "arrow-wide"], color=color),
+        # Only the head point of each arrow gets a marker, rotated along the
+        # segment it ends
+        marker=dict(
+            size=np.tile([0, 8, 0], len(grouped_data)),
+            symbol="arrow-wide",
+            angleref="previous",
+            color=color,
+        ),
         name=name,
         showlegend=showlegend,
         opacity=opacity,
     )
 
 
-def create_seg_plot(df, current_time_index, time_range_seconds):
-    # Get current data point and the data for the selected time range
-    current_data = df.iloc[current_time_index]
-    current_time = current_data["datetime"]
-    start_time = (
-        current_time - timedelta(seconds=time_range_seconds)
-        if time_range_seconds
-        else df["datetime"].iloc[0]
-    )
-    selected_data = df[
-        (df["datetime"] >= start_time) & (df["datetime"] <= current_time)
-    ]
+def create_seg_plot(df, time_index, current_time_index, time_range_seconds):
+    # Group data for the selected time range by second
+    grouped_data = group_window(df, time_index, current_time_index, time_range_seconds)
+    return build_seg_figure(grouped_data, time_range_seconds)
 
-    # Group data by second and calculate mean values
-    grouped_data = selected_data.groupby(selected_data["datetime"].dt.floor("s")).mean()
 
+def build_seg_figure(grouped_data, time_range_seconds):
     # Create the base figure
     fig = go.Figure()
 
     # Plot the traveled path for the selected time range
     fig.add_trace(
         go.Scatter(
-            x=grouped_data["Lon_base"],
-            y=grouped_data["Lat_base"],
+            x=grouped_data["east_base"],
+            y=grouped_data["north_base"],
             mode="lines",
             name="Traveled Path",
             line=dict(color="blue", width=2),
         )
     )
 
-    # Plot the three vectors as arrows for each second
-    vector_scale = 0.00001  # Adjust this value to scale the vectors appropriately
-
-    for _, row in grouped_data.iterrows():
-        # Rover Velocity Vector at CG (vel_cg_XY)
-        fig.add_trace(
-            create_arrow(
-                row["Lon_base"],
-                row["Lat_base"],
-                row["vel_cg_X"] * vector_scale,
-                row["vel_cg_Y"] * vector_scale,
-                "red",
-                "Rover Velocity",
-                opacity=0.7,
-                showlegend=_
-                == grouped_data.index[0],  # Only show legend for the first arrow
-            )
-        )
-
-        # Chassis Orientation Vector (chassis_psi_XY)
-        fig.add_trace(
-            create_arrow(
-                row["Lon_base"],
-                row["Lat_base"],
-                row["chassis_psi_X"] * vector_scale,
-                row["chassis_psi_Y"] * vector_scale,
-                "green",
-                "Chassis Orientation",
-                opacity=0.7,
-                showlegend=_
-                == grouped_data.index[0],  # Only show legend for the first arrow
-            )
-        )
-
-        # Base Velocity Vector at Rear Axle (vel_rear_XY)
-        fig.add_trace(
-            create_arrow(
-                row["Lon_base"],
-                row["Lat_base"],
-                row["vel_rear_X"] * vector_scale,
-                row["vel_rear_Y"] * vector_scale,
-                "orange",
-                "Base Velocity",
-                opacity=0.7,
-                showlegend=_
-                == grouped_data.index[0],  # Only show legend for the first arrow
-            )
-        )
+    # One trace per vector family
+    arrows = decimate(grouped_data)
+    for prefix, color, name in ARROWS:
+        fig.add_trace(create_arrows(arrows, prefix, color, name, opacity=0.7))
 
     # Update title and layout
     time_range_text = (
@@ -136,12 +137,15 @@ def create_seg_plot(df, current_time_index, time_range_seconds):
             "yanchor": "top",
             "pad": {"t": 20},  # Add padding above the title
         },
-        xaxis_title="Longitude",
+        xaxis_title="East (m)",
         yaxis=dict(
-            title=dict(text="Latitude", standoff=10),
+            title=dict(text="North (m)", standoff=10),
             side="right",
             title_standoff=5,
             automargin=True,
+            # Metres are metres both ways, so turns keep their shape
+            scaleanchor="x",
+            scaleratio=1,
         ),
         height=560,  # Increase overall height to accommodate title
         margin=dict(l=0, r=0, t=60, b=120),  # Increase top margin
@@ -149,8 +153,8 @@ def create_seg_plot(df, current_time_index, time_range_seconds):
     )
 
     # Set axis ranges to focus on the selected time range of data
-    x_range = [grouped_data["Lon_base"].min(), grouped_data["Lon_base"].max()]
-    y_range = [grouped_data["Lat_base"].min(), grouped_data["Lat_base"].max()]
+    x_range = [grouped_data["east_base"].min(), grouped_data["east_base"].max()]
+    y_range = [grouped_data["north_base"].min(), grouped_data["north_base"].max()]
 
     # Add some padding to the ranges
     x_padding = (x_range[1] - x_range[0]) * 0.1
@@ -162,71 +166,18 @@ def create_seg_plot(df, current_time_index, time_range_seconds):
     return fig
 
 
-def update_seg_plot(fig, df, current_time_index, time_range_seconds):
-    current_data = df.iloc[current_time_index]
-    current_time = current_data["datetime"]
-    start_time = (
-        current_time - timedelta(seconds=time_range_seconds)
-        if time_range_seconds
-        else df["datetime"].iloc[0]
-    )
-    selected_data = df[
-        (df["datetime"] >= start_time) & (df["datetime"] <= current_time)
-    ]
-
-    grouped_data = selected_data.groupby(selected_data["datetime"].dt.floor("s")).mean()
+def update_seg_plot(fig, df, time_index, current_time_index, time_range_seconds):
+    grouped_data = group_window(df, time_index, current_time_index, time_range_seconds)
 
     # Update the traveled path
-    fig.data[0].x = grouped_data["Lon_base"]
-    fig.data[0].y = grouped_data["Lat_base"]
-
-    # Remove all existing vector traces
-    fig.data = [fig.data[0]]
-
-    # Update the vectors
-    vector_scale = 0.0001
-    for _, row in grouped_data.iterrows():
-        # Add Rover Velocity Vector at CG
-        fig.add_trace(
-            create_arrow(
-                row["Lon_base"],
-                row["Lat_base"],
-                row["vel_cg_X"] * vector_scale,
-                row["vel_cg_Y"] * vector_scale,
-                "red",
-                "Rover Velocity at CG",
-                opacity=0.7,
-                showlegend=False,
-            )
-        )
-
-        # Add Chassis Orientation Vector
-        fig.add_trace(
-            create_arrow(
-                row["Lon_base"],
-                row["Lat_base"],
-                row["chassis_psi_X"] * vector_scale,
-                row["chassis_psi_Y"] * vector_scale,
-                "green",
-                "Chassis Orientation",
-                opacity=0.7,
-                showlegend=False,
-            )
-        )
+    fig.data[0].x = grouped_data["east_base"]
+    fig.data[0].y = grouped_data["north_base"]
 
-        # Add Base Velocity Vector at Rear Axle
-        fig.add_trace(
-            create_arrow(
-                row["Lon_base"],
-                row["Lat_base"],
-                row["vel_rear_X"] * vector_scale,
-                row["vel_rear_Y"] * vector_scale,
-                "orange",
-                "Base Velocity at Rear Axle",
-                opacity=0.7,
-                showlegend=False,
-            )
-        )
+    # Update the vectors in place
+    arrows = decimate(grouped_data)
+    for trace, (prefix, _, _) in zip(fig.data[1:], ARROWS, strict=True):
+        trace.x, trace.y = arrow_segments(arrows, prefix)
+        trace.marker.size = np.tile([0, 8, 0], len(arrows))
 
     # Update title
     time_range_text = (
@@ -242,8 +193,8 @@ def update_seg_plot(fig, df, current_time_index, time_range_seconds):
     )
 
     # Update axis ranges
-    x_range = [grouped_data["Lon_base"].min(), grouped_data["Lon_base"].max()]
-    y_range = [grouped_data["Lat_base"].min(), grouped_data["Lat_base"].max()]
+    x_range = [grouped_data["east_base"].min(), grouped_data["east_base"].max()]
+    y_range = [grouped_data["north_base"].min(), grouped_data["north_base"].max()]
     x_padding = (x_range[1] - x_range[0]) * 0.1
     y_padding = (y_range[1] - y_range[0]) * 0.1
     fig.update_xaxes(range=[x_range[0] - x_padding, x_range[1] + x_padding])
@@ -252,15 +203,11 @@ def update_seg_plot(fig, df, current_time_index, time_range_seconds):
     return fig
 
 
-def display_seg_plot(df, current_time_index):
-    df = prepare_seg_plot_data(df)
-
-    # Get the selected time range from session state, with a default value
-    time_range_seconds = st.session_state.get("selected_time_range_seconds", 30)
+def display_seg_plot(df, time_index, current_time_index, time_range_seconds=30):
 
     # Always update the figure
     st.session_state.seg_plot_fig = create_seg_plot(
-        df, current_time_index, time_range_seconds
+        df, time_index, current_time_index, time_range_seconds
     )
 
     st.plotly_chart(st.session_state.seg_plot_fig, use_container_width=True)
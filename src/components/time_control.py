@@ -1,79 +1,56 @@
-import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
-
+import time
 
-def format_time(time_int):
-    time_str = str(time_int)
-    dt = datetime.strptime(time_str, "%Y%m%d%H%M%S")
-    return dt.strftime("%H:%M:%S")
+import streamlit as st
 
+from components.instrumentation import measure
+from components.panels import rerun_dependents
+from components.scrubber import display_scrubber
 
-@st.cache_data
-def get_formatted_times(time_range):
-    return [format_time(t) for t in time_range]
 
+def display_live_status(time_index, live_manifest):
+    # Shown instead of the scrubber while following the live feed, so the
+    # scrubber's columns are not resent on every refresh
+    age_s = (time.time_ns() - live_manifest["last_write_ns"]) / 1e9
+    last = time_index.labels([len(time_index) - 1], fmt="%H:%M:%S")[0]
+    st.markdown(f"**🔴 Live** · latest sample {last} · updated {age_s:.1f}s ago")
+    st.caption(
+        f"{len(time_index):,} rows buffered. Turn off *Follow live* in the "
+        "sidebar to pause and scrub through them."
+    )
 
-def display_time_control(df):
-    time_range = df["GPS time"].tolist()
-    formatted_times = get_formatted_times(time_range)
-    end_time = formatted_times[-1]
 
+def display_time_control(
+    df, time_index, plot_columns, window_seconds, live_manifest=None
+):
     if "current_time_index" not in st.session_state:
         st.session_state.current_time_index = 0
 
-    current_time = formatted_times[st.session_state.current_time_index]
-    st.write(f"Time: {current_time} / {end_time}")
+    if live_manifest is not None:
+        display_live_status(time_index, live_manifest)
+        return
 
-    st.slider(
-        "Time",
-        0,
-        len(time_range) - 1,
+    # Dragging the scrubber is handled in the browser; the server hears only
+    # where it is released
+    display_scrubber(
+        df,
+        time_index,
         st.session_state.current_time_index,
-        key="time_slider",
-        on_change=update_time_index,
-        format="",
-        label_visibility="collapsed",
+        plot_columns,
+        window_seconds,
     )
 
     def adjust_time(seconds):
-        current_time_int = time_range[st.session_state.current_time_index]
-        current_time_str = str(current_time_int).zfill(14)  # Ensure 14 digits
-        current_time = datetime.strptime(current_time_str, "%Y%m%d%H%M%S")
-        target_time = current_time + timedelta(seconds=seconds)
-        target_time_int = int(target_time.strftime("%Y%m%d%H%M%S"))
-        new_index = min(
-            max(0, df[df["GPS time"] >= target_time_int].index.min()),
-            len(time_range) - 1,
-        )
-        if pd.isna(new_index):
-            new_index = len(time_range) - 1 if seconds > 0 else 0
-        return int(new_index)
-
-    col1, col2, col3, col4, col5, col6 = st.columns(6)
-    with col1:
-        if st.button("-10s", use_container_width=True):
-            st.session_state.current_time_index = adjust_time(-10)
-    with col2:
-        if st.button("-5s", use_container_width=True):
-            st.session_state.current_time_index = adjust_time(-5)
-    with col3:
-        if st.button("-1s", use_container_width=True):
-            st.session_state.current_time_index = adjust_time(-1)
-    with col4:
-        if st.button("+1s", use_container_width=True):
-            st.session_state.current_time_index = adjust_time(1)
-    with col5:
-        if st.button("+5s", use_container_width=True):
-            st.session_state.current_time_index = adjust_time(5)
-    with col6:
-        if st.button("+10s", use_container_width=True):
-            st.session_state.current_time_index = adjust_time(10)
-
-    # Force a rerun if the current_time_index has changed
-    if st.session_state.current_time_index != st.session_state.time_slider:
-        st.rerun()
-
-
-def update_time_index():
-    st.session_state.current_time_index = st.session_state.time_slider
+        with measure("seek"):
+            new_index = time_index.seek(st.session_state.current_time_index, seconds)
+        st.session_state.current_time_index = new_index
+        rerun_dependents("current_time_index")
+
+    columns = st.columns(6)
+    for col, seconds in zip(columns, (-10, -5, -1, 1, 5, 10), strict=True):
+        with col:
+            st.button(
+                f"{seconds:+d}s",
+                use_container_width=True,
+                on_click=adjust_time,
+                args=(seconds,),
+            )
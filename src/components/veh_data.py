@@ -1,23 +1,14 @@
+import math
 import streamlit as st
 import plotly.graph_objects as go
 
 
-def display_vehicle_data(df, current_time_index):
-    # Get current data
-    current_data = df.iloc[current_time_index]
+def format_value(value, spec):
+    # Channels without a sample at this epoch are NaN
+    return "—" if math.isnan(value) else f"{value:{spec}}"
 
-    # Calculate speed in mph
-    speed = (
-        (
-            current_data["VX_base"] ** 2
-            + current_data["VY_base"] ** 2
-            + current_data["VZ_base"] ** 2
-        )
-        ** 0.5
-    ) * 2.23694
-    max_speed = 140
 
-    # Speedometer
+def speedometer_figure(speed, max_speed=140):
     fig_speed = go.Figure(
         go.Indicator(
             mode="gauge+number",
@@ -55,20 +46,30 @@ def display_vehicle_data(df, current_time_index):
         height=290,
         margin=dict(l=25, r=25, t=50, b=5),
     )
-    st.plotly_chart(fig_speed, use_container_width=True)
+    return fig_speed
+
+
+def display_vehicle_data(current_data):
+    # Speed in mph is derived at ingest; NaN when no base sample was matched
+    speed = current_data["speed_mph"]
+    if math.isnan(speed):
+        speed = None
+
+    # Speedometer
+    st.plotly_chart(speedometer_figure(speed), use_container_width=True)
 
     # Lat, Lon
     col1, col2 = st.columns(2)
     with col1:
-        st.metric("Latitude (°)", f"{current_data['Lat_base']:.6f}")
+        st.metric("Latitude (°)", format_value(current_data["Lat_base"], ".6f"))
     with col2:
-        st.metric("Longitude (°)", f"{current_data['Lon_base']:.6f}")
+        st.metric("Longitude (°)", format_value(current_data["Lon_base"], ".6f"))
 
     # Velocity
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Velocity X (m/s)", f"{current_data['VX_base']:.2f}")
+        st.metric("Velocity X (m/s)", format_value(current_data["VX_base"], ".2f"))
     with col2:
-        st.metric("Velocity Y (m/s)", f"{current_data['VY_base']:.2f}")
+        st.metric("Velocity Y (m/s)", format_value(current_data["VY_base"], ".2f"))
     with col3:
-        st.metric("Velocity Z (m/s)", f"{current_data['VZ_base']:.2f}")
+        st.metric("Velocity Z (m/s)", format_value(current_data["VZ_base"], ".2f"))
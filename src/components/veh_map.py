@@ -1,7 +1,46 @@
+import logging
+import numpy as np
 import streamlit as st
 import folium
 from folium.plugins import Draw
-from streamlit_folium import folium_static
+from streamlit_folium import st_folium
+from data.schema import BASE_FIX
+from data.simplify import MAX_ZOOM, dp_importance, planar, simplify, zoom_tolerance
+from tiles.server import start_background
+from tiles.sources import (
+    TILE_HOST,
+    TILE_PUBLIC_URL,
+    TILE_SERVER,
+    TILE_SOURCES,
+    local_url,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ZOOM = 15
+# Fixes appended to a path are simplified together with the fixes since its
+# last joint, a vertex kept at every zoom; once that run is this long, the
+# next append starts a new joint, so appends cost at most this many fixes
+JOINT_FIXES = 1 << 12
+
+
+@st.cache_resource
+def local_tile_server():
+    # One tile server per dashboard process, shared by all sessions
+    try:
+        server = start_background(host=TILE_HOST)
+    except OSError as e:
+        logger.warning("Could not start the local tile server: %s", e)
+        return None
+    return TILE_PUBLIC_URL or server.url
+
+
+def tile_url(style):
+    # Tiles come from the local cache server when one is configured
+    server = local_tile_server() if TILE_SERVER == "local" else TILE_SERVER
+    if server:
+        return local_url(server, style)
+    return TILE_SOURCES[style]["url"]
 
 
 def create_base_map(initial_lat, initial_lon, style="Default"):
@@ -10,91 +49,147 @@ def create_base_map(initial_lat, initial_lon, style="Default"):
         tiles=None,
     )
 
-    if style == "Default":
-        folium.TileLayer(
-            tiles="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
-            attr="© OpenStreetMap contributors",
-            name="OpenStreetMap",
-            max_zoom=19,
-            overlay=False,
-            control=True,
-        ).add_to(m)
-    elif style == "Streets":
-        folium.TileLayer(
-            tiles="https://mt1.google.com/vt/lyrs=m&x={x}&y={y}&z={z}",
-            attr="Google",
-            name="Google Maps",
-            max_zoom=20,
-            overlay=False,
-            control=True,
-        ).add_to(m)
-    elif style == "Satellite":
-        folium.TileLayer(
-            tiles="https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}",
-            attr="Google",
-            name="Google Satellite",
-            max_zoom=20,
-            overlay=False,
-            control=True,
-        ).add_to(m)
-    elif style == "Terrain":
-        folium.TileLayer(
-            tiles="https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png",
-            attr="Map data: © OpenStreetMap contributors, SRTM | Map style: © OpenTopoMap (CC-BY-SA)",
-            name="OpenTopoMap",
-            max_zoom=15,
-            overlay=False,
-            control=True,
-        ).add_to(m)
-    elif style == "Dark":
-        folium.TileLayer(
-            tiles="https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png",
-            attr="© OpenStreetMap contributors © CARTO",
-            name="CARTO Dark",
-            max_zoom=16,
-            overlay=False,
-            control=True,
-        ).add_to(m)
-    else:
+    if style not in TILE_SOURCES:
         raise ValueError("Invalid map style")
 
+    source = TILE_SOURCES[style]
+    folium.TileLayer(
+        tiles=tile_url(style),
+        attr=source["attr"],
+        name=source["name"],
+        max_zoom=source["max_zoom"],
+        overlay=False,
+        control=True,
+    ).add_to(m)
+
+    return m
+
+
+def map_path(dataset):
+    # Base positions with a fix and their Douglas-Peucker importance; computed
+    # once per dataset version and shared by all sessions
+    df = dataset.df
+    fix_index = np.flatnonzero(df["valid"].to_numpy() & BASE_FIX)
+    lat = df["Lat_base"].to_numpy()[fix_index]
+    lon = df["Lon_base"].to_numpy()[fix_index]
+    path = {"rows": len(df), "fix_index": fix_index, "lat": lat, "lon": lon}
+    if fix_index.size:
+        mean_lat = float(np.mean(lat))
+        x, y = planar(lat, lon)
+        path["mean_lat"] = mean_lat
+        path["importance"] = dp_importance(
+            x, y, min_tolerance=zoom_tolerance(MAX_ZOOM, mean_lat)
+        )
+    path["zooms"] = {}
+    return path
+
+
+def extend_map_path(dataset, path, rows):
+    # map_path() of a dataset extending one of `rows` rows whose path is
+    # `path`. Returns a new path; the old one stays with the old version.
+    df = dataset.df
+    if not path["fix_index"].size:
+        return map_path(dataset)
+    new = rows + np.flatnonzero(df["valid"].to_numpy()[rows:] & BASE_FIX)
+    fix_index = np.concatenate([path["fix_index"], new])
+    lat = np.concatenate([path["lat"], df["Lat_base"].to_numpy()[new]])
+    lon = np.concatenate([path["lon"], df["Lon_base"].to_numpy()[new]])
+    seen = len(path["fix_index"])
+    joint = path.get("joint", 0)
+    if seen - joint >= JOINT_FIXES:
+        joint = seen - 1
+    # Both ends of a Douglas-Peucker run are kept, so the joint keeps its
+    # infinite importance and the vertices before it are unchanged
+    x, y = planar(lat[joint:], lon[joint:])
+    importance = np.concatenate(
+        [
+            path["importance"][:joint],
+            dp_importance(
+                x, y, min_tolerance=zoom_tolerance(MAX_ZOOM, path["mean_lat"])
+            ),
+        ]
+    )
+    return {
+        "rows": len(df),
+        "fix_index": fix_index,
+        "lat": lat,
+        "lon": lon,
+        "mean_lat": path["mean_lat"],
+        "importance": importance,
+        "joint": joint,
+        "zooms": {},
+    }
+
+
+def simplified_path(path, zoom):
+    # Vertices (positions into the fix arrays) drawn at this zoom level
+    if zoom not in path["zooms"]:
+        path["zooms"][zoom] = simplify(
+            path["importance"], zoom_tolerance(zoom, path["mean_lat"])
+        )
+    return path["zooms"][zoom]
+
+
+def base_map(path, map_style):
+    # The map, tile layer, drawing tools and start marker. st_folium gives its
+    # elements deterministic names, so this renders to the same script on
+    # every run and the browser keeps the map (and its tiles) instead of
+    # reloading; only the playback layer changes between runs.
+    start = [float(path["lat"][0]), float(path["lon"][0])]
+    m = create_base_map(*start, style=map_style)
+    Draw().add_to(m)
+    folium.Marker(
+        start,
+        popup="Base Start",
+        icon=folium.Icon(color="green", icon="play"),
+    ).add_to(m)
+    m.fit_bounds(
+        [
+            [float(path["lat"].min()), float(path["lon"].min())],
+            [float(path["lat"].max()), float(path["lon"].max())],
+        ]
+    )
     return m
 
 
-def display_map(
-    df,
-    current_time_index,
-    initial_lat=29.18853467,
-    initial_lon=-81.04548,
-    map_style="Default",
-):
+def display_map(dataset, current_time_index, map_style="Default"):
+    df = dataset.df
     if "Lat_base" not in df.columns or "Lon_base" not in df.columns:
         st.error(
             "Could not find latitude and longitude columns after cleaning. Please check your CSV file."
         )
         return None
 
-    if df.empty:
+    # Only rows where the base receiver had a position fix are drawn
+    path = dataset.derived("map_path", map_path, extend_map_path)
+    fix_index = path["fix_index"]
+    if fix_index.size == 0:
         st.error("No valid data available to display on the map.")
         return None
 
-    # Create a new map instance with the specified style
-    m = create_base_map(initial_lat, initial_lon, style=map_style)
+    m = base_map(path, map_style)
 
-    # Add drawing tools to the map
-    Draw().add_to(m)
+    # Zoom reported by the map on the previous run
+    zoom = (st.session_state.get("veh_map") or {}).get("zoom") or DEFAULT_ZOOM
+    zoom = int(min(max(zoom, 0), MAX_ZOOM))
 
-    # Add a marker for the base start point (first entry)
-    folium.Marker(
-        [df["Lat_base"].iloc[0], df["Lon_base"].iloc[0]],
-        popup="Base Start",
-        icon=folium.Icon(color="green", icon="play"),
-    ).add_to(m)
+    # Last fix at or before the current time (the first one before any fix
+    # has been reached)
+    current = max(int(np.searchsorted(fix_index, current_time_index, "right")) - 1, 0)
+    current_position = [float(path["lat"][current]), float(path["lon"][current])]
 
-    # Plot the traveled path up to the current time index
-    traveled_path = (
-        df[["Lat_base", "Lon_base"]].iloc[: current_time_index + 1].values.tolist()
-    )
+    # Traveled path: the simplified vertices up to the current fix, plus the
+    # current position itself
+    vertices = simplified_path(path, zoom)
+    vertices = vertices[: np.searchsorted(vertices, current, "right")]
+    traveled_path = np.column_stack(
+        [path["lat"][vertices], path["lon"][vertices]]
+    ).tolist()
+    if not len(vertices) or vertices[-1] != current:
+        traveled_path.append(current_position)
+
+    # Playback layer: the only part sent to the browser on each step
+    playback = folium.FeatureGroup(name="Playback")
     if len(traveled_path) > 1:
         folium.PolyLine(
             traveled_path,
@@ -102,32 +197,28 @@ def display_map(
             color="blue",
             opacity=0.8,
             tooltip="Traveled Path",
-        ).add_to(m)
+        ).add_to(playback)
 
     # Add current position marker (now blue)
-    current_position = [
-        df["Lat_base"].iloc[current_time_index],
-        df["Lon_base"].iloc[current_time_index],
-    ]
     folium.Marker(
         current_position,
         popup="Current Position",
         icon=folium.Icon(color="blue", icon="car", prefix="fa"),
-    ).add_to(m)
+    ).add_to(playback)
 
     # Add end marker only if we've reached the end of the data
     if current_time_index == len(df) - 1:
         folium.Marker(
-            [df["Lat_base"].iloc[-1], df["Lon_base"].iloc[-1]],
+            [float(path["lat"][-1]), float(path["lon"][-1])],
             popup="Base End",
             icon=folium.Icon(color="red", icon="stop"),
-        ).add_to(m)
-
-    # Fit the map to the traveled path
-    if len(traveled_path) > 1:
-        m.fit_bounds(traveled_path)
-    else:
-        m.fit_bounds([current_position, current_position])
+        ).add_to(playback)
 
-    # Return the Map object
-    return folium_static(m)
+    return st_folium(
+        m,
+        key="veh_map",
+        height=420,
+        use_container_width=True,
+        feature_group_to_add=playback,
+        returned_objects=["zoom"],
+    )
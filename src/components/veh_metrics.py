@@ -1,6 +1,8 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import altair as alt
+from data.kinematics import wrap_degrees
 
 
 def make_donut(input_response, input_text, input_color):
@@ -56,22 +58,21 @@ def make_donut(input_response, input_text, input_color):
     return plot_bg + plot + text
 
 
-def display_vehicle_metrics(df, current_time_index):
+def display_vehicle_metrics(current_data, previous_data):
     metrics_col = st.columns(2)
 
-    current_data = df.iloc[current_time_index]
-    previous_data = df.iloc[
-        max(0, current_time_index - 1)
-    ]  # Ensure we don't go below 0
-
-    cog_base = current_data["CoG_base"]
-    cog_rover = current_data["CoG_rover"]
-    beta = current_data["beta"]
+    # Donuts need a number; a missing base sample shows as 0
+    cog_base = np.nan_to_num(current_data["CoG_base"])
+    cog_rover = np.nan_to_num(current_data["CoG_rover"])
+    beta = wrap_degrees(current_data["beta"])
     rel_pos_heading = current_data["relPosHeading"]
 
-    # Calculate deltas
-    delta_rel_pos_heading = rel_pos_heading - previous_data["relPosHeading"]
-    delta_beta = beta - previous_data["beta"]
+    # Calculate deltas; a heading crossing north changes by a few degrees,
+    # not by 360
+    delta_rel_pos_heading = wrap_degrees(
+        rel_pos_heading - previous_data["relPosHeading"]
+    )
+    delta_beta = wrap_degrees(beta - previous_data["beta"])
 
     with metrics_col[0]:
         st.altair_chart(make_donut(cog_rover, "Rover CoG (°)", "red"))
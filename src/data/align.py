@@ -0,0 +1,230 @@
+import numpy as np
+import pandas as pd
+
+from data.gps_time import NAT_NS, NS_PER_MS
+
+# Columns holding headings in degrees; these are interpolated on the unit circle
+ANGLE_COLUMNS = ("CoG", "relPosHeading")
+
+
+def _valid_sorted(df, on):
+    # Drop rows without a timestamp and make sure the key is ascending
+    df = df[df[on].notna() & (df[on] != NAT_NS)]
+    df = df.astype({on: np.int64})
+    if not df[on].is_monotonic_increasing:
+        df = df.sort_values(on, kind="stable")
+    return df.reset_index(drop=True)
+
+
+def _interpolate_onto(base_t, base_values, rover_t, max_gap_ns, angle=False):
+    # Linear interpolation of one base channel onto rover epochs. Rover samples
+    # outside the base span, or inside a base gap wider than max_gap_ns, get NaN.
+    values = np.asarray(base_values, dtype=np.float64)
+    finite = np.isfinite(values)
+    t, values = base_t[finite], values[finite]
+    out = np.full(len(rover_t), np.nan)
+    if len(t) == 0:
+        return out
+
+    if angle:
+        values = np.unwrap(values, period=360)
+
+    right = np.searchsorted(t, rover_t, side="left")
+    left = np.searchsorted(t, rover_t, side="right") - 1
+    inside = (left >= 0) & (right < len(t))
+    exact = inside & (left == right)
+    gap = t[np.minimum(right, len(t) - 1)] - t[np.maximum(left, 0)]
+    usable = inside & ((gap <= max_gap_ns) | exact)
+
+    out[usable] = np.interp(rover_t[usable], t, values)
+    if angle:
+        # np.mod can round tiny negative values up to exactly 360
+        out[usable] %= 360
+        out[out >= 360] = 0.0
+    return out
+
+
+def nearest_index(base_t, rover_t, tolerance_ns):
+    # Position of the nearest base sample for every rover epoch (-1 when the
+    # nearest one is further than tolerance_ns). Both arrays must be sorted.
+    right = np.searchsorted(base_t, rover_t, side="left")
+    left = right - 1
+    right_c = np.minimum(right, len(base_t) - 1)
+    left_c = np.maximum(left, 0)
+
+    d_left = np.where(left >= 0, rover_t - base_t[left_c], np.iinfo(np.int64).max)
+    d_right = np.where(
+        right < len(base_t), base_t[right_c] - rover_t, np.iinfo(np.int64).max
+    )
+    idx = np.where(d_left <= d_right, left_c, right_c)
+    distance = np.minimum(d_left, d_right)
+    return np.where(distance <= tolerance_ns, idx, -1)
+
+
+def _take(values, idx):
+    # Gather values by position, leaving missing entries where idx == -1
+    missing = idx < 0
+    if np.issubdtype(values.dtype, np.integer):
+        return pd.arrays.IntegerArray(values[np.where(missing, 0, idx)], missing)
+    out = values.astype(np.float64)[np.where(missing, 0, idx)]
+    out[missing] = np.nan
+    return out
+
+
+def align_streams(
+    base,
+    rover,
+    tolerance_ms=100,
+    interpolate=False,
+    on="epoch_ns",
+    suffixes=("_base", "_rover"),
+):
+    # Align base samples onto rover epochs by nearest timestamp (within
+    # tolerance_ms), or by linear interpolation between the bracketing base
+    # samples. Output has exactly one row per timestamped rover sample.
+    base = _valid_sorted(base, on)
+    rover = _valid_sorted(rover, on)
+    tolerance_ns = int(tolerance_ms * NS_PER_MS)
+    base_suffix, rover_suffix = suffixes
+
+    base = base.drop(columns=["GPS time"], errors="ignore")
+    shared = [c for c in base.columns if c in rover.columns and c != on]
+    base_t = base[on].to_numpy()
+    rover_t = rover[on].to_numpy()
+    idx = nearest_index(base_t, rover_t, tolerance_ns)
+
+    merged = {c: rover[c].to_numpy() for c in ("GPS time", on) if c in rover}
+    for column in base.columns:
+        if column == on:
+            continue
+        name = f"{column}{base_suffix}"
+        if interpolate:
+            merged[name] = _interpolate_onto(
+                base_t,
+                base[column],
+                rover_t,
+                max_gap_ns=2 * tolerance_ns,
+                angle=column in ANGLE_COLUMNS,
+            )
+        else:
+            merged[name] = _take(base[column].to_numpy(), idx)
+
+    # Epoch of the nearest base sample, so the pairing distance stays inspectable
+    merged[f"{on}{base_suffix}"] = _take(base_t, idx)
+
+    for column in rover.columns:
+        if column in ("GPS time", on):
+            continue
+        name = f"{column}{rover_suffix}" if column in shared else column
+        merged[name] = rover[column].to_numpy()
+
+    return pd.DataFrame(merged)
+
+
+class ChunkAligner:
+    # Online version of align_streams for streams that arrive as time-ordered
+    # chunks. Rover rows are held back until the base stream has moved far
+    # enough past them that no later base sample could change their pairing,
+    # and base rows are dropped once no pending rover row can reach them.
+
+    # Rows dropped for being no newer than rows already pushed (a class
+    # default, so aligners pickled by data.incremental before it existed load)
+    stale_rows = 0
+
+    def __init__(self, tolerance_ms=100, interpolate=False, on="epoch_ns"):
+        self.tolerance_ms = tolerance_ms
+        self.interpolate = interpolate
+        self.on = on
+        self.base = None
+        self.rover = None
+        self.last_rover_t = None
+
+    @property
+    def reach_ns(self):
+        # How far from a rover epoch a base sample can still affect its row
+        factor = 2 if self.interpolate else 1
+        return int(factor * self.tolerance_ms * NS_PER_MS)
+
+    def _append(self, buffer, chunk, newest=None):
+        # Rows no newer than the newest one pushed before (e.g. resent by a
+        # receiver reconnecting, or a replay starting over) are dropped, so
+        # the buffers stay sorted for searchsorted
+        chunk = _valid_sorted(chunk, self.on)
+        if buffer is not None and not buffer.empty:
+            last = buffer[self.on].iloc[-1]
+            newest = last if newest is None else max(newest, last)
+        if newest is not None:
+            stale = chunk[self.on].to_numpy() <= newest
+            if stale.any():
+                self.stale_rows += int(stale.sum())
+                chunk = chunk[~stale].reset_index(drop=True)
+        if buffer is None:
+            return chunk
+        return pd.concat([buffer, chunk], ignore_index=True)
+
+    def push(self, base=None, rover=None):
+        if rover is not None:
+            self.rover = self._append(self.rover, rover, self.last_rover_t)
+        if base is not None:
+            self.base = self._append(self.base, base)
+            # Drop base rows no pending rover row can reach right away, so a
+            # base log that starts long before the rover is not held in full
+            # while the base stream catches up
+            self._trim_base()
+
+    def pending_rows(self):
+        return 0 if self.rover is None else len(self.rover)
+
+    def base_covers_pending(self):
+        # True once every pending rover row has all the base samples it needs
+        if not self.pending_rows():
+            return True
+        if self.base is None or self.base.empty:
+            return False
+        base_end = self.base[self.on].iloc[-1]
+        return base_end >= self.rover[self.on].iloc[-1] + self.reach_ns
+
+    def drain(self, final=False):
+        # Align and return the rover rows that are complete (all of them when
+        # final=True, i.e. the base stream has ended). None if nothing is ready.
+        if not self.pending_rows():
+            return None
+
+        rover_t = self.rover[self.on].to_numpy()
+        if final:
+            ready = len(rover_t)
+        elif self.base is None or self.base.empty:
+            ready = 0
+        else:
+            base_end = self.base[self.on].iloc[-1]
+            ready = np.searchsorted(rover_t, base_end - self.reach_ns, side="right")
+        if ready == 0:
+            return None
+
+        base = self.base if self.base is not None else self.rover.iloc[:0][[self.on]]
+        aligned = align_streams(
+            base,
+            self.rover.iloc[:ready],
+            tolerance_ms=self.tolerance_ms,
+            interpolate=self.interpolate,
+            on=self.on,
+        )
+        self.last_rover_t = rover_t[ready - 1]
+        self.rover = self.rover.iloc[ready:].reset_index(drop=True)
+        self._trim_base()
+        return aligned
+
+    def _trim_base(self):
+        if self.base is None or self.base.empty:
+            return
+        if self.pending_rows():
+            next_t = self.rover[self.on].iloc[0]
+        else:
+            next_t = self.last_rover_t
+        if next_t is None:
+            return
+        # Keep one sample before the cutoff as the left interpolation bracket
+        base_t = self.base[self.on].to_numpy()
+        keep = max(0, np.searchsorted(base_t, next_t - self.reach_ns) - 1)
+        if keep:
+            self.base = self.base.iloc[keep:].reset_index(drop=True)
@@ -0,0 +1,144 @@
+import argparse
+import logging
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from data.catalog import write_catalog
+from data.data_cleaning import DATA_DIR
+from data.gps_time import epoch_ns_to_local
+from data.store import open_store, read_manifest
+from data.streaming import stream_ingest
+
+logger = logging.getLogger(__name__)
+
+# Raw logs come in pairs named base_<session>.csv / rover_<session>.csv, or
+# base_<session>.ubx / rover_<session>.ubx for raw u-blox logs
+BASE_PATTERN = re.compile(r"^base_(?P<session>.+)\.(?P<ext>csv|ubx)$")
+SESSIONS_DIR = os.path.join(DATA_DIR, "sessions")
+
+
+def find_sessions(root):
+    # Walk a directory tree and pair every base log with its rover log
+    sessions = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        # Hidden directories hold caches and generated logs, not sessions
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for filename in sorted(filenames):
+            match = BASE_PATTERN.match(filename)
+            if not match or match["session"].endswith("cleaned"):
+                continue
+            rover = os.path.join(dirpath, f"rover_{match['session']}.{match['ext']}")
+            if not os.path.exists(rover):
+                logger.warning("No rover log for %s", filename)
+                continue
+            rel_dir = os.path.relpath(dirpath, root)
+            session_id = match["session"]
+            if rel_dir != os.curdir:
+                session_id = "/".join(rel_dir.split(os.sep) + [session_id])
+            sessions.append(
+                {
+                    "session_id": session_id,
+                    "base": os.path.join(dirpath, filename),
+                    "rover": rover,
+                }
+            )
+    return sessions
+
+
+def bounding_box(store_path):
+    df = open_store(store_path, columns=["Lat_base", "Lon_base"])
+    lat = df["Lat_base"].to_numpy()
+    lon = df["Lon_base"].to_numpy()
+    # Positions without a base fix are stored as NaN
+    fix = np.isfinite(lat) & np.isfinite(lon)
+    if not fix.any():
+        return None
+    return {
+        "lat_min": float(lat[fix].min()),
+        "lat_max": float(lat[fix].max()),
+        "lon_min": float(lon[fix].min()),
+        "lon_max": float(lon[fix].max()),
+    }
+
+
+def process_session(session, sessions_dir, **options):
+    # Build one session's store and return its catalog entry
+    store_path = os.path.join(sessions_dir, *session["session_id"].split("/"))
+    stats = stream_ingest(session["base"], session["rover"], store_path, **options)
+
+    entry = {
+        "session_id": session["session_id"],
+        "start_ns": None,
+        "end_ns": None,
+        "start": None,
+        "end": None,
+        "duration_s": 0.0,
+        "rows": {
+            # Samples decoded from each log, whatever its format
+            "base": stats["base_rows"],
+            "rover": stats["rover_rows"],
+            "merged": stats["rows_out"],
+        },
+        "bbox": None,
+        "artifacts": {
+            "store": os.path.relpath(store_path, sessions_dir).replace(os.sep, "/"),
+            "base": os.path.abspath(session["base"]),
+            "rover": os.path.abspath(session["rover"]),
+        },
+    }
+    if not stats["rows_out"]:
+        return entry
+
+    start_ns, end_ns = read_manifest(store_path)["time_range"]
+    local = epoch_ns_to_local(np.array([start_ns, end_ns]))
+    entry.update(
+        start_ns=start_ns,
+        end_ns=end_ns,
+        start=local[0].isoformat(),
+        end=local[1].isoformat(),
+        duration_s=(end_ns - start_ns) / 1e9,
+        bbox=bounding_box(store_path),
+    )
+    return entry
+
+
+def _process(args):
+    session, sessions_dir, options = args
+    return process_session(session, sessions_dir, **options)
+
+
+def run_batch(root, sessions_dir=SESSIONS_DIR, workers=None, **options):
+    # Process every session found under root across a process pool and
+    # write the catalog the dashboard uses to switch between sessions
+    sessions = find_sessions(root)
+    jobs = [(session, sessions_dir, options) for session in sessions]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        entries = list(pool.map(_process, jobs))
+
+    write_catalog(sessions_dir, entries)
+    logger.info("Catalogued %d sessions in %s", len(entries), sessions_dir)
+    return entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process all drive sessions")
+    parser.add_argument("root", nargs="?", default=DATA_DIR)
+    parser.add_argument("--out", default=SESSIONS_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-memory-mb", type=float, default=256)
+    parser.add_argument("--tolerance-ms", type=float, default=100)
+    parser.add_argument("--interpolate", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    run_batch(
+        args.root,
+        args.out,
+        workers=args.workers,
+        max_memory_mb=args.max_memory_mb,
+        tolerance_ms=args.tolerance_ms,
+        interpolate=args.interpolate,
+    )
@@ -0,0 +1,34 @@
+import json
+import os
+
+# Index of processed drive sessions, written next to the session stores
+CATALOG = "catalog.json"
+
+
+def catalog_path(sessions_dir):
+    return os.path.join(sessions_dir, CATALOG)
+
+
+def read_catalog(sessions_dir):
+    # List of session entries, empty when no batch run has produced a catalog
+    try:
+        with open(catalog_path(sessions_dir), encoding="utf-8") as f:
+            return json.load(f)["sessions"]
+    except FileNotFoundError:
+        return []
+
+
+def write_catalog(sessions_dir, sessions):
+    os.makedirs(sessions_dir, exist_ok=True)
+    tmp = catalog_path(sessions_dir) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"sessions": sessions}, f, indent=2)
+    os.replace(tmp, catalog_path(sessions_dir))
+
+
+def session_stores(sessions_dir):
+    # session_id -> absolute path of its dataset store
+    return {
+        entry["session_id"]: os.path.join(sessions_dir, entry["artifacts"]["store"])
+        for entry in read_catalog(sessions_dir)
+    }
@@ -1,69 +1,86 @@
+import os
 import pandas as pd
-from datetime import datetime, timedelta
-import pytz
-import logging
+from data.align import align_streams
+from data.gps_time import parse_gps_time, epoch_ns_to_timestamp_int
+from data.pyramid import update_pyramid
+from data.schema import build_dataset
+from data.store import write_store
+from data.ubx import read_ubx
 
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
 
-def clean_and_convert_gps_time(input_file, output_file, encoding="utf-8"):
-    # Step 1: Read the CSV file with the specified encoding
-    df = pd.read_csv(input_file, encoding=encoding)
 
+def clean_frame(df):
     # Remove the row where Index == 0
     df = df[df["Index"] != 0]
 
     # Drop the Index column
-    df.drop(columns=["Index"], inplace=True)
-
-    # Step 2: Convert GPS time to a standard datetime format
-    def gps_time_to_est(gps_time):
-        if isinstance(gps_time, str):
-            try:
-                week_number, tow = map(float, gps_time.split(":"))
-                gps_epoch = datetime(1980, 1, 6, tzinfo=pytz.utc)
-                gps_time_utc = gps_epoch + timedelta(weeks=week_number, seconds=tow)
-                gps_time_utc -= timedelta(seconds=18)  # Adjust for leap seconds
-                est = pytz.timezone("US/Eastern")
-                est_time = gps_time_utc.astimezone(est)  # Convert to EST/EDT
-                return est_time
-            except ValueError as e:
-                logging.error(f"Error converting GPS time '{gps_time}': {e}")
-
-    df["GPS time"] = df["GPS time"].astype(str).apply(gps_time_to_est)
-
-    # Convert GPS time to YMDHHMMSS format
-    df["GPS time"] = df["GPS time"].dt.strftime("%Y%m%d%H%M%S")
+    df = df.drop(columns=["Index"])
 
-    # Step 3: Save the cleaned DataFrame to a file
-    df.to_csv(output_file, index=False)
+    # Convert GPS week:TOW to UTC epoch nanoseconds (vectorized, ms precision)
+    df["epoch_ns"] = parse_gps_time(df["GPS time"])
+
+    # Keep the local YYYYMMDDHHMMSS "GPS time" column the dashboard keys on
+    df["GPS time"] = epoch_ns_to_timestamp_int(df["epoch_ns"].to_numpy())
+    return df
 
 
-clean_and_convert_gps_time("src/data/base_09_04_24.csv", "src/data/base_cleaned.csv")
-clean_and_convert_gps_time("src/data/rover_09_04_24.csv", "src/data/rover_cleaned.csv")
+def is_ubx(input_file):
+    return input_file.lower().endswith(".ubx")
 
 
-def full_join_and_mutate(file1, file2, output_file):
+def read_clean(input_file, encoding="utf-8"):
+    # Raw u-blox logs are decoded straight into the cleaned layout; CSV
+    # exports are read and cleaned
+    if is_ubx(input_file):
+        return read_ubx(input_file)
+    return clean_frame(pd.read_csv(input_file, encoding=encoding))
+
+
+def clean_and_convert_gps_time(input_file, output_file, encoding="utf-8"):
+    # Step 1 and 2: Read the log, drop the header row and convert GPS time
+    df = read_clean(input_file, encoding=encoding)
+
+    # Step 3: Save the cleaned DataFrame to a file
+    df.to_csv(output_file, index=False)
+
+
+def full_join_and_mutate(
+    file1, file2, output_path, tolerance_ms=100, interpolate=False
+):
     # Read the cleaned CSV files
     df1 = pd.read_csv(file1)  # Base cleaned
     df2 = pd.read_csv(file2)  # Rover cleaned
 
-    # Perform a right join with suffixes to distinguish columns
-    merged_df = pd.merge(
-        df1, df2, on="GPS time", how="right", suffixes=("_base", "_rover")
+    # Pair every rover sample with the nearest base sample in time (or the base
+    # channels interpolated onto the rover epoch); one output row per rover row
+    merged_df = align_streams(
+        df1, df2, tolerance_ms=tolerance_ms, interpolate=interpolate
     )
 
-    # Fill missing values with 0 for base columns
-    merged_df.fillna(0, inplace=True)
+    # Create the beta column and other derived channels, then convert to the
+    # compact dataset schema (validity bits instead of zero-filled base columns)
+    merged_df = build_dataset(merged_df)
 
-    # Create the beta column using relPosHeading from rover and CoG from base
-    merged_df["beta"] = merged_df["relPosHeading"] - merged_df["CoG_rover"]
+    # Save the result as a memory-mappable columnar store, plus the aggregate
+    # pyramid used by the time-series plot
+    write_store(merged_df, output_path)
+    update_pyramid(output_path)
 
-    # Save the result to a new CSV file
-    merged_df.to_csv(output_file, index=False)
 
+if __name__ == "__main__":
+    clean_and_convert_gps_time(
+        os.path.join(DATA_DIR, "base_09_04_24.csv"),
+        os.path.join(DATA_DIR, "base_cleaned.csv"),
+    )
+    clean_and_convert_gps_time(
+        os.path.join(DATA_DIR, "rover_09_04_24.csv"),
+        os.path.join(DATA_DIR, "rover_cleaned.csv"),
+    )
 
-# Call the function with the appropriate file paths
-full_join_and_mutate(
-    "src/data/base_cleaned.csv",
-    "src/data/rover_cleaned.csv",
-    "src/data/merged_cleaned.csv",
-)
+    # Call the function with the appropriate file paths
+    full_join_and_mutate(
+        os.path.join(DATA_DIR, "base_cleaned.csv"),
+        os.path.join(DATA_DIR, "rover_cleaned.csv"),
+        os.path.join(DATA_DIR, "merged_cleaned"),
+    )
@@ -0,0 +1,81 @@
+import threading
+
+from data.kinematics import vehicle_kinematics
+from data.store import appended_to, open_store, read_manifest
+from data.time_index import TimeIndex
+
+
+class Dataset:
+    # One version of a store (or one snapshot of the live ring buffer), loaded
+    # once and shared read-only by every session viewing it. Store columns are
+    # read-only memory maps of the store files; never assign to df. Values
+    # derived from the whole dataset are computed on first use and kept here,
+    # so they too exist once per version.
+
+    def __init__(self, df, manifest, store_path=None, time_index=None):
+        self.store_path = store_path
+        self.manifest = manifest
+        self.df = df
+        if time_index is None:
+            time_index = TimeIndex(self.df["epoch_ns"].to_numpy())
+        self.time_index = time_index
+        self._derived = {}
+        # (rows, value) of the derived values of an earlier version with fewer
+        # rows, waiting to be extended over the new rows on first use
+        self._earlier = {}
+        # Reentrant: a derived value may be computed from another one
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_store(cls, store_path, previous=None):
+        # previous: an earlier version of the same store. When rows were only
+        # appended since, the new version extends its derived values instead
+        # of computing them over every row again.
+        manifest = read_manifest(store_path)
+        df = open_store(store_path, manifest=manifest)
+        if previous is not None and appended_to(manifest, previous.manifest):
+            return previous.extended(df, manifest)
+        return cls(df, manifest, store_path)
+
+    def extended(self, df, manifest):
+        # A new version holding this one's rows followed by more. This one is
+        # left as it is for the sessions still viewing it.
+        dataset = Dataset(
+            df,
+            manifest,
+            self.store_path,
+            self.time_index.extended(df["epoch_ns"].to_numpy()),
+        )
+        with self._lock:
+            dataset._earlier = dict(self._earlier)
+            for name, value in self._derived.items():
+                dataset._earlier[name] = (len(self), value)
+        return dataset
+
+    def __len__(self):
+        return len(self.df)
+
+    def derived(self, name, compute, extend=None):
+        # compute(self), run once per dataset even when sessions ask for it
+        # concurrently. With extend, the value of an earlier version is
+        # brought up to date by extend(self, value, rows) instead, where rows
+        # is the earlier version's row count.
+        with self._lock:
+            if name not in self._derived:
+                earlier = self._earlier.pop(name, None)
+                if earlier is not None and extend is not None:
+                    rows, value = earlier
+                    self._derived[name] = extend(self, value, rows)
+                else:
+                    self._derived[name] = compute(self)
+            return self._derived[name]
+
+    def kinematics(self):
+        # Wrapped beta, rates, accelerations and local metres of every row
+        return self.derived(
+            "kinematics",
+            lambda d: vehicle_kinematics(d.df, d.time_index.epoch_ns),
+            lambda d, previous, rows: vehicle_kinematics(
+                d.df, d.time_index.epoch_ns, previous=previous
+            ),
+        )
@@ -0,0 +1,37 @@
+import numpy as np
+
+from data.kinematics import wrap_degrees
+
+MPS_TO_MPH = 2.23694
+
+
+def _speed(df, suffix):
+    return np.sqrt(
+        df[f"VX_{suffix}"] ** 2 + df[f"VY_{suffix}"] ** 2 + df[f"VZ_{suffix}"] ** 2
+    )
+
+
+def _components(speed, heading_deg):
+    # East (X) and north (Y) components of a speed along a compass heading
+    heading = np.radians(heading_deg)
+    return speed * np.sin(heading), speed * np.cos(heading)
+
+
+def add_derived_channels(df):
+    # Channels computed from a merged base/rover frame. Every channel here is
+    # row-local so the function can run on whole sessions or streamed chunks.
+
+    # Create the beta column using relPosHeading from rover and CoG from base,
+    # wrapped so headings either side of north do not differ by ~360°
+    df["beta"] = wrap_degrees(df["relPosHeading"] - df["CoG_rover"])
+
+    # Speeds and the vectors drawn by the segmentation plot
+    df["rover_spd"] = _speed(df, "rover")
+    df["base_spd"] = _speed(df, "base")
+    df["speed_mph"] = df["base_spd"] * MPS_TO_MPH
+    df["vel_cg_X"], df["vel_cg_Y"] = _components(df["rover_spd"], df["CoG_rover"])
+    df["chassis_psi_X"], df["chassis_psi_Y"] = _components(
+        df["rover_spd"], df["relPosHeading"]
+    )
+    df["vel_rear_X"], df["vel_rear_Y"] = _components(df["base_spd"], df["CoG_base"])
+    return df
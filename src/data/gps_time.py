@@ -0,0 +1,212 @@
+import numpy as np
+import pandas as pd
+
+# Seconds between the Unix epoch (1970-01-01) and the GPS epoch (1980-01-06)
+GPS_EPOCH_UNIX = 315964800
+SECONDS_PER_WEEK = 604800
+NS_PER_SECOND = 1_000_000_000
+NS_PER_MS = 1_000_000
+
+# Same value pandas uses for NaT, so invalid rows survive pd.to_datetime
+NAT_NS = np.iinfo(np.int64).min
+
+# GPS - UTC offset in seconds, keyed by the UTC date the leap second took effect
+# Source: IERS Bulletin C. Append a row here when a new leap second is announced.
+LEAP_SECONDS = [
+    ("1981-07-01", 1),
+    ("1982-07-01", 2),
+    ("1983-07-01", 3),
+    ("1985-07-01", 4),
+    ("1988-01-01", 5),
+    ("1990-01-01", 6),
+    ("1991-01-01", 7),
+    ("1992-07-01", 8),
+    ("1993-07-01", 9),
+    ("1994-07-01", 10),
+    ("1996-01-01", 11),
+    ("1997-07-01", 12),
+    ("1999-01-01", 13),
+    ("2006-01-01", 14),
+    ("2009-01-01", 15),
+    ("2012-07-01", 16),
+    ("2015-07-01", 17),
+    ("2017-01-01", 18),
+]
+
+
+def _leap_second_table():
+    # Express every switch-over instant on the GPS time scale (seconds since the
+    # GPS epoch) so lookups can be done directly on the receiver timestamps
+    utc = pd.to_datetime([date for date, _ in LEAP_SECONDS], utc=True)
+    offsets = np.array([offset for _, offset in LEAP_SECONDS], dtype=np.int64)
+    utc_seconds = utc.asi8 // NS_PER_SECOND - GPS_EPOCH_UNIX
+    return utc_seconds + offsets, offsets
+
+
+_LEAP_THRESHOLDS, _LEAP_OFFSETS = _leap_second_table()
+
+
+def leap_seconds_at(gps_seconds):
+    # GPS - UTC offset for each GPS timestamp (0 before the first leap second)
+    idx = np.searchsorted(_LEAP_THRESHOLDS, gps_seconds, side="right")
+    return np.concatenate(([0], _LEAP_OFFSETS))[idx]
+
+
+def split_gps_time(gps_time):
+    # "WWWW:SSSSSS.sss" -> (week, time of week) as float arrays, NaN when malformed.
+    # Strings are parsed as a fixed-width byte matrix: rows sharing a layout
+    # (colon, decimal point, length) are decoded with one matrix-vector product.
+    text = pd.Series(gps_time).fillna("").astype(str).to_numpy(dtype=object)
+    text = text.astype("S")
+    week = np.full(len(text), np.nan)
+    tow = np.full(len(text), np.nan)
+    if len(text) == 0 or text.dtype.itemsize == 0:
+        return week, tow
+
+    width = text.dtype.itemsize
+    chars = text.view(np.uint8).reshape(len(text), width)
+    cols = np.arange(width)
+    length = (chars != 0).sum(axis=1)
+
+    is_colon = chars == ord(":")
+    colon = np.where(is_colon.any(axis=1), is_colon.argmax(axis=1), -1)
+    is_dot = (chars == ord(".")) & (cols > colon[:, None])
+    dot = np.where(is_dot.any(axis=1), is_dot.argmax(axis=1), length)
+
+    layout = (colon + 1) * (width + 1) ** 2 + dot * (width + 1) + length
+    for key in np.unique(layout):
+        c, rest = divmod(int(key), (width + 1) ** 2)
+        d, n = divmod(rest, width + 1)
+        c -= 1
+        if c <= 0 or d <= c + 1:
+            continue  # Missing colon or empty field
+
+        rows = np.flatnonzero(layout == key)
+        sub = chars[rows, :n]
+        number_cols = np.r_[0:c, c + 1 : d, d + 1 : n]
+        digits = sub[:, number_cols]
+        ok = ((digits >= ord("0")) & (digits <= ord("9"))).all(axis=1)
+        digits = digits.astype(np.float64) - ord("0")
+
+        week_weights = np.zeros(len(number_cols))
+        tow_weights = np.zeros(len(number_cols))
+        week_weights[:c] = 10.0 ** np.arange(c - 1, -1, -1)
+        tow_weights[c:] = 10.0 ** (d - 1 - number_cols[c:] + (number_cols[c:] > d))
+
+        week[rows[ok]] = digits[ok] @ week_weights
+        tow[rows[ok]] = digits[ok] @ tow_weights
+    return week, tow
+
+
+def gps_to_epoch_ns(week, tow):
+    # Convert GPS week / time of week to UTC epoch nanoseconds in one NumPy pass.
+    # TOW is rounded to whole milliseconds, which is the receiver's resolution.
+    week = np.asarray(week, dtype=np.float64)
+    tow = np.asarray(tow, dtype=np.float64)
+    valid = np.isfinite(week) & np.isfinite(tow)
+
+    week_i = np.where(valid, week, 0).astype(np.int64)
+    tow_ms = np.rint(np.where(valid, tow, 0) * 1000).astype(np.int64)
+
+    gps_ms = week_i * SECONDS_PER_WEEK * 1000 + tow_ms
+    leap = leap_seconds_at(gps_ms // 1000)
+    epoch_ns = (gps_ms + (GPS_EPOCH_UNIX - leap) * 1000) * NS_PER_MS
+
+    return np.where(valid, epoch_ns, NAT_NS)
+
+
+def parse_gps_time(gps_time):
+    # "WWWW:SSSSSS.sss" strings -> int64 UTC epoch nanoseconds (NAT_NS when invalid)
+    week, tow = split_gps_time(gps_time)
+    return gps_to_epoch_ns(week, tow)
+
+
+def epoch_ns_to_gps(epoch_ns):
+    # UTC epoch nanoseconds -> GPS week and time of week in milliseconds
+    unix_ms = np.floor_divide(np.asarray(epoch_ns, dtype=np.int64), NS_PER_MS)
+    gps_ms = unix_ms - GPS_EPOCH_UNIX * 1000
+    # The offset is looked up on the GPS scale; one refinement step settles it
+    leap = leap_seconds_at(gps_ms // 1000)
+    gps_ms += leap_seconds_at(gps_ms // 1000 + leap) * 1000
+    week, tow_ms = np.divmod(gps_ms, SECONDS_PER_WEEK * 1000)
+    return week, tow_ms
+
+
+def utc_offset_ns(epoch_ns, tz="US/Eastern"):
+    # Local UTC offset for each timestamp. Offsets only change on minute
+    # boundaries, so the timezone database is consulted once per distinct minute.
+    epoch_ns = np.asarray(epoch_ns, dtype=np.int64)
+    valid = epoch_ns != NAT_NS
+    minutes = np.floor_divide(epoch_ns[valid], 60 * NS_PER_SECOND)
+    unique_minutes, inverse = np.unique(minutes, return_inverse=True)
+    utc = pd.DatetimeIndex(unique_minutes * 60 * NS_PER_SECOND, tz="UTC")
+    local = utc.tz_convert(tz).tz_localize(None)
+    offsets = np.zeros(len(epoch_ns), dtype=np.int64)
+    offsets[valid] = (local.asi8 - utc.asi8)[inverse]
+    return offsets
+
+
+def epoch_ns_to_local(epoch_ns, tz="US/Eastern"):
+    # Wall-clock local time as a tz-naive DatetimeIndex (NaT preserved)
+    epoch_ns = np.asarray(epoch_ns, dtype=np.int64)
+    local = np.where(epoch_ns != NAT_NS, epoch_ns + utc_offset_ns(epoch_ns, tz), NAT_NS)
+    return pd.DatetimeIndex(local.view("datetime64[ns]"))
+
+
+def _civil_from_days(days):
+    # Days since 1970-01-01 -> (year, month, day), Howard Hinnant's algorithm
+    z = days + 719468
+    era = np.floor_divide(z, 146097)
+    doe = z - era * 146097
+    yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+    doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+    mp = (5 * doy + 2) // 153
+    day = doy - (153 * mp + 2) // 5 + 1
+    month = np.where(mp < 10, mp + 3, mp - 9)
+    year = yoe + era * 400 + (month <= 2)
+    return year, month, day
+
+
+def _days_from_civil(year, month, day):
+    # (year, month, day) -> days since 1970-01-01, inverse of _civil_from_days
+    year = np.asarray(year, dtype=np.int64) - (np.asarray(month) <= 2)
+    era = np.floor_divide(year, 400)
+    yoe = year - era * 400
+    mp = (np.asarray(month, dtype=np.int64) + 9) % 12
+    doy = (153 * mp + 2) // 5 + np.asarray(day, dtype=np.int64) - 1
+    doe = yoe * 365 + yoe // 4 - yoe // 100 + doy
+    return era * 146097 + doe - 719468
+
+
+def utc_to_epoch_ns(year, month, day, hour, minute, second, nano=0):
+    # Broken-down UTC time (receiver date/time fields) -> int64 epoch nanoseconds
+    days = _days_from_civil(year, month, day)
+    seconds = (
+        days * 86400
+        + np.asarray(hour, dtype=np.int64) * 3600
+        + np.asarray(minute, dtype=np.int64) * 60
+        + np.asarray(second, dtype=np.int64)
+    )
+    return seconds * NS_PER_SECOND + np.asarray(nano, dtype=np.int64)
+
+
+def epoch_ns_to_timestamp_int(epoch_ns, tz="US/Eastern"):
+    # Local time as YYYYMMDDHHMMSS integers, the legacy "GPS time" column format
+    local = epoch_ns_to_local(epoch_ns, tz).asi8
+    valid = local != NAT_NS
+
+    seconds = np.floor_divide(np.where(valid, local, 0), NS_PER_SECOND)
+    days, second_of_day = np.divmod(seconds, 86400)
+    year, month, day = _civil_from_days(days)
+    hour, rest = np.divmod(second_of_day, 3600)
+    minute, second = np.divmod(rest, 60)
+
+    stamp = (
+        year * 10**10
+        + month * 10**8
+        + day * 10**6
+        + hour * 10**4
+        + minute * 10**2
+        + second
+    )
+    return pd.arrays.IntegerArray(stamp.astype(np.int64), ~valid)
@@ -0,0 +1,193 @@
+import argparse
+import io
+import itertools
+import logging
+import os
+import pickle
+import shutil
+import time
+
+import pandas as pd
+
+from data.align import ChunkAligner
+from data.data_cleaning import DATA_DIR, clean_frame
+from data.pyramid import update_pyramid
+from data.schema import build_dataset
+from data.store import append_store, manifest_path, read_manifest, truncate_store
+
+logger = logging.getLogger(__name__)
+
+# Per-store ingest progress: byte offsets into each raw log, the CSV header
+# and the aligner holding rover rows that are still waiting for base data
+STATE_FILE = "ingest_state.pkl"
+
+# Bytes of appended log read per step, so a long backlog (e.g. the first run
+# over a full log) is aligned and stored in bounded pieces
+APPEND_BLOCK_BYTES = 8 << 20
+
+
+def _state_path(store_path):
+    return os.path.join(store_path, STATE_FILE)
+
+
+def _load_state(store_path):
+    try:
+        with open(_state_path(store_path), "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _save_state(store_path, state):
+    tmp = _state_path(store_path) + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(state, f)
+    os.replace(tmp, _state_path(store_path))
+
+
+def read_appended(source, encoding="utf-8"):
+    # Parse the complete lines appended to a log since the recorded offset,
+    # one APPEND_BLOCK_BYTES block at a time. A trailing partial line is left
+    # for the next call.
+    pending = b""
+    with open(source["path"], "rb") as f:
+        f.seek(source["offset"])
+        while block := f.read(APPEND_BLOCK_BYTES):
+            data = pending + block
+            end = data.rfind(b"\n") + 1
+            data, pending = data[:end], data[end:]
+            if not data:
+                continue
+
+            if source["header"] is None:
+                header_end = data.find(b"\n") + 1
+                source["header"], data = data[:header_end], data[header_end:]
+                source["offset"] += header_end
+            source["offset"] += len(data)
+            if not data:
+                continue
+
+            chunk = pd.read_csv(io.BytesIO(source["header"] + data), encoding=encoding)
+            yield clean_frame(chunk)
+
+
+def _new_state(base_file, rover_file, tolerance_ms, interpolate):
+    return {
+        "sources": {
+            "base": {"path": base_file, "offset": 0, "header": None},
+            "rover": {"path": rover_file, "offset": 0, "header": None},
+        },
+        "aligner": ChunkAligner(tolerance_ms=tolerance_ms, interpolate=interpolate),
+        "store_rows": 0,
+    }
+
+
+def _restarted(state):
+    # A log that shrank was rotated or rewritten; its offset no longer applies
+    return any(
+        os.path.getsize(source["path"]) < source["offset"]
+        for source in state["sources"].values()
+    )
+
+
+def _options_changed(state, tolerance_ms, interpolate):
+    # The stored rows were aligned with the options of the saved aligner
+    aligner = state["aligner"]
+    return (aligner.tolerance_ms, aligner.interpolate) != (tolerance_ms, interpolate)
+
+
+def _store_merged(merged, store_path):
+    if merged is None or merged.empty:
+        return 0
+    merged = build_dataset(merged)
+    append_store(merged, store_path)
+    return len(merged)
+
+
+def ingest_appended(
+    base_file,
+    rover_file,
+    store_path,
+    tolerance_ms=100,
+    interpolate=False,
+    final=False,
+    encoding="utf-8",
+):
+    # Process only the rows appended to the base and rover logs since the
+    # last call and append the aligned result to the store. Returns the
+    # number of rows added.
+    state = _load_state(store_path)
+    paths = {"base": base_file, "rover": rover_file}
+    if state is not None and _options_changed(state, tolerance_ms, interpolate):
+        logger.warning(
+            "Alignment options changed (tolerance_ms=%s, interpolate=%s); "
+            "rebuilding %s",
+            tolerance_ms,
+            interpolate,
+            store_path,
+        )
+        state = None
+    if (
+        state is None
+        or any(state["sources"][k]["path"] != v for k, v in paths.items())
+        or _restarted(state)
+    ):
+        # No usable progress record: rebuild the store from the start
+        shutil.rmtree(store_path, ignore_errors=True)
+        state = _new_state(base_file, rover_file, tolerance_ms, interpolate)
+
+    # Discard rows written after the last saved state (interrupted run); they
+    # are produced again because the offsets were not advanced either
+    if os.path.exists(manifest_path(store_path)):
+        truncate_store(store_path, state["store_rows"])
+
+    aligner = state["aligner"]
+    added = 0
+    blocks = itertools.zip_longest(
+        read_appended(state["sources"]["base"], encoding),
+        read_appended(state["sources"]["rover"], encoding),
+    )
+    for base, rover in blocks:
+        aligner.push(base=base, rover=rover)
+        added += _store_merged(aligner.drain(), store_path)
+    added += _store_merged(aligner.drain(final=final), store_path)
+
+    if os.path.exists(store_path):
+        update_pyramid(store_path)
+        state["store_rows"] = read_manifest(store_path)["rows"]
+        _save_state(store_path, state)
+    return added
+
+
+def follow(base_file, rover_file, store_path, interval_s=1.0, **kwargs):
+    # Keep appending new rows while the loggers are writing
+    while True:
+        added = ingest_appended(base_file, rover_file, store_path, **kwargs)
+        if added:
+            logger.info("Appended %d rows", added)
+        time.sleep(interval_s)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append new log rows to the store")
+    parser.add_argument("--base", default=os.path.join(DATA_DIR, "base_09_04_24.csv"))
+    parser.add_argument("--rover", default=os.path.join(DATA_DIR, "rover_09_04_24.csv"))
+    parser.add_argument("--out", default=os.path.join(DATA_DIR, "merged_cleaned"))
+    parser.add_argument("--tolerance-ms", type=float, default=100)
+    parser.add_argument("--interpolate", action="store_true")
+    parser.add_argument("--follow", action="store_true", help="Keep polling the logs")
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument(
+        "--final", action="store_true", help="Flush rover rows still waiting for base"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    options = {"tolerance_ms": args.tolerance_ms, "interpolate": args.interpolate}
+    if args.follow:
+        follow(args.base, args.rover, args.out, args.interval, **options)
+    else:
+        added = ingest_appended(
+            args.base, args.rover, args.out, final=args.final, **options
+        )
+        logger.info("Appended %d rows", added)
@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+
+from data.gps_time import NS_PER_SECOND
+
+# WGS84 ellipsoid
+SEMI_MAJOR_M = 6378137.0
+FLATTENING = 1 / 298.257223563
+ECCENTRICITY2 = FLATTENING * (2 - FLATTENING)
+
+# Samples further apart than this (e.g. the pause between two runs) are not
+# differenced; rates next to such a gap are one-sided, or NaN
+MAX_STEP_S = 2.0
+# Rows per block of vehicle_kinematics(); blocks small enough to stay in the
+# CPU cache keep every intermediate array out of main memory
+BLOCK_ROWS = 1 << 15
+# Positions within this many radians of the origin (about 300 km) use the
+# series expansion in sin_cos_small
+SMALL_ANGLE = 0.05
+
+
+def wrap_degrees(angle):
+    # Angles (or angle differences) to ±180°
+    return angle - 360.0 * np.round(angle / 360.0)
+
+
+def time_steps(t_s, max_step_s=MAX_STEP_S):
+    # 1/dt of every step between rows, and 1/(t[i+1] - t[i-1]) around every
+    # inner row; NaN where a step is a gap or does not move forward in time.
+    # Shared by every derivative() of the same rows.
+    h = np.diff(t_s)
+    usable = (h > 0) & (h <= max_step_s)
+    inv_h = np.divide(1.0, h, out=np.full(h.shape, np.nan), where=usable)
+    span = h[:-1] + h[1:]
+    inv_span = np.divide(
+        1.0, span, out=np.full(span.shape, np.nan), where=usable[:-1] & usable[1:]
+    )
+    return inv_h, inv_span
+
+
+def derivative(values, steps, angle=False):
+    # d(values)/dt per row: central differences, one-sided at the ends, next
+    # to gaps and next to missing values. Angle changes are wrapped, so a
+    # heading crossing north changes by a few degrees, not by 360.
+    inv_h, inv_span = steps
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return np.full(len(values), np.nan)
+    d = np.diff(values)
+    if angle:
+        d = wrap_degrees(d)
+    slopes = d * inv_h
+    rates = np.empty(len(values))
+    rates[1:-1] = (d[:-1] + d[1:]) * inv_span
+    rates[0], rates[-1] = slopes[0], slopes[-1]
+    holes = np.flatnonzero(~np.isfinite(rates[1:-1]))
+    after, before = slopes[holes + 1], slopes[holes]
+    rates[holes + 1] = np.where(np.isfinite(after), after, before)
+    return rates
+
+
+def ned_to_ecef(north, east, down, lat_deg, lon_deg):
+    # Rotate local north/east/down vectors into ECEF X/Y/Z
+    lat, lon = np.radians(lat_deg), np.radians(lon_deg)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_lon, cos_lon = np.sin(lon), np.cos(lon)
+    x = -sin_lat * cos_lon * north - sin_lon * east - cos_lat * cos_lon * down
+    y = -sin_lat * sin_lon * north + cos_lon * east - cos_lat * sin_lon * down
+    z = cos_lat * north - sin_lat * down
+    return x, y, z
+
+
+def ecef_to_ned(x, y, z, lat_deg, lon_deg):
+    lat, lon = np.radians(lat_deg), np.radians(lon_deg)
+    sin_lat, cos_lat = np.sin(lat), np.cos(lat)
+    sin_lon, cos_lon = np.sin(lon), np.cos(lon)
+    north = -sin_lat * cos_lon * x - sin_lat * sin_lon * y + cos_lat * z
+    east = -sin_lon * x + cos_lon * y
+    down = -cos_lat * cos_lon * x - cos_lat * sin_lon * y - sin_lat * z
+    return north, east, down
+
+
+def sin_cos_small(x):
+    # sin and cos of angles within SMALL_ANGLE of 0 from their Taylor series,
+    # exact to well under a millimetre on the ground and several times faster
+    # than np.sin/np.cos; np.sin/np.cos beyond that
+    if np.nanmax(np.abs(x), initial=0.0) > SMALL_ANGLE:
+        return np.sin(x), np.cos(x)
+    x2 = x * x
+    return x * (1 - x2 / 6 * (1 - x2 / 20)), 1 - x2 / 2 * (1 - x2 / 12)
+
+
+def geodetic_to_enu(lat_deg, lon_deg, lat0_deg, lon0_deg):
+    # East/north metres from the origin on its tangent plane (the ECEF
+    # offset rotated into the origin's frame, written out in terms of the
+    # small angles from the origin). The logs carry no height, so every
+    # position is taken on the ellipsoid.
+    lat0 = np.radians(lat0_deg)
+    sin0, cos0 = np.sin(lat0), np.cos(lat0)
+    sin_dlat, cos_dlat = sin_cos_small(np.radians(lat_deg - lat0_deg))
+    sin_dlon, cos_dlon = sin_cos_small(np.radians(lon_deg - lon0_deg))
+    sin_lat = sin0 * cos_dlat + cos0 * sin_dlat
+    cos_lat = cos0 * cos_dlat - sin0 * sin_dlat
+    radius = SEMI_MAJOR_M / np.sqrt(1 - ECCENTRICITY2 * sin_lat**2)
+    radius0 = SEMI_MAJOR_M / np.sqrt(1 - ECCENTRICITY2 * sin0**2)
+    east = radius * cos_lat * sin_dlon
+    north = radius * (cos0 * sin_lat - sin0 * cos_lat * cos_dlon) + (
+        ECCENTRICITY2 * cos0 * (radius0 * sin0 - radius * sin_lat)
+    )
+    return east, north
+
+
+def origin(df):
+    # First base position with a fix (first rover one without any), so the
+    # origin stays put when rows are appended. Positions without a fix are NaN
+    # in the dataset.
+    for suffix in ("base", "rover"):
+        lat = df[f"Lat_{suffix}"].to_numpy()
+        fixes = np.flatnonzero(np.isfinite(lat))
+        if fixes.size:
+            i = fixes[0]
+            return float(lat[i]), float(df[f"Lon_{suffix}"].to_numpy()[i])
+    return None
+
+
+def kinematics_block(columns, epoch_ns, lat0, lon0):
+    # vehicle_kinematics() of consecutive rows; the rates of the first and
+    # last row are one-sided
+    steps = time_steps((epoch_ns - epoch_ns[0]) / NS_PER_SECOND)
+    heading = columns["relPosHeading"]
+    beta = wrap_degrees(heading - columns["CoG_rover"])
+
+    # Accelerations are expressed in the same local frame as the positions:
+    # the ENU frame at the origin
+    a_north, a_east, _ = ecef_to_ned(
+        derivative(columns["VX_rover"], steps),
+        derivative(columns["VY_rover"], steps),
+        derivative(columns["VZ_rover"], steps),
+        lat0,
+        lon0,
+    )
+    psi = np.radians(heading)
+    sin_psi, cos_psi = np.sin(psi), np.cos(psi)
+
+    block = {
+        "beta": beta,
+        "yaw_rate": derivative(heading, steps, angle=True),
+        "beta_rate": derivative(beta, steps, angle=True),
+        "accel_long": a_east * sin_psi + a_north * cos_psi,
+        "accel_lat": a_north * sin_psi - a_east * cos_psi,
+    }
+    for suffix in ("base", "rover"):
+        block[f"east_{suffix}"], block[f"north_{suffix}"] = geodetic_to_enu(
+            columns[f"Lat_{suffix}"], columns[f"Lon_{suffix}"], lat0, lon0
+        )
+    return block
+
+
+# Output columns of vehicle_kinematics() and their dtypes; positions keep
+# float64 like Lat/Lon
+KINEMATICS = {
+    "beta": np.float32,
+    "yaw_rate": np.float32,
+    "beta_rate": np.float32,
+    "accel_long": np.float32,
+    "accel_lat": np.float32,
+    "east_base": np.float64,
+    "north_base": np.float64,
+    "east_rover": np.float64,
+    "north_rover": np.float64,
+}
+
+
+def vehicle_kinematics(df, epoch_ns, block_rows=BLOCK_ROWS, previous=None):
+    # Channels that need the whole series rather than one row, computed in
+    # one vectorized pass over a dataset:
+    #   beta                   side slip, chassis heading minus course, ±180°
+    #   yaw_rate, beta_rate    deg/s
+    #   accel_long/lat         m/s², along the chassis heading and to its
+    #                          left, from the rover (CG) ECEF velocity
+    #   east/north_base/rover  metres from origin(df)
+    # Rows go through in blocks; each block carries one row of its
+    # neighbours so the differences at its edges are central too.
+    # previous is vehicle_kinematics() of the first rows of df, e.g. before
+    # rows were appended: its rows are kept and only the new rows (and its
+    # last row, whose rates were one-sided) are computed, unless the new rows
+    # move the origin.
+    names = (
+        "relPosHeading",
+        "CoG_rover",
+        "VX_rover",
+        "VY_rover",
+        "VZ_rover",
+        "Lat_base",
+        "Lon_base",
+        "Lat_rover",
+        "Lon_rover",
+    )
+    columns = {name: df[name].to_numpy() for name in names}
+    lat0, lon0 = origin(df) or (np.nan, np.nan)
+    n = len(df)
+    data = {name: np.empty(n, dtype) for name, dtype in KINEMATICS.items()}
+    first = 0
+    if (
+        previous is not None
+        and len(previous) > 1
+        and origin(df.iloc[: len(previous)]) == (lat0, lon0)
+    ):
+        first = len(previous) - 1
+        for name, values in data.items():
+            values[:first] = previous[name].to_numpy()[:first]
+    for start in range(first, n, block_rows):
+        stop = min(start + block_rows, n)
+        lo, hi = max(start - 1, 0), min(stop + 1, n)
+        block = kinematics_block(
+            {name: values[lo:hi] for name, values in columns.items()},
+            epoch_ns[lo:hi],
+            lat0,
+            lon0,
+        )
+        for name, values in block.items():
+            data[name][start:stop] = values[start - lo : stop - lo]
+    return pd.DataFrame(data, index=df.index)
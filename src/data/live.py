@@ -0,0 +1,183 @@
+import argparse
+import io
+import logging
+import socket
+import threading
+import time
+
+import pandas as pd
+
+from data.align import ChunkAligner
+from data.data_cleaning import clean_frame
+from data.dataset import Dataset
+from data.ring_buffer import DEFAULT_CAPACITY, RING_NAME, RingBuffer
+from data.schema import build_dataset
+
+logger = logging.getLogger(__name__)
+
+# How often received lines are parsed, aligned and published. Rows reach the
+# ring at most this long (plus the aligner's tolerance) after their last byte.
+FLUSH_INTERVAL_S = 0.1
+RECONNECT_S = 1.0
+# Dashboard side: snapshot age after which a new one is taken
+FOLLOW_INTERVAL_S = 0.5
+# A ring that has not been written for this long may have been replaced by a
+# restarted ingest service
+STALE_S = 5.0
+
+
+def open_source(source):
+    # A receiver's output as a binary line stream: "tcp://host:port" or the
+    # path of a serial device / named pipe
+    if source.startswith("tcp://"):
+        host, _, port = source[len("tcp://") :].rpartition(":")
+        sock = socket.create_connection((host or "localhost", int(port)))
+        return sock.makefile("rb")
+    return open(source, "rb", buffering=0)
+
+
+class LineReader:
+    # Collects complete lines from one receiver on a background thread,
+    # reconnecting when the stream ends. The first line of each connection
+    # is the CSV header.
+
+    def __init__(self, name, source):
+        self.name = name
+        self.source = source
+        self.header = None
+        self._lines = []
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, name=f"read {name}", daemon=True).start()
+
+    def _run(self):
+        while True:
+            try:
+                with open_source(self.source) as stream:
+                    logger.info("%s connected to %s", self.name, self.source)
+                    header = stream.readline()
+                    with self._lock:
+                        self.header = header
+                    for line in stream:
+                        if line.endswith(b"\n"):
+                            with self._lock:
+                                self._lines.append(line)
+            except OSError as e:
+                logger.warning("%s: %s", self.name, e)
+            time.sleep(RECONNECT_S)
+
+    def take(self):
+        # Parsed frame of the lines received since the last call, or None
+        with self._lock:
+            lines, self._lines = self._lines, []
+            header = self.header
+        if not lines or header is None:
+            return None
+        # A garbled line (e.g. cut short by a reconnect) must not stop the
+        # ingest loop: rows with extra fields are skipped, and a batch that
+        # still does not parse is dropped
+        try:
+            chunk = pd.read_csv(
+                io.BytesIO(header + b"".join(lines)), on_bad_lines="skip"
+            )
+            return clean_frame(chunk)
+        except (pd.errors.ParserError, ValueError) as e:
+            logger.warning(
+                "%s: dropped %d unparsable lines: %s", self.name, len(lines), e
+            )
+            return None
+
+
+def ingest(base_source, rover_source, ring, tolerance_ms=100, interval_s=None):
+    # Align the two receiver streams online and publish complete rows (with
+    # beta and the other derived channels) to the ring buffer
+    interval_s = interval_s or FLUSH_INTERVAL_S
+    base = LineReader("base", base_source)
+    rover = LineReader("rover", rover_source)
+    aligner = ChunkAligner(tolerance_ms=tolerance_ms)
+    published = 0
+    stale = 0
+    while True:
+        started = time.monotonic()
+        aligner.push(base=base.take(), rover=rover.take())
+        if aligner.stale_rows != stale:
+            logger.warning(
+                "Dropped %d rows no newer than rows already received",
+                aligner.stale_rows - stale,
+            )
+            stale = aligner.stale_rows
+        merged = aligner.drain()
+        if merged is not None and not merged.empty:
+            ring.write(build_dataset(merged))
+            published += len(merged)
+            logger.debug("Published %d rows (%d total)", len(merged), published)
+        time.sleep(max(interval_s - (time.monotonic() - started), 0.0))
+
+
+class LiveFeed:
+    # Dashboard side of the ring buffer, one per server process. A snapshot
+    # is taken at most every interval_s by whichever session asks first and
+    # shared with the others, like a store version.
+
+    def __init__(self, name=RING_NAME, interval_s=FOLLOW_INTERVAL_S):
+        self.name = name
+        self.interval_s = interval_s
+        self.ring = RingBuffer.attach(name)
+        self._dataset = None
+        self._taken = None
+        self._lock = threading.Lock()
+
+    def _reattach_if_replaced(self):
+        if time.time_ns() - self.ring.last_write_ns < STALE_S * 1e9:
+            return
+        try:
+            ring = RingBuffer.attach(self.name)
+        except FileNotFoundError:
+            return
+        if ring.generation != self.ring.generation:
+            self.ring.close()
+            self.ring = ring
+        else:
+            ring.close()
+
+    def dataset(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._dataset is None or now - self._taken >= self.interval_s:
+                self._reattach_if_replaced()
+                df, first = self.ring.snapshot()
+                manifest = {
+                    "generation": self.ring.generation,
+                    "first": first,
+                    "rows": len(df),
+                    "last_write_ns": self.ring.last_write_ns,
+                }
+                self._dataset = Dataset(df, manifest)
+                self._taken = now
+            return self._dataset
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Align live base/rover receiver output into the shared ring buffer"
+    )
+    parser.add_argument("--base", default="tcp://localhost:5001")
+    parser.add_argument("--rover", default="tcp://localhost:5002")
+    parser.add_argument("--ring", default=RING_NAME)
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY)
+    parser.add_argument("--tolerance-ms", type=float, default=100)
+    parser.add_argument("--interval", type=float, default=FLUSH_INTERVAL_S)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s"
+    )
+    ring = RingBuffer.create(args.ring, args.capacity)
+    logger.info("Ring %s holds the last %d rows", ring.name, ring.capacity)
+    try:
+        ingest(args.base, args.rover, ring, args.tolerance_ms, args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ring.close()
+        ring.unlink()
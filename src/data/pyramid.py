@@ -0,0 +1,180 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from data.gps_time import NS_PER_SECOND
+from data.store import append_store, open_store, read_manifest, truncate_store
+
+# Bucket widths in seconds. Each level is a columnar store under
+# <store>/pyramid/<seconds>s with one row per bucket: the bucket start
+# (epoch_ns), the sample count and <channel>_min/_mean/_max for every channel.
+LEVELS = (1, 10, 60, 600)
+PYRAMID_DIR = "pyramid"
+PYRAMID_STATE = "pyramid.json"
+STATS = ("min", "mean", "max")
+# Bump when the level layout changes so pyramids built by older code are
+# rebuilt rather than appended to
+PYRAMID_FORMAT = 2
+
+# Rows aggregated per pass when building; passes are cut on coarse bucket
+# boundaries so no bucket is split between passes
+CHUNK_ROWS = 1_000_000
+
+
+def pyramid_path(store_path):
+    return os.path.join(store_path, PYRAMID_DIR)
+
+
+def level_path(store_path, seconds):
+    return os.path.join(pyramid_path(store_path), f"{seconds}s")
+
+
+def read_pyramid(store_path):
+    # State of the pyramid (generation and row count of the store it was built
+    # from), or None if the store has no pyramid yet
+    try:
+        with open(
+            os.path.join(pyramid_path(store_path), PYRAMID_STATE), encoding="utf-8"
+        ) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_state(store_path, state):
+    path = os.path.join(pyramid_path(store_path), PYRAMID_STATE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def channels(df):
+    return [c for c in df.columns if c not in ("epoch_ns", "valid")]
+
+
+def aggregate(df, seconds):
+    # min/mean/max per channel over fixed buckets of `seconds` (epoch aligned;
+    # UTC offsets are whole minutes, so buckets also line up in local time)
+    bucket_ns = seconds * NS_PER_SECOND
+    bucket = df["epoch_ns"].to_numpy() // bucket_ns
+    grouped = df[channels(df)].groupby(bucket)
+    stats = grouped.agg(list(STATS))
+    # Each statistic keeps its channel's dtype: float32 for most channels,
+    # float64 for Lat/Lon, whose float32 steps are about a metre
+    stats = stats.astype({(c, s): df[c].dtype for c, s in stats.columns})
+    stats.columns = [f"{column}_{stat}" for column, stat in stats.columns]
+    stats.insert(0, "count", grouped.size().to_numpy(dtype=np.uint32))
+    stats.insert(0, "epoch_ns", stats.index.to_numpy(dtype=np.int64) * bucket_ns)
+    return stats.reset_index(drop=True)
+
+
+def update_pyramid(store_path, chunk_rows=CHUNK_ROWS):
+    # Build the pyramid for a store, or bring it up to date after rows were
+    # appended or truncated. Only coarse buckets from the first changed row on
+    # are recomputed; a rewritten store (new generation) is rebuilt in full.
+    manifest = read_manifest(store_path)
+    rows = manifest["rows"]
+    state = read_pyramid(store_path)
+    if (
+        state is None
+        or state["generation"] != manifest["generation"]
+        or state["levels"] != list(LEVELS)
+        or state.get("format") != PYRAMID_FORMAT
+    ):
+        shutil.rmtree(pyramid_path(store_path), ignore_errors=True)
+        state = {"generation": manifest["generation"], "rows": 0}
+    elif state["rows"] == rows:
+        return
+
+    df = open_store(store_path, manifest=manifest)
+    epoch_ns = df["epoch_ns"].to_numpy()
+    span_ns = LEVELS[-1] * NS_PER_SECOND
+
+    start = 0
+    kept = min(state["rows"], rows)
+    if kept:
+        # The coarse bucket holding the last unchanged row may gain or lose
+        # rows, so recompute every level from its start
+        boundary = epoch_ns[kept - 1] // span_ns * span_ns
+        start = int(np.searchsorted(epoch_ns, boundary))
+        for seconds in LEVELS:
+            level = level_path(store_path, seconds)
+            level_t = open_store(level, ["epoch_ns"])["epoch_ns"].to_numpy()
+            truncate_store(level, int(np.searchsorted(level_t, boundary)))
+
+    while start < rows:
+        end = min(start + chunk_rows, rows)
+        if end < rows:
+            end = int(np.searchsorted(epoch_ns, epoch_ns[end] // span_ns * span_ns))
+            if end <= start:
+                next_bucket = (epoch_ns[start] // span_ns + 1) * span_ns
+                end = int(np.searchsorted(epoch_ns, next_bucket))
+        chunk = df.iloc[start:end]
+        for seconds in LEVELS:
+            append_store(aggregate(chunk, seconds), level_path(store_path, seconds))
+        start = end
+
+    os.makedirs(pyramid_path(store_path), exist_ok=True)
+    state.update(rows=rows, levels=list(LEVELS), format=PYRAMID_FORMAT)
+    _write_state(store_path, state)
+
+
+def choose_level(window_ns, min_points=1000):
+    # Coarsest level that still gives at least min_points buckets over the
+    # window (up to 10x that, see window_means); the finest level otherwise
+    for seconds in reversed(LEVELS):
+        if window_ns // (seconds * NS_PER_SECOND) >= min_points:
+            return seconds
+    return LEVELS[0]
+
+
+def window_means(df, columns, start_ns, end_index, store_path=None, min_points=1000):
+    # Bucket means of `columns` for rows from start_ns up to row end_index,
+    # indexed by bucket start (epoch ns). Complete buckets come from the
+    # pyramid; the bucket holding end_index, and anything the pyramid has not
+    # caught up with yet, is aggregated from the raw rows.
+    epoch_ns = df["epoch_ns"].to_numpy()
+    end_ns = epoch_ns[end_index]
+    seconds = choose_level(end_ns - start_ns, min_points)
+    bucket_ns = seconds * NS_PER_SECOND
+    start_ns = start_ns // bucket_ns * bucket_ns
+
+    state = read_pyramid(store_path) if store_path else None
+    limit_ns = start_ns
+    parts = []
+    if state is not None and state["rows"] and state["rows"] <= len(df):
+        manifest = read_manifest(store_path)
+        if state["generation"] == manifest["generation"]:
+            covered_ns = epoch_ns[state["rows"] - 1]
+            limit_ns = max(start_ns, min(end_ns, covered_ns) // bucket_ns * bucket_ns)
+            level = open_store(
+                level_path(store_path, seconds),
+                ["epoch_ns"] + [f"{c}_mean" for c in columns],
+            )
+            level_t = level["epoch_ns"].to_numpy()
+            lo, hi = np.searchsorted(level_t, [start_ns, limit_ns])
+            means = level.iloc[lo:hi]
+            parts.append(
+                pd.DataFrame(
+                    {c: means[f"{c}_mean"].to_numpy() for c in columns},
+                    index=level_t[lo:hi],
+                )
+            )
+
+    lo = int(np.searchsorted(epoch_ns, limit_ns))
+    tail = df.iloc[lo : end_index + 1][columns]
+    parts.append(
+        tail.groupby(epoch_ns[lo : end_index + 1] // bucket_ns * bucket_ns).mean()
+    )
+    means = pd.concat(parts) if len(parts) > 1 else parts[0]
+
+    # Levels are up to 10x apart, so keep every step-th bucket to stay under
+    # 2x min_points. Buckets are picked by absolute bucket number, so the
+    # points shown do not shift as the window moves.
+    step = len(means) // min_points
+    if step > 1:
+        means = means[means.index.to_numpy() // bucket_ns % step == 0]
+    return means
@@ -0,0 +1,100 @@
+import argparse
+import contextlib
+import io
+import logging
+import os
+import socketserver
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.data_cleaning import DATA_DIR
+from data.gps_time import NAT_NS, parse_gps_time
+
+logger = logging.getLogger(__name__)
+
+
+def load_lines(input_file):
+    # Header, raw data lines and the epoch_ns of each (NaT rows, like the
+    # Index 0 placeholder, are sent together with their neighbours)
+    header, *lines = Path(input_file).read_bytes().splitlines(keepends=True)
+    # Blank lines yield no CSV row, so they would put lines and times out of
+    # step; the times are parsed from exactly the lines that are sent
+    lines = [line for line in lines if line.strip()]
+    gps_time = pd.read_csv(
+        io.BytesIO(header + b"".join(lines)), usecols=["GPS time"], dtype=str
+    )["GPS time"]
+    epoch_ns = pd.Series(parse_gps_time(gps_time))
+    epoch_ns = epoch_ns.mask(epoch_ns == NAT_NS).ffill().bfill()
+    epoch_ns = epoch_ns.to_numpy(dtype=np.int64)
+    return header, lines, epoch_ns
+
+
+class ReplayClock:
+    # Data time shared by every stream, anchored when the first receiver
+    # connects, so base and rover rows come out together
+    def __init__(self, data0_ns, speed):
+        self.data0_ns = data0_ns
+        self.speed = speed
+        self._wall0 = None
+        self._lock = threading.Lock()
+
+    def wait_for(self, epoch_ns):
+        with self._lock:
+            if self._wall0 is None:
+                self._wall0 = time.monotonic()
+        due = self._wall0 + (epoch_ns - self.data0_ns) / 1e9 / self.speed
+        delay = due - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def serve(name, port, recording, clock):
+    header, lines, epoch_ns = recording
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            logger.info("%s: receiver connected on :%d", name, port)
+            self.wfile.write(header)
+            try:
+                for line, ns in zip(lines, epoch_ns, strict=True):
+                    clock.wait_for(ns)
+                    self.wfile.write(line)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            logger.info("%s: end of recording", name)
+
+    server = socketserver.ThreadingTCPServer(("", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay recorded base/rover logs as live receivers on TCP ports"
+    )
+    parser.add_argument("--base", default=os.path.join(DATA_DIR, "base_09_04_24.csv"))
+    parser.add_argument("--rover", default=os.path.join(DATA_DIR, "rover_09_04_24.csv"))
+    parser.add_argument("--base-port", type=int, default=5001)
+    parser.add_argument("--rover-port", type=int, default=5002)
+    parser.add_argument("--speed", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    base = load_lines(args.base)
+    rover = load_lines(args.rover)
+    clock = ReplayClock(min(base[2][0], rover[2][0]), args.speed)
+    serve("base", args.base_port, base, clock)
+    serve("rover", args.rover_port, rover, clock)
+    logger.info(
+        "Replaying at %gx on :%d (base) and :%d (rover)",
+        args.speed,
+        args.base_port,
+        args.rover_port,
+    )
+    with contextlib.suppress(KeyboardInterrupt):
+        threading.Event().wait()
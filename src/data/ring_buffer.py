@@ -0,0 +1,139 @@
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from data.schema import SCHEMA
+
+RING_NAME = "side_slipper_live"
+# About two hours of rover samples at 8 Hz
+DEFAULT_CAPACITY = 1 << 16
+
+# Header: int64 slots at the start of the segment
+MAGIC = 0x53534C52  # "SSLR"
+H_MAGIC, H_CAPACITY, H_GENERATION, H_RESERVED, H_COUNT, H_LAST_WRITE = range(6)
+HEADER_BYTES = 64
+
+
+def _layout(capacity):
+    # Byte offset of every SCHEMA column, each region 8-byte aligned
+    offsets = {}
+    offset = HEADER_BYTES
+    for column, dtype in SCHEMA.items():
+        offsets[column] = offset
+        offset += -(-capacity * np.dtype(dtype).itemsize // 8) * 8
+    return offsets, offset
+
+
+class RingBuffer:
+    # Fixed-capacity table of the last `capacity` dataset rows in shared
+    # memory, one column per SCHEMA entry. One process writes, any number
+    # read. Rows are numbered by a running count; row n lives in slot
+    # n % capacity. The writer announces the rows it is about to overwrite
+    # (H_RESERVED) before touching them and publishes them (H_COUNT) after,
+    # so a reader can drop whatever was overwritten while it copied.
+
+    def __init__(self, shm):
+        self._shm = shm
+        self._header = np.ndarray(HEADER_BYTES // 8, np.int64, shm.buf)
+        if self._header[H_MAGIC] != MAGIC:
+            raise ValueError(f"{shm.name} is not a side-slipper ring buffer")
+        self.capacity = int(self._header[H_CAPACITY])
+        offsets, _ = _layout(self.capacity)
+        self._columns = {
+            column: np.ndarray(self.capacity, dtype, shm.buf, offsets[column])
+            for column, dtype in SCHEMA.items()
+        }
+
+    @classmethod
+    def create(cls, name=RING_NAME, capacity=DEFAULT_CAPACITY):
+        # A new, empty ring; replaces one left behind by a previous writer
+        _, size = _layout(capacity)
+        try:
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+        shm = shared_memory.SharedMemory(name, create=True, size=size)
+        header = np.ndarray(HEADER_BYTES // 8, np.int64, shm.buf)
+        header[:] = 0
+        header[H_CAPACITY] = capacity
+        header[H_GENERATION] = time.time_ns()
+        header[H_MAGIC] = MAGIC
+        del header
+        return cls(shm)
+
+    @classmethod
+    def attach(cls, name=RING_NAME):
+        # Raises FileNotFoundError when no writer has created the ring
+        shm = shared_memory.SharedMemory(name)
+        # Readers must not unlink the writer's segment when they exit
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def generation(self):
+        return int(self._header[H_GENERATION])
+
+    @property
+    def count(self):
+        return int(self._header[H_COUNT])
+
+    @property
+    def last_write_ns(self):
+        return int(self._header[H_LAST_WRITE])
+
+    def _slots(self, first, stop):
+        # Slot ranges holding rows first..stop-1 (at most two, when wrapping)
+        start, end = first % self.capacity, (stop - 1) % self.capacity + 1
+        if start < end:
+            return [(start, end)]
+        return [(start, self.capacity), (0, end)]
+
+    def write(self, df):
+        # Append dataset rows (SCHEMA columns); only the newest `capacity` fit
+        df = df.iloc[-self.capacity :]
+        if df.empty:
+            return
+        count = self.count
+        stop = count + len(df)
+        self._header[H_RESERVED] = stop
+        for column, values in self._columns.items():
+            source = df[column].to_numpy(dtype=values.dtype)
+            done = 0
+            for start, end in self._slots(count, stop):
+                values[start:end] = source[done : done + end - start]
+                done += end - start
+        self._header[H_COUNT] = stop
+        self._header[H_LAST_WRITE] = time.time_ns()
+
+    def snapshot(self):
+        # Copy of the rows currently held, oldest first, and the running
+        # number of the first one
+        count = self.count
+        first = max(count - self.capacity, 0)
+        data = {}
+        for column, values in self._columns.items():
+            if count == first:
+                data[column] = values[:0].copy()
+            else:
+                data[column] = np.concatenate(
+                    [values[a:b] for a, b in self._slots(first, count)]
+                )
+        # Rows the writer started overwriting while they were copied
+        lost = max(int(self._header[H_RESERVED]) - self.capacity - first, 0)
+        df = pd.DataFrame(data, copy=False).iloc[lost:].reset_index(drop=True)
+        return df, first + lost
+
+    def close(self):
+        del self._header, self._columns
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from data.derived import add_derived_channels
+
+# Declared dtypes of the in-memory dataset. Positions keep float64; velocities
+# and angles fit comfortably in float32 (receiver resolution is 0.01 m/s and
+# 1e-5 deg, float32 keeps ~7 significant digits). Time is a single int64
+# UTC epoch column; local wall-clock time is derived on demand.
+SCHEMA = {
+    "epoch_ns": np.int64,
+    "valid": np.uint8,
+    "CoG_base": np.float32,
+    "Lat_base": np.float64,
+    "Lon_base": np.float64,
+    "VX_base": np.float32,
+    "VY_base": np.float32,
+    "VZ_base": np.float32,
+    "CoG_rover": np.float32,
+    "Lat_rover": np.float64,
+    "Lon_rover": np.float64,
+    "VX_rover": np.float32,
+    "VY_rover": np.float32,
+    "VZ_rover": np.float32,
+    "relPosHeading": np.float32,
+    "beta": np.float32,
+    "rover_spd": np.float32,
+    "base_spd": np.float32,
+    "speed_mph": np.float32,
+    "vel_cg_X": np.float32,
+    "vel_cg_Y": np.float32,
+    "chassis_psi_X": np.float32,
+    "chassis_psi_Y": np.float32,
+    "vel_rear_X": np.float32,
+    "vel_rear_Y": np.float32,
+}
+
+# Bits of the "valid" column. Missing values are NaN in the channel columns;
+# the bitmask lets panels select usable rows without comparing floats.
+BASE_MATCHED = 1  # a base sample was paired with this rover row
+BASE_FIX = 2  # Lat_base / Lon_base hold a real position
+ROVER_FIX = 4  # Lat_rover / Lon_rover hold a real position
+
+
+def _position_fix(df, suffix):
+    lat = df[f"Lat_{suffix}"].to_numpy(dtype=np.float64)
+    lon = df[f"Lon_{suffix}"].to_numpy(dtype=np.float64)
+    # Receivers report 0/0 until they have a fix
+    return np.isfinite(lat) & np.isfinite(lon) & ((lat != 0) | (lon != 0))
+
+
+def apply_schema(df):
+    # Convert a merged frame to the declared schema: validity bits instead of
+    # zero sentinels, NaN for positions without a fix, compact dtypes, and
+    # only the epoch time column
+    matched = df["epoch_ns_base"].notna().to_numpy()
+    base_fix = matched & _position_fix(df, "base")
+    rover_fix = _position_fix(df, "rover")
+    valid = (
+        matched * BASE_MATCHED + base_fix * BASE_FIX + rover_fix * ROVER_FIX
+    ).astype(np.uint8)
+
+    data = {"epoch_ns": df["epoch_ns"].to_numpy(dtype=np.int64), "valid": valid}
+    for column in df.columns:
+        if column in ("GPS time", "epoch_ns", "epoch_ns_base"):
+            continue
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+        if column.startswith(("Lat_", "Lon_")):
+            fix = base_fix if column.endswith("_base") else rover_fix
+            values = np.where(fix, values, np.nan)
+        data[column] = values.astype(SCHEMA.get(column, np.float32))
+
+    return pd.DataFrame(data)
+
+
+def build_dataset(merged):
+    # Aligned base/rover frame -> derived channels -> declared schema
+    return apply_schema(add_derived_channels(merged))
+
+
+def memory_usage_mb(df):
+    return df.memory_usage(deep=True, index=True).sum() / 2**20
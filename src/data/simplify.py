@@ -0,0 +1,74 @@
+import numpy as np
+
+# Map tiles are 256 px wide and the world is 360 degrees wide at zoom 0
+TILE_SIZE = 256
+MAX_ZOOM = 20
+
+
+def planar(lat, lon):
+    # Equirectangular projection around the path's mean latitude, in degrees
+    # of latitude; good enough for distances within one drive
+    lat0 = np.radians(np.nanmean(lat))
+    return np.asarray(lon) * np.cos(lat0), np.asarray(lat)
+
+
+def zoom_tolerance(zoom, lat, pixels=1.0):
+    # Ground distance covered by `pixels` screen pixels at a web map zoom
+    # level, in the units of planar()
+    return pixels * 360.0 / (TILE_SIZE * 2**zoom) * np.cos(np.radians(lat))
+
+
+def dp_importance(x, y, min_tolerance=0.0):
+    # Douglas-Peucker split distance of every vertex. A vertex's value is
+    # capped by its parent's, so `importance > tolerance` selects exactly the
+    # Douglas-Peucker simplification for any tolerance. Runs below
+    # min_tolerance are not split further (their vertices get 0).
+    n = len(x)
+    importance = np.zeros(n)
+    if n == 0:
+        return importance
+    importance[0] = importance[-1] = np.inf
+
+    # All segments of one level of the split tree are handled together, so
+    # the Python loop runs once per level rather than once per vertex
+    a = np.array([0])
+    b = np.array([n - 1])
+    parent = np.array([np.inf])
+    while True:
+        inner = b - a >= 2
+        a, b, parent = a[inner], b[inner], parent[inner]
+        if not len(a):
+            return importance
+        # Interior vertices of every segment, segment by segment
+        counts = b - a - 1
+        starts = np.cumsum(counts) - counts
+        segment = np.repeat(np.arange(len(a)), counts)
+        point = np.arange(counts.sum()) - starts[segment] + a[segment] + 1
+
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        length = np.hypot(dx, dy)
+        px, py = x[point] - x[a][segment], y[point] - y[a][segment]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            distance = np.abs(px * dy[segment] - py * dx[segment]) / length[segment]
+        degenerate = (length == 0)[segment]
+        distance[degenerate] = np.hypot(px[degenerate], py[degenerate])
+
+        # First vertex at the largest distance of each segment (a NaN counts
+        # as the largest, as with np.argmax)
+        key = np.where(np.isnan(distance), np.inf, distance)
+        hits = np.flatnonzero(key == np.maximum.reduceat(key, starts)[segment])
+        hits = hits[np.diff(segment[hits], prepend=-1) != 0]
+        split = point[hits]
+        largest = distance[hits]
+
+        keep = ~(largest <= min_tolerance)
+        a, b, parent = a[keep], b[keep], parent[keep]
+        split, largest = split[keep], largest[keep]
+        importance[split] = np.where(parent < largest, parent, largest)
+        a, b = np.concatenate([a, split]), np.concatenate([split, b])
+        parent = np.tile(importance[split], 2)
+
+
+def simplify(importance, tolerance):
+    # Positions of the vertices kept at this tolerance
+    return np.flatnonzero(importance > tolerance)
@@ -0,0 +1,177 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data.align import align_streams
+from data.data_cleaning import DATA_DIR, read_clean
+from data.pyramid import update_pyramid
+from data.schema import build_dataset
+from data.store import manifest_path, read_manifest, write_store
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+
+# Bump a stage's version whenever its logic changes so cached outputs built by
+# the old code are not reused
+STAGE_VERSIONS = {"clean": 1, "merge": 1, "derive": 4}
+
+
+def file_digest(path, cache_dir=CACHE_DIR):
+    # SHA-256 of a file's contents. Digests are remembered per (size, mtime)
+    # so unchanged multi-gigabyte logs are not re-read on every run.
+    index_path = os.path.join(cache_dir, "file_digests.json")
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        index = {}
+
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    entry = index.get(key)
+    if (
+        entry
+        and entry["size"] == stat.st_size
+        and entry["mtime_ns"] == stat.st_mtime_ns
+    ):
+        return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+    index[key] = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": digest.hexdigest(),
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = index_path + f".{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp, index_path)
+    return index[key]["sha256"]
+
+
+def stage_key(name, inputs, params):
+    # A stage's output is identified by its name, version, the keys of its
+    # inputs and its parameters
+    payload = json.dumps(
+        {
+            "stage": name,
+            "version": STAGE_VERSIONS[name],
+            "inputs": inputs,
+            "params": params,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def stage_output(name, key, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, f"{name}-{key[:24]}.pkl")
+
+
+def _save(df, path):
+    tmp = path + f".{os.getpid()}.tmp"
+    df.to_pickle(tmp)
+    os.replace(tmp, path)
+
+
+def _clean_stage(input_file, output, encoding):
+    _save(read_clean(input_file, encoding), output)
+    return output
+
+
+def run_pipeline(
+    base_file,
+    rover_file,
+    store_path,
+    tolerance_ms=100,
+    interpolate=False,
+    encoding="utf-8",
+    cache_dir=CACHE_DIR,
+):
+    # clean(base) | clean(rover) -> merge -> derive -> store. Stages whose key
+    # already has an output in the cache are skipped; the two independent
+    # clean stages run in separate processes.
+    os.makedirs(cache_dir, exist_ok=True)
+    timings = {}
+    start = time.perf_counter()
+
+    clean_keys = {}
+    pending = {}
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        for role, input_file in (("base", base_file), ("rover", rover_file)):
+            digest = file_digest(input_file, cache_dir)
+            key = stage_key("clean", [digest], {"encoding": encoding})
+            clean_keys[role] = key
+            output = stage_output("clean", key, cache_dir)
+            if os.path.exists(output):
+                timings[f"clean_{role}"] = "cached"
+            else:
+                pending[role] = pool.submit(_clean_stage, input_file, output, encoding)
+        for role, future in pending.items():
+            future.result()
+            timings[f"clean_{role}"] = "ran"
+
+    merge_params = {"tolerance_ms": tolerance_ms, "interpolate": interpolate}
+    merge_key = stage_key(
+        "merge", [clean_keys["base"], clean_keys["rover"]], merge_params
+    )
+    merge_out = stage_output("merge", merge_key, cache_dir)
+    if os.path.exists(merge_out):
+        timings["merge"] = "cached"
+    else:
+        base = pd.read_pickle(stage_output("clean", clean_keys["base"], cache_dir))
+        rover = pd.read_pickle(stage_output("clean", clean_keys["rover"], cache_dir))
+        _save(align_streams(base, rover, **merge_params), merge_out)
+        timings["merge"] = "ran"
+
+    derive_key = stage_key("derive", [merge_key], {})
+    if (
+        os.path.exists(manifest_path(store_path))
+        and read_manifest(store_path).get("source") == derive_key
+    ):
+        timings["derive"] = "cached"
+    else:
+        merged = pd.read_pickle(merge_out)
+        write_store(build_dataset(merged), store_path, source=derive_key)
+        timings["derive"] = "ran"
+    update_pyramid(store_path)
+
+    logger.info(
+        "Pipeline finished in %.2f s (%s)",
+        time.perf_counter() - start,
+        ", ".join(f"{stage}: {state}" for stage, state in timings.items()),
+    )
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the cached cleaning pipeline")
+    parser.add_argument("--base", default=os.path.join(DATA_DIR, "base_09_04_24.csv"))
+    parser.add_argument("--rover", default=os.path.join(DATA_DIR, "rover_09_04_24.csv"))
+    parser.add_argument("--out", default=os.path.join(DATA_DIR, "merged_cleaned"))
+    parser.add_argument("--tolerance-ms", type=float, default=100)
+    parser.add_argument("--interpolate", action="store_true")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    run_pipeline(
+        args.base,
+        args.rover,
+        args.out,
+        tolerance_ms=args.tolerance_ms,
+        interpolate=args.interpolate,
+        cache_dir=args.cache_dir,
+    )
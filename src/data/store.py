@@ -0,0 +1,162 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+# On-disk layout of a dataset store directory:
+#   manifest.json   column names, dtypes, row count and time range
+#   col_000.bin ... one raw little-endian array per column, opened with np.memmap
+MANIFEST = "manifest.json"
+STORE_FORMAT = 1
+
+
+def manifest_path(path):
+    return os.path.join(path, MANIFEST)
+
+
+def read_manifest(path):
+    with open(manifest_path(path), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(path, manifest):
+    # Write-then-rename so readers never see a half-written manifest
+    tmp = manifest_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, manifest_path(path))
+
+
+def _column_array(df, column):
+    values = df[column].to_numpy()
+    if values.dtype.kind not in "biuf":
+        raise ValueError(
+            f"Column '{column}' has unsupported dtype {df[column].dtype} for the store"
+        )
+    return np.ascontiguousarray(values, dtype=values.dtype.newbyteorder("<"))
+
+
+def _time_range(df, time_column):
+    if time_column not in df.columns or df.empty:
+        return None
+    times = df[time_column].to_numpy()
+    return [int(times.min()), int(times.max())]
+
+
+def write_store(df, path, time_column="epoch_ns", source=None):
+    # Write a DataFrame as a columnar store, replacing any existing one at path.
+    # `source` is an optional key recorded in the manifest (e.g. a stage hash).
+    tmp = path.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = []
+    for i, column in enumerate(df.columns):
+        values = _column_array(df, column)
+        file_name = f"col_{i:03d}.bin"
+        values.tofile(os.path.join(tmp, file_name))
+        columns.append({"name": column, "dtype": values.dtype.str, "file": file_name})
+
+    _write_manifest(
+        tmp,
+        {
+            "format": STORE_FORMAT,
+            "generation": time.time_ns(),
+            "rows": len(df),
+            "time_column": time_column,
+            "time_range": _time_range(df, time_column),
+            "columns": columns,
+            "source": source,
+        },
+    )
+
+    replace_store(tmp, path)
+
+
+def replace_store(src, path):
+    # Swap a finished store directory into place
+    old = path.rstrip(os.sep) + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(src, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def append_store(df, path, time_column="epoch_ns"):
+    # Append rows to a store (creating it if needed). Column bytes are written
+    # first and the manifest last, so readers only ever see complete rows.
+    if not os.path.exists(manifest_path(path)):
+        write_store(df, path, time_column)
+        return
+
+    manifest = read_manifest(path)
+    names = [column["name"] for column in manifest["columns"]]
+    if list(df.columns) != names:
+        raise ValueError(f"Columns {list(df.columns)} do not match store {names}")
+
+    rows = manifest["rows"]
+    for column in manifest["columns"]:
+        dtype = np.dtype(column["dtype"])
+        values = _column_array(df, column["name"]).astype(dtype, copy=False)
+        with open(os.path.join(path, column["file"]), "r+b") as f:
+            # Drop any bytes left behind by an interrupted append
+            f.truncate(rows * dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            values.tofile(f)
+
+    new_range = _time_range(df, time_column)
+    if new_range is not None:
+        old_range = manifest["time_range"] or new_range
+        manifest["time_range"] = [
+            min(old_range[0], new_range[0]),
+            max(old_range[1], new_range[1]),
+        ]
+    manifest["rows"] = rows + len(df)
+    _write_manifest(path, manifest)
+
+
+def appended_to(manifest, previous):
+    # Whether the store (or ring buffer snapshot) `manifest` describes is the
+    # one `previous` describes with rows appended: rows already seen keep
+    # their values and positions
+    return (
+        manifest["generation"] == previous["generation"]
+        and manifest.get("first", 0) == previous.get("first", 0)
+        and manifest["rows"] >= previous["rows"]
+    )
+
+
+def truncate_store(path, rows):
+    # Drop rows past `rows`; only the manifest changes, append_store reclaims
+    # the bytes on its next write
+    manifest = read_manifest(path)
+    if rows < manifest["rows"]:
+        manifest["rows"] = rows
+        time_column = manifest["time_column"]
+        kept = open_store(path, [time_column], manifest)
+        manifest["time_range"] = _time_range(kept, time_column)
+        _write_manifest(path, manifest)
+
+
+def open_store(path, columns=None, manifest=None):
+    # Open a store as a DataFrame backed by read-only memory maps. Nothing is
+    # read up front; pages are loaded only for the columns and rows touched.
+    manifest = manifest or read_manifest(path)
+    rows = manifest["rows"]
+
+    data = {}
+    for column in manifest["columns"]:
+        if columns is not None and column["name"] not in columns:
+            continue
+        dtype = np.dtype(column["dtype"])
+        if rows == 0:
+            data[column["name"]] = np.empty(0, dtype=dtype)
+        else:
+            data[column["name"]] = np.memmap(
+                os.path.join(path, column["file"]), dtype=dtype, mode="r", shape=(rows,)
+            )
+    return pd.DataFrame(data, copy=False)
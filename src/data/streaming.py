@@ -0,0 +1,121 @@
+import argparse
+import logging
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from data.align import ChunkAligner
+from data.data_cleaning import DATA_DIR, clean_frame, is_ubx
+from data.pyramid import update_pyramid
+from data.schema import build_dataset
+from data.store import append_store, replace_store
+from data.ubx import read_ubx_chunks
+
+logger = logging.getLogger(__name__)
+
+# Rough working-set cost of one row while it moves through clean -> align ->
+# derive: raw CSV text, parsed columns and the temporaries in between
+BYTES_PER_ROW = 2048
+
+
+def chunk_rows_for(max_memory_mb):
+    # At most two chunks of each stream are resident at the same time
+    return max(1_000, int(max_memory_mb * 2**20) // (4 * BYTES_PER_ROW))
+
+
+def read_clean_chunks(input_file, chunk_rows, encoding="utf-8"):
+    if is_ubx(input_file):
+        yield from read_ubx_chunks(input_file, chunk_rows)
+        return
+    for chunk in pd.read_csv(input_file, encoding=encoding, chunksize=chunk_rows):
+        yield clean_frame(chunk)
+
+
+def stream_ingest(
+    base_file,
+    rover_file,
+    store_path,
+    max_memory_mb=256,
+    tolerance_ms=100,
+    interpolate=False,
+    encoding="utf-8",
+):
+    # Clean -> align -> derive -> write in bounded-size chunks, so peak memory
+    # depends on max_memory_mb and not on the length of the logs
+    chunk_rows = chunk_rows_for(max_memory_mb)
+    aligner = ChunkAligner(tolerance_ms=tolerance_ms, interpolate=interpolate)
+    base_chunks = read_clean_chunks(base_file, chunk_rows, encoding)
+    rover_chunks = read_clean_chunks(rover_file, chunk_rows, encoding)
+
+    # Build into a staging store and swap it in once complete
+    staging = store_path.rstrip(os.sep) + ".partial"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    stats = {"chunk_rows": chunk_rows, "base_rows": 0, "rover_rows": 0, "rows_out": 0}
+    start = time.perf_counter()
+
+    def write(merged):
+        if merged is None or merged.empty:
+            return
+        merged = build_dataset(merged)
+        append_store(merged, staging)
+        stats["rows_out"] += len(merged)
+
+    base_done = False
+    for rover in rover_chunks:
+        stats["rover_rows"] += len(rover)
+        aligner.push(rover=rover)
+
+        # Pull base chunks until the base stream covers this rover chunk
+        while not base_done and not aligner.base_covers_pending():
+            base = next(base_chunks, None)
+            if base is None:
+                base_done = True
+            else:
+                stats["base_rows"] += len(base)
+                aligner.push(base=base)
+
+        write(aligner.drain(final=base_done))
+    write(aligner.drain(final=True))
+    # Base rows past the end of the rover log match nothing, but count them
+    # so base_rows covers the whole log
+    for base in base_chunks:
+        stats["base_rows"] += len(base)
+
+    if stats["rows_out"]:
+        update_pyramid(staging)
+        replace_store(staging, store_path)
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_s"] = stats["rows_out"] / max(stats["seconds"], 1e-9)
+    logger.info(
+        "Streamed %d rows in %.2f s (%.0f rows/s, %d-row chunks)",
+        stats["rows_out"],
+        stats["seconds"],
+        stats["rows_per_s"],
+        chunk_rows,
+    )
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream raw logs into the store")
+    parser.add_argument("--base", default=os.path.join(DATA_DIR, "base_09_04_24.csv"))
+    parser.add_argument("--rover", default=os.path.join(DATA_DIR, "rover_09_04_24.csv"))
+    parser.add_argument("--out", default=os.path.join(DATA_DIR, "merged_cleaned"))
+    parser.add_argument("--max-memory-mb", type=float, default=256)
+    parser.add_argument("--tolerance-ms", type=float, default=100)
+    parser.add_argument("--interpolate", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    stream_ingest(
+        args.base,
+        args.rover,
+        args.out,
+        max_memory_mb=args.max_memory_mb,
+        tolerance_ms=args.tolerance_ms,
+        interpolate=args.interpolate,
+    )
@@ -0,0 +1,48 @@
+import numpy as np
+
+from data.gps_time import NS_PER_SECOND, epoch_ns_to_local
+
+
+class TimeIndex:
+    # Lookups over the sorted epoch_ns column of a dataset. Every lookup is a
+    # binary search, so cost does not depend on the session length.
+
+    def __init__(self, epoch_ns, tz="US/Eastern"):
+        self.epoch_ns = np.asarray(epoch_ns)
+        self.tz = tz
+
+    def __len__(self):
+        return len(self.epoch_ns)
+
+    def extended(self, epoch_ns):
+        # The index of a dataset with rows appended to this one's (the new
+        # array starts with the old one). This index stays as it is for the
+        # sessions still viewing the old rows.
+        return TimeIndex(epoch_ns, self.tz)
+
+    def window(self, end_index, seconds=None):
+        # Rows from `seconds` before row end_index up to and including it
+        # (every row up to end_index when seconds is None)
+        start = 0
+        if seconds:
+            start_ns = self.epoch_ns[end_index] - int(seconds * NS_PER_SECOND)
+            start = int(np.searchsorted(self.epoch_ns, start_ns, side="left"))
+        return slice(start, end_index + 1)
+
+    def seek(self, index, seconds):
+        # First row at or after `seconds` from row index, clamped to the data
+        target_ns = self.epoch_ns[index] + int(seconds * NS_PER_SECOND)
+        new_index = np.searchsorted(self.epoch_ns, target_ns, side="left")
+        return int(min(new_index, len(self.epoch_ns) - 1))
+
+    def labels(self, indices, fmt="%H:%M:%S"):
+        # Local wall-clock labels for the given rows, formatted in one pass
+        return (
+            epoch_ns_to_local(self.epoch_ns[np.asarray(indices)], self.tz)
+            .strftime(fmt)
+            .tolist()
+        )
+
+    def times(self, rows=slice(None)):
+        # Local wall-clock times of a slice of rows
+        return epoch_ns_to_local(self.epoch_ns[rows], self.tz)
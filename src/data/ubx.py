@@ -0,0 +1,384 @@
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from data.gps_time import (
+    NAT_NS,
+    NS_PER_SECOND,
+    _civil_from_days,
+    epoch_ns_to_gps,
+    epoch_ns_to_timestamp_int,
+    utc_to_epoch_ns,
+)
+from data.kinematics import ecef_to_ned, ned_to_ecef
+
+logger = logging.getLogger(__name__)
+
+# UBX frame: B5 62 | class | id | length (u16) | payload | CK_A CK_B
+SYNC = b"\xb5\x62"
+HEADER_BYTES = 6
+FRAME_OVERHEAD = 8
+
+# Payload layouts (u-blox M8/F9 interface description), little-endian
+NAV_PVT = np.dtype(
+    {
+        "names": [
+            "iTOW", "year", "month", "day", "hour", "min", "sec", "valid",
+            "tAcc", "nano", "fixType", "flags", "flags2", "numSV",
+            "lon", "lat", "height", "hMSL", "hAcc", "vAcc",
+            "velN", "velE", "velD", "gSpeed", "headMot", "sAcc", "headAcc",
+            "pDOP", "flags3", "headVeh", "magDec", "magAcc",
+        ],
+        "formats": [
+            "<u4", "<u2", "u1", "u1", "u1", "u1", "u1", "u1",
+            "<u4", "<i4", "u1", "u1", "u1", "u1",
+            "<i4", "<i4", "<i4", "<i4", "<u4", "<u4",
+            "<i4", "<i4", "<i4", "<i4", "<i4", "<u4", "<u4",
+            "<u2", "u1", "<i4", "<i2", "<u2",
+        ],
+        "offsets": [
+            0, 4, 6, 7, 8, 9, 10, 11,
+            12, 16, 20, 21, 22, 23,
+            24, 28, 32, 36, 40, 44,
+            48, 52, 56, 60, 64, 68, 72,
+            76, 78, 84, 88, 90,
+        ],
+        "itemsize": 92,
+    }
+)  # fmt: skip
+
+NAV_RELPOSNED = np.dtype(
+    {
+        "names": [
+            "version", "refStationId", "iTOW",
+            "relPosN", "relPosE", "relPosD", "relPosLength", "relPosHeading",
+            "relPosHPN", "relPosHPE", "relPosHPD", "relPosHPLength",
+            "accN", "accE", "accD", "accLength", "accHeading", "flags",
+        ],
+        "formats": [
+            "u1", "<u2", "<u4",
+            "<i4", "<i4", "<i4", "<i4", "<i4",
+            "i1", "i1", "i1", "i1",
+            "<u4", "<u4", "<u4", "<u4", "<u4", "<u4",
+        ],
+        "offsets": [
+            0, 2, 4,
+            8, 12, 16, 20, 24,
+            32, 33, 34, 35,
+            36, 40, 44, 48, 52, 60,
+        ],
+        "itemsize": 64,
+    }
+)  # fmt: skip
+
+# (class, id) -> payload dtype of the messages decoded here. Every other
+# message is framed over and skipped.
+MESSAGES = {
+    "NAV-PVT": ((0x01, 0x07), NAV_PVT),
+    "NAV-RELPOSNED": ((0x01, 0x3C), NAV_RELPOSNED),
+}
+
+PVT_VALID_DATE_TIME = 0x03  # validDate | validTime
+PVT_GNSS_FIX_OK = 0x01
+RELPOSNED_HEADING_VALID = 0x100
+
+# Bytes scanned per step; only the candidate frames of one block are gathered
+# at a time, so memory stays bounded for any file size
+BLOCK_BYTES = 16 << 20
+# NAV-PVT messages held back at the end of each chunk of read_ubx_chunks():
+# the NAV-RELPOSNED of their epoch may still be in the next block
+HOLD_BACK = 16
+
+
+def checksum(rows):
+    # 8-bit Fletcher over class, id, length and payload, one row per frame.
+    # CK_B is the running sum of CK_A, i.e. each byte weighted by the number
+    # of bytes from it to the end, so both sums come out of one matrix
+    # product. float32 is exact while the weighted sum stays below 2**24,
+    # which holds for frames up to ~360 bytes.
+    n = rows.shape[1]
+    dtype = np.float32 if 255 * n * (n + 1) // 2 < 2**24 else np.float64
+    weights = np.stack([np.ones(n), np.arange(n, 0, -1)], axis=1).astype(dtype)
+    sums = (rows.astype(dtype) @ weights).astype(np.int64) & 0xFF
+    return sums[:, 0].astype(np.uint8), sums[:, 1].astype(np.uint8)
+
+
+def scan_blocks(buf, stats, messages=MESSAGES):
+    # Frame-sync a UBX byte buffer (e.g. a memory map) one BLOCK_BYTES block
+    # at a time, yielding one structured array per message type for each
+    # block, decoded without per-message Python objects. Candidates are every
+    # B5 62 whose class, id and length match a known message; of those,
+    # frames with a bad checksum or starting inside an earlier frame are
+    # dropped. A frame is decoded with the block it starts in, reading past
+    # the block's end as far as it reaches. Counts are added to stats.
+    types = list(messages.values())
+    lengths = {key: dtype.itemsize for key, dtype in types}
+    max_frame = max(lengths.values()) + FRAME_OVERHEAD
+    previous_end = 0
+
+    for block in range(0, len(buf), BLOCK_BYTES):
+        view = np.asarray(buf[block : block + BLOCK_BYTES + max_frame])
+        limit = min(BLOCK_BYTES, len(view) - FRAME_OVERHEAD + 1)
+        if limit <= 0:
+            break
+        starts = np.flatnonzero(view[:limit] == SYNC[0])
+        starts = starts[view[starts + 1] == SYNC[1]]
+
+        candidates = []
+        for name, ((msg_class, msg_id), dtype) in messages.items():
+            length = dtype.itemsize
+            frame = length + FRAME_OVERHEAD
+            if frame > len(view):
+                # The tail of a log, too short to hold this message
+                candidates.append((name, starts[:0], None, starts[:0], frame))
+                continue
+            at = starts[starts + frame <= len(view)]
+            at = at[
+                (view[at + 2] == msg_class)
+                & (view[at + 3] == msg_id)
+                & (view[at + 4] == length & 0xFF)
+                & (view[at + 5] == length >> 8)
+            ]
+            # Each candidate frame as one row of a strided view of the block;
+            # indexing it copies whole rows instead of single bytes
+            rows = sliding_window_view(view, frame)[at, 2:]
+            ck_a, ck_b = checksum(rows[:, :-2])
+            ok = (ck_a == rows[:, -2]) & (ck_b == rows[:, -1])
+            stats["bad_checksum"] += int((~ok).sum())
+            candidates.append((name, at[ok], rows, np.flatnonzero(ok), frame))
+
+        # Sync bytes can occur inside payloads; a real frame never starts
+        # inside the previous one
+        all_starts = np.concatenate([c[1] for c in candidates])
+        all_ends = np.concatenate([c[1] + c[4] for c in candidates])
+        order = np.argsort(all_starts, kind="stable")
+        ends = np.maximum.accumulate(all_ends[order])
+        prior = np.concatenate(([previous_end - block], ends[:-1]))
+        keep = np.empty(len(order), dtype=bool)
+        keep[order] = all_starts[order] >= prior
+        if len(ends):
+            previous_end = block + int(ends[-1])
+        stats["overlapping"] += int((~keep).sum())
+
+        decoded = {}
+        offset = 0
+        for name, at, rows, ok, _ in candidates:
+            kept = keep[offset : offset + len(at)]
+            offset += len(at)
+            if kept.any():
+                payloads = rows[ok[kept], 4:-2]
+                decoded[name] = payloads.view(messages[name][1]).ravel()
+            else:
+                decoded[name] = np.empty(0, messages[name][1])
+            stats["frames"] += int(kept.sum())
+        yield decoded
+
+
+def scan(buf, messages=MESSAGES):
+    # Every message of a buffer; returns ({name: structured array}, stats)
+    stats = {"bytes": len(buf), "frames": 0, "bad_checksum": 0, "overlapping": 0}
+    found = {name: [] for name in messages}
+    for decoded in scan_blocks(buf, stats, messages):
+        for name, values in decoded.items():
+            found[name].append(values)
+    decoded = {
+        name: np.concatenate(parts) if parts else np.empty(0, messages[name][1])
+        for name, parts in found.items()
+    }
+    return decoded, stats
+
+
+def map_log(path):
+    # A .ubx log as a read-only byte array; pages are read as they are scanned
+    if os.path.getsize(path) == 0:
+        return np.empty(0, np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+def read_messages(path):
+    # Memory-map a .ubx log and decode its NAV-PVT / NAV-RELPOSNED messages
+    return scan(map_log(path))
+
+
+def to_clean_frame(messages, heading=None):
+    # Decoded messages -> the frame clean_frame produces from a receiver CSV
+    # export: GPS time, CoG, Lat, Lon, VX, VY, VZ (ECEF m/s), relPosHeading
+    # when the log has NAV-RELPOSNED, and epoch_ns. One row per NAV-PVT with a
+    # valid UTC date and time. heading=True/False forces relPosHeading in or
+    # out (NaN without NAV-RELPOSNED), so the chunks of one log agree.
+    pvt = messages["NAV-PVT"]
+    timed = (pvt["valid"] & PVT_VALID_DATE_TIME) == PVT_VALID_DATE_TIME
+    if not timed.all():
+        pvt = pvt[timed]
+    epoch_ns = utc_to_epoch_ns(
+        pvt["year"], pvt["month"], pvt["day"],
+        pvt["hour"], pvt["min"], pvt["sec"], pvt["nano"],
+    )  # fmt: skip
+    # Receiver time is kept at the export's millisecond resolution
+    epoch_ns = np.rint(epoch_ns / 1e6).astype(np.int64) * 1_000_000
+
+    # Like the CSV exports, positions read 0/0 until the receiver has a fix
+    fix = (pvt["flags"] & PVT_GNSS_FIX_OK).astype(bool)
+    lat = pvt["lat"] * 1e-7
+    lon = pvt["lon"] * 1e-7
+    vx, vy, vz = ned_to_ecef(
+        pvt["velN"] * 1e-3, pvt["velE"] * 1e-3, pvt["velD"] * 1e-3, lat, lon
+    )
+    columns = {
+        "GPS time": epoch_ns_to_timestamp_int(epoch_ns),
+        "CoG": pvt["headMot"] * 1e-5,
+        "Lat": np.where(fix, lat, 0.0),
+        "Lon": np.where(fix, lon, 0.0),
+        "VX": vx,
+        "VY": vy,
+        "VZ": vz,
+    }
+
+    relpos = messages["NAV-RELPOSNED"]
+    if heading is None:
+        heading = len(relpos) > 0
+    if heading and not len(relpos):
+        columns["relPosHeading"] = np.full(len(pvt), np.nan)
+    elif heading:
+        # NAV-RELPOSNED is output for the same navigation epoch as NAV-PVT
+        itow = relpos["iTOW"]
+        order = np.arange(len(itow))
+        if np.any(itow[1:] < itow[:-1]):
+            order = np.argsort(itow, kind="stable")
+            itow = itow[order]
+        at = np.minimum(np.searchsorted(itow, pvt["iTOW"]), len(itow) - 1)
+        match = order[at]
+        ok = (itow[at] == pvt["iTOW"]) & (
+            (relpos["flags"][match] & RELPOSNED_HEADING_VALID) != 0
+        )
+        degrees = relpos["relPosHeading"][match] * 1e-5
+        columns["relPosHeading"] = np.where(ok, degrees, np.nan)
+
+    columns["epoch_ns"] = epoch_ns
+    return pd.DataFrame(columns)
+
+
+def read_ubx(path):
+    # A raw receiver log straight to a cleaned frame, no CSV in between
+    messages, stats = read_messages(path)
+    logger.debug("%s: %s", path, stats)
+    return to_clean_frame(messages)
+
+
+def read_ubx_chunks(path, chunk_rows):
+    # read_ubx() as frames of about chunk_rows rows, decoding one block of the
+    # log at a time, so memory does not grow with the log. Whether the frames
+    # carry relPosHeading is decided by the first block.
+    buf = map_log(path)
+    stats = {"bytes": len(buf), "frames": 0, "bad_checksum": 0, "overlapping": 0}
+    pvt = np.empty(0, NAV_PVT)
+    relpos = np.empty(0, NAV_RELPOSNED)
+    heading = None
+    for decoded in scan_blocks(buf, stats):
+        pvt = np.concatenate([pvt, decoded["NAV-PVT"]])
+        relpos = np.concatenate([relpos, decoded["NAV-RELPOSNED"]])
+        if heading is None:
+            heading = len(relpos) > 0
+        while len(pvt) >= chunk_rows + HOLD_BACK:
+            ready, pvt = pvt[:chunk_rows], pvt[chunk_rows:]
+            yield to_clean_frame(
+                {"NAV-PVT": ready, "NAV-RELPOSNED": relpos}, heading=heading
+            )
+            # Solutions of the epochs handed out are not needed again
+            relpos = relpos[~np.isin(relpos["iTOW"], ready["iTOW"])]
+    if len(pvt):
+        yield to_clean_frame({"NAV-PVT": pvt, "NAV-RELPOSNED": relpos}, heading=heading)
+    logger.debug("%s: %s", path, stats)
+
+
+def encode(msg_class, msg_id, payloads):
+    # Structured payload array -> bytes of one UBX frame per element
+    payloads = np.ascontiguousarray(payloads)
+    length = payloads.dtype.itemsize
+    frames = np.empty((len(payloads), length + FRAME_OVERHEAD), dtype=np.uint8)
+    frames[:, 0], frames[:, 1] = SYNC[0], SYNC[1]
+    frames[:, 2], frames[:, 3] = msg_class, msg_id
+    frames[:, 4], frames[:, 5] = length & 0xFF, length >> 8
+    frames[:, HEADER_BYTES:-2] = payloads.view(np.uint8).reshape(-1, length)
+    frames[:, -2], frames[:, -1] = checksum(frames[:, 2:-2])
+    return frames
+
+
+def from_clean_frame(df):
+    # A cleaned receiver frame -> UBX bytes (NAV-PVT, plus NAV-RELPOSNED when
+    # the frame has relPosHeading), interleaved per epoch as a receiver logs
+    # them. Used to build test logs from the CSV exports.
+    df = df[df["epoch_ns"] != NAT_NS]
+    epoch_ns = df["epoch_ns"].to_numpy(dtype=np.int64)
+    _, tow_ms = epoch_ns_to_gps(epoch_ns)
+    seconds, nano = np.divmod(epoch_ns, NS_PER_SECOND)
+    days, second_of_day = np.divmod(seconds, 86400)
+    year, month, day = _civil_from_days(days)
+
+    lat = df["Lat"].to_numpy(dtype=np.float64)
+    lon = df["Lon"].to_numpy(dtype=np.float64)
+    fix = (lat != 0) | (lon != 0)
+    north, east, down = ecef_to_ned(
+        df["VX"].to_numpy(dtype=np.float64),
+        df["VY"].to_numpy(dtype=np.float64),
+        df["VZ"].to_numpy(dtype=np.float64),
+        lat,
+        lon,
+    )
+
+    pvt = np.zeros(len(df), NAV_PVT)
+    pvt["iTOW"] = tow_ms
+    pvt["year"], pvt["month"], pvt["day"] = year, month, day
+    pvt["hour"] = second_of_day // 3600
+    pvt["min"] = second_of_day // 60 % 60
+    pvt["sec"] = second_of_day % 60
+    pvt["nano"] = nano
+    pvt["valid"] = PVT_VALID_DATE_TIME
+    pvt["fixType"] = np.where(fix, 3, 0)
+    pvt["flags"] = np.where(fix, PVT_GNSS_FIX_OK, 0)
+    pvt["lat"] = np.rint(lat * 1e7)
+    pvt["lon"] = np.rint(lon * 1e7)
+    pvt["velN"] = np.rint(north * 1e3)
+    pvt["velE"] = np.rint(east * 1e3)
+    pvt["velD"] = np.rint(down * 1e3)
+    pvt["headMot"] = np.rint(df["CoG"].to_numpy(dtype=np.float64) * 1e5)
+    frames = [encode(*MESSAGES["NAV-PVT"][0], pvt)]
+
+    if "relPosHeading" in df:
+        heading = df["relPosHeading"].to_numpy(dtype=np.float64)
+        relpos = np.zeros(len(df), NAV_RELPOSNED)
+        relpos["version"] = 1
+        relpos["iTOW"] = tow_ms
+        relpos["relPosHeading"] = np.rint(np.nan_to_num(heading) * 1e5)
+        relpos["flags"] = np.where(np.isfinite(heading), RELPOSNED_HEADING_VALID, 0)
+        frames.append(encode(*MESSAGES["NAV-RELPOSNED"][0], relpos))
+
+    # Row i of every message type belongs to epoch i
+    return np.concatenate(frames, axis=1).tobytes()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Decode a u-blox UBX log")
+    parser.add_argument("input")
+    parser.add_argument("--csv", help="Write the cleaned frame to this CSV file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    start = time.perf_counter()
+    messages, stats = read_messages(args.input)
+    seconds = time.perf_counter() - start
+    logger.info(
+        "%d frames from %.1f MB in %.3f s (%.1f M messages/s); %s",
+        stats["frames"],
+        stats["bytes"] / 2**20,
+        seconds,
+        stats["frames"] / max(seconds, 1e-9) / 1e6,
+        ", ".join(f"{name}: {len(rows)}" for name, rows in messages.items()),
+    )
+    if args.csv:
+        to_clean_frame(messages).to_csv(args.csv, index=False)
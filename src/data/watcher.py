@@ -0,0 +1,173 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+from data.store import MANIFEST, manifest_path
+
+logger = logging.getLogger(__name__)
+
+# Quiet time after the last write before a change is published, so a burst of
+# writes (columns, then the manifest) counts as one update
+DEBOUNCE_S = 0.5
+POLL_INTERVAL_S = 1.0
+
+# inotify(7) constants
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT_HEADER = struct.Struct("iIII")
+
+# The manifest is written last (by rename) on every append, and whole stores
+# are swapped in by renaming their directory, so these are the only events
+# that mean new data
+STORE_EVENTS = IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF
+PARENT_EVENTS = IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE
+
+
+class Inotify:
+    # Minimal ctypes binding for inotify; raises OSError where unavailable
+    def __init__(self):
+        name = ctypes.util.find_library("c")
+        if name is None:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(path), ctypes.c_uint32(mask | IN_ONLYDIR)
+        )
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"Cannot watch {path}")
+        return wd
+
+    def read(self, timeout):
+        # (wd, mask, name) events, or [] after `timeout` seconds
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0").decode()
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class StoreWatcher:
+    # Watches one dataset store from a single background thread and counts
+    # its updates. Sessions compare `version` with the one they loaded, so the
+    # number of viewers does not change how often the disk is checked.
+
+    def __init__(self, store_path, debounce=DEBOUNCE_S, poll_interval=POLL_INTERVAL_S):
+        self.store_path = os.path.abspath(store_path)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.version = 0
+        self.backend = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"watch {self.store_path}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _publish(self):
+        self.version += 1
+        logger.info("%s changed (version %d)", self.store_path, self.version)
+
+    def _run(self):
+        try:
+            inotify = Inotify()
+            parent_wd = inotify.add_watch(
+                os.path.dirname(self.store_path), PARENT_EVENTS
+            )
+        except OSError as e:
+            logger.info("inotify unavailable (%s); polling %s", e, self.store_path)
+            self.backend = "polling"
+            self._poll()
+            return
+        self.backend = "inotify"
+        try:
+            self._watch(inotify, parent_wd)
+        finally:
+            inotify.close()
+
+    def _watch_store(self, inotify):
+        # The store directory is replaced on every rewrite, so its watch is
+        # re-added whenever a new one appears
+        try:
+            return inotify.add_watch(self.store_path, STORE_EVENTS)
+        except OSError:
+            return None
+
+    def _watch(self, inotify, parent_wd):
+        store_name = os.path.basename(self.store_path)
+        store_wd = self._watch_store(inotify)
+        deadline = None
+        while not self._stop.is_set():
+            timeout = self.poll_interval
+            if deadline is not None:
+                timeout = max(deadline - time.monotonic(), 0.0)
+            for wd, mask, name in inotify.read(timeout):
+                if wd == parent_wd and name == store_name:
+                    if mask & (IN_MOVED_TO | IN_CREATE):
+                        store_wd = self._watch_store(inotify)
+                elif wd != store_wd or (name and name != MANIFEST):
+                    continue
+                elif mask & IN_IGNORED:
+                    store_wd = None
+                    continue
+                deadline = time.monotonic() + self.debounce
+            if deadline is not None and time.monotonic() >= deadline:
+                deadline = None
+                self._publish()
+
+    def _poll(self):
+        # Fallback: one stat of the manifest per interval for the whole process
+        def stamp():
+            try:
+                return os.stat(manifest_path(self.store_path)).st_mtime_ns
+            except OSError:
+                return None
+
+        last = stamp()
+        deadline = None
+        while not self._stop.wait(
+            self.poll_interval if deadline is None else self.debounce
+        ):
+            current = stamp()
+            if current != last:
+                last = current
+                deadline = time.monotonic() + self.debounce
+            elif deadline is not None and time.monotonic() >= deadline:
+                deadline = None
+                self._publish()
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+
+from data.gps_time import NS_PER_SECOND
+
+
+class WindowAggregator:
+    # Running per-bucket means over a sliding range of rows. Moving the range
+    # by a few rows only adds or evicts the rows at its edges, so a playback
+    # step costs O(step) instead of O(window). Jumps larger than the window
+    # (or that do not overlap it) rebuild from scratch.
+    #
+    # Buckets are kept in growable arrays with free space at both ends:
+    # _ids[lo:hi] bucket numbers, _rows row count, _sums/_counts per-column
+    # sums and counts of finite values.
+
+    def __init__(self, columns, bucket_seconds=1):
+        self.columns = list(columns)
+        self.bucket_ns = int(bucket_seconds * NS_PER_SECOND)
+        self.start = 0
+        self.end = 0
+        self.rebuilds = 0
+        self.last_rows = 0
+        self._allocate(64)
+
+    def _allocate(self, capacity, keep=None):
+        k = len(self.columns)
+        buffers = (
+            np.zeros(capacity, dtype=np.int64),
+            np.zeros(capacity, dtype=np.int64),
+            np.zeros((capacity, k)),
+            np.zeros((capacity, k), dtype=np.int64),
+        )
+        lo = (capacity - (0 if keep is None else self._hi - self._lo)) // 2
+        hi = lo
+        if keep is not None:
+            hi = lo + self._hi - self._lo
+            for new, old in zip(buffers, self._buffers(), strict=True):
+                new[lo:hi] = old[self._lo : self._hi]
+        self._ids, self._rows, self._sums, self._counts = buffers
+        self._lo, self._hi = lo, hi
+
+    def _buffers(self):
+        return self._ids, self._rows, self._sums, self._counts
+
+    def _reserve(self, front=0, back=0):
+        if self._lo >= front and len(self._ids) - self._hi >= back:
+            return
+        size = self._hi - self._lo
+        self._allocate(max(64, 2 * (size + front + back)), keep=True)
+
+    def _stats(self, df, epoch_ns, a, b):
+        # Per-bucket row counts, sums and finite counts of rows [a, b)
+        ids = epoch_ns[a:b] // self.bucket_ns
+        values = np.empty((b - a, len(self.columns)))
+        for i, column in enumerate(self.columns):
+            values[:, i] = df[column].to_numpy()[a:b]
+        finite = np.isfinite(values)
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        return (
+            ids[starts],
+            np.diff(np.r_[starts, len(ids)]),
+            np.add.reduceat(np.where(finite, values, 0.0), starts, axis=0),
+            np.add.reduceat(finite.astype(np.int64), starts, axis=0),
+        )
+
+    def _add_back(self, stats):
+        ids, rows, sums, counts = stats
+        if self._hi > self._lo and self._ids[self._hi - 1] == ids[0]:
+            self._merge(self._hi - 1, rows[0], sums[0], counts[0])
+            ids, rows, sums, counts = ids[1:], rows[1:], sums[1:], counts[1:]
+        self._reserve(back=len(ids))
+        new = slice(self._hi, self._hi + len(ids))
+        for buffer, values in zip(
+            self._buffers(), (ids, rows, sums, counts), strict=True
+        ):
+            buffer[new] = values
+        self._hi = new.stop
+
+    def _add_front(self, stats):
+        ids, rows, sums, counts = stats
+        if self._hi > self._lo and self._ids[self._lo] == ids[-1]:
+            self._merge(self._lo, rows[-1], sums[-1], counts[-1])
+            ids, rows, sums, counts = ids[:-1], rows[:-1], sums[:-1], counts[:-1]
+        self._reserve(front=len(ids))
+        new = slice(self._lo - len(ids), self._lo)
+        for buffer, values in zip(
+            self._buffers(), (ids, rows, sums, counts), strict=True
+        ):
+            buffer[new] = values
+        self._lo = new.start
+
+    def _merge(self, i, rows, sums, counts):
+        self._rows[i] += rows
+        self._sums[i] += sums
+        self._counts[i] += counts
+
+    def _remove(self, stats, at_front):
+        # The removed rows are the first (or last) rows of the range, so their
+        # buckets are the first (or last) buckets held
+        ids, rows, sums, counts = stats
+        n = len(ids)
+        held = (
+            slice(self._lo, self._lo + n) if at_front else slice(self._hi - n, self._hi)
+        )
+        self._rows[held] -= rows
+        self._sums[held] -= sums
+        self._counts[held] -= counts
+        # Drop rounding residue once a column has no values left in a bucket
+        self._sums[held][self._counts[held] == 0] = 0.0
+        emptied = self._rows[held] == 0
+        if at_front:
+            self._lo += int(np.argmin(emptied)) if not emptied.all() else n
+        else:
+            self._hi -= int(np.argmin(emptied[::-1])) if not emptied.all() else n
+
+    def rebuild(self, df, epoch_ns, start, end):
+        self._lo = self._hi = len(self._ids) // 2
+        self.start = self.end = start
+        self.rebuilds += 1
+        if end > start:
+            self._add_back(self._stats(df, epoch_ns, start, end))
+        self.end = end
+        self.last_rows = end - start
+
+    def update(self, df, epoch_ns, start, end):
+        # Move the aggregated range to rows [start, end)
+        overlaps = max(self.start, start) < min(self.end, end)
+        step = abs(start - self.start) + abs(end - self.end)
+        if not overlaps or step > end - start:
+            self.rebuild(df, epoch_ns, start, end)
+            return
+
+        if start > self.start:
+            self._remove(self._stats(df, epoch_ns, self.start, start), at_front=True)
+        if end < self.end:
+            self._remove(self._stats(df, epoch_ns, end, self.end), at_front=False)
+        if start < self.start:
+            self._add_front(self._stats(df, epoch_ns, start, self.start))
+        if end > self.end:
+            self._add_back(self._stats(df, epoch_ns, self.end, end))
+        self.start, self.end = start, end
+        self.last_rows = step
+
+    def means(self):
+        # Bucket means indexed by bucket start (epoch ns); NaN where a column
+        # had no finite values in a bucket
+        held = slice(self._lo, self._hi)
+        counts = self._counts[held]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, self._sums[held] / counts, np.nan)
+        return pd.DataFrame(
+            means, index=self._ids[held] * self.bucket_ns, columns=self.columns
+        )
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.align import ChunkAligner, align_streams
+
+T0 = 1_725_489_206_084 * 1_000_000
+
+
+def stream(rng, n, start_ms, period_ms=143, jitter_ms=3):
+    t = start_ms + np.arange(n) * period_ms + rng.integers(0, jitter_ms, n)
+    return pd.DataFrame(
+        {
+            "GPS time": np.arange(n),
+            "CoG": rng.uniform(0, 360, n),
+            "VX": rng.normal(size=n),
+            "epoch_ns": T0 + t * 1_000_000,
+        }
+    )
+
+
+def chunks(df, rng, max_rows):
+    start = 0
+    while start < len(df):
+        stop = start + int(rng.integers(1, max_rows))
+        yield df.iloc[start:stop]
+        start = stop
+
+
+def stream_align(base, rover, rng, tolerance_ms, interpolate, max_rows=300):
+    # The pull loop of data.streaming.stream_ingest; returns the aligned
+    # frame and the most base rows held at once
+    aligner = ChunkAligner(tolerance_ms=tolerance_ms, interpolate=interpolate)
+    base_chunks = chunks(base, rng, max_rows)
+    out, held, base_done = [], 0, False
+    for chunk in chunks(rover, rng, max_rows):
+        aligner.push(rover=chunk)
+        while not base_done and not aligner.base_covers_pending():
+            b = next(base_chunks, None)
+            if b is None:
+                base_done = True
+            else:
+                aligner.push(base=b)
+                held = max(held, len(aligner.base))
+        out.append(aligner.drain(final=base_done))
+    out.append(aligner.drain(final=True))
+    return pd.concat([o for o in out if o is not None], ignore_index=True), held
+
+
+@pytest.mark.parametrize("interpolate", [False, True])
+@pytest.mark.parametrize("base_lead_ms", [-60_000, 0, 600_000])
+def test_chunked_matches_whole(interpolate, base_lead_ms):
+    rng = np.random.default_rng(abs(base_lead_ms) + interpolate)
+    base = stream(rng, 8_000, 0)
+    rover = stream(rng, 6_000, base_lead_ms)
+    expected = align_streams(base, rover, tolerance_ms=100, interpolate=interpolate)
+    got, _ = stream_align(base, rover, rng, 100, interpolate)
+    pd.testing.assert_frame_equal(got, expected)
+
+
+def test_base_lead_is_not_held():
+    # The base log starts 10 minutes (~4,200 rows) before the rover; only
+    # about one chunk of base rows may be resident at a time
+    rng = np.random.default_rng(7)
+    base = stream(rng, 8_000, 0)
+    rover = stream(rng, 2_000, 600_000)
+    _, held = stream_align(base, rover, rng, 100, False, max_rows=300)
+    assert held <= 2 * 300
+
+
+def test_restarted_streams_are_dropped():
+    # Both receivers reconnect and resend their last 500 rows, as after a
+    # dropped connection or a replay starting over; the resent rows must not
+    # break the time order the aligner searches in
+    rng = np.random.default_rng(3)
+    base = stream(rng, 4_000, 0)
+    rover = stream(rng, 3_000, 0)
+    aligner = ChunkAligner(tolerance_ms=100)
+    out = []
+    for lo, hi in ((0, 1_500), (1_000, 3_000)):
+        aligner.push(base=base.iloc[lo:hi], rover=rover.iloc[lo:hi])
+        out.append(aligner.drain())
+    aligner.push(base=base.iloc[3_000:])
+    out.append(aligner.drain(final=True))
+    got = pd.concat([o for o in out if o is not None], ignore_index=True)
+    pd.testing.assert_frame_equal(got, align_streams(base, rover, tolerance_ms=100))
+    assert aligner.stale_rows == 2 * 500
+
+
+@pytest.mark.parametrize("interpolate", [False, True])
+def test_rover_rows_wait_for_base(interpolate):
+    # Rover rows are only emitted once the base stream has passed them by the
+    # aligner's reach; final=True flushes the rest
+    rng = np.random.default_rng(11)
+    base = stream(rng, 1_000, 0)
+    rover = stream(rng, 1_000, 0)
+    aligner = ChunkAligner(tolerance_ms=100, interpolate=interpolate)
+    aligner.push(rover=rover)
+    assert aligner.drain() is None
+
+    aligner.push(base=base.iloc[:500])
+    first = aligner.drain()
+    reached = base["epoch_ns"].iloc[499] - aligner.reach_ns
+    assert len(first) == (rover["epoch_ns"] <= reached).sum()
+
+    aligner.push(base=base.iloc[500:])
+    got = pd.concat([first, aligner.drain(final=True)], ignore_index=True)
+    expected = align_streams(base, rover, tolerance_ms=100, interpolate=interpolate)
+    pd.testing.assert_frame_equal(got, expected)
@@ -0,0 +1,90 @@
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from components.seg_plot import seg_frame
+from components.veh_map import extend_map_path, map_path
+from data.align import align_streams
+from data.data_cleaning import DATA_DIR, clean_frame
+from data.dataset import Dataset
+from data.schema import build_dataset
+from data.simplify import planar, simplify, zoom_tolerance
+from data.store import append_store, write_store
+
+
+@pytest.fixture(scope="module")
+def sample():
+    # The recorded session as the dataset rows the store holds
+    base, rover = (
+        clean_frame(pd.read_csv(os.path.join(DATA_DIR, f"{role}_09_04_24.csv")))
+        for role in ("base", "rover")
+    )
+    return build_dataset(align_streams(base, rover))
+
+
+def derive(dataset):
+    return (
+        dataset.kinematics(),
+        dataset.derived("map_path", map_path, extend_map_path),
+        seg_frame(dataset),
+    )
+
+
+def max_offset(x, y, kept):
+    # Largest distance of a vertex from the segment of the simplified line
+    # that spans it
+    offset = 0.0
+    for a, b in itertools.pairwise(kept):
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        px, py = x[a : b + 1] - x[a], y[a : b + 1] - y[a]
+        length = np.hypot(dx, dy)
+        if length == 0:
+            distance = np.hypot(px, py)
+        else:
+            distance = np.abs(px * dy - py * dx) / length
+        offset = max(offset, distance.max())
+    return offset
+
+
+def test_appends_extend_derived_values(sample, tmp_path):
+    store = str(tmp_path / "store")
+    write_store(sample.iloc[:12_000], store)
+    dataset = Dataset.from_store(store)
+    derive(dataset)
+    first = dataset
+    for stop in (12_001, 15_000, 25_000, len(sample)):
+        append_store(sample.iloc[len(dataset) : stop], store)
+        dataset = Dataset.from_store(store, previous=dataset)
+        kinematics, path, frame = derive(dataset)
+
+        full = Dataset.from_store(store)
+        pd.testing.assert_frame_equal(kinematics, full.kinematics())
+        pd.testing.assert_frame_equal(frame, seg_frame(full))
+        reference = map_path(full)
+        np.testing.assert_array_equal(path["fix_index"], reference["fix_index"])
+        np.testing.assert_array_equal(path["lat"], reference["lat"])
+        # Simplified in runs between joints, every fix still stays within
+        # the tolerance of the simplified line
+        x, y = planar(path["lat"], path["lon"])
+        for zoom in (12, 16):
+            tolerance = zoom_tolerance(zoom, path["mean_lat"])
+            kept = simplify(path["importance"], tolerance)
+            assert max_offset(x, y, kept) <= tolerance * 1.01
+
+    # Older versions are left as they were for the sessions viewing them
+    assert len(first) == len(first.time_index) == len(first.kinematics()) == 12_000
+
+
+def test_rewritten_store_is_not_extended(sample, tmp_path):
+    store = str(tmp_path / "store")
+    write_store(sample.iloc[:5_000], store)
+    dataset = Dataset.from_store(store)
+    derive(dataset)
+    write_store(sample.iloc[5_000:12_000], store)
+    rewritten = Dataset.from_store(store, previous=dataset)
+    pd.testing.assert_frame_equal(
+        rewritten.kinematics(), Dataset.from_store(store).kinematics()
+    )
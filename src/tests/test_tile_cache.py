@@ -0,0 +1,23 @@
+from tiles.cache import open_caches
+
+
+def test_limit_is_shared_by_all_styles(tmp_path):
+    # Ten 100 kB tiles per style under a 1 MB limit: the oldest tiles go
+    # first, whichever style they belong to
+    caches = open_caches(["Default", "Dark"], str(tmp_path), max_bytes=1_000_000)
+    tile = bytes(100_000)
+    for x in range(10):
+        caches["Default"].put(10, x, 0, tile)
+        caches["Dark"].put(10, x, 0, tile)
+    assert sum(cache.size_bytes() for cache in caches.values()) <= 1_000_000
+    assert (10, 9, 0) in caches["Default"] and (10, 9, 0) in caches["Dark"]
+    assert (10, 0, 0) not in caches["Default"] and (10, 0, 0) not in caches["Dark"]
+
+    # A recently read tile outlives newer tiles of the other style
+    caches["Default"].get(10, 6, 0)
+    for x in range(10, 14):
+        caches["Dark"].put(10, x, 0, tile)
+    assert (10, 6, 0) in caches["Default"]
+    assert (10, 7, 0) not in caches["Default"]
+    for cache in caches.values():
+        cache.close()
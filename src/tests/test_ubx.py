@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data import ubx
+from data.gps_time import NAT_NS
+
+T0 = 1_725_489_206_084 * 1_000_000
+
+
+@pytest.fixture
+def clean():
+    # A cleaned receiver frame as clean_frame() makes it from a CSV export:
+    # no fix for the first rows, headings crossing north, missing headings
+    rng = np.random.default_rng(0)
+    n = 2_000
+    epoch_ns = T0 + np.cumsum(rng.choice([142, 143, 144], n)) * 1_000_000
+    fix = np.arange(n) >= 50
+    lat = np.where(fix, 29.1885 + np.cumsum(rng.normal(0, 1e-5, n)), 0.0)
+    lon = np.where(fix, -81.0455 + np.cumsum(rng.normal(0, 1e-5, n)), 0.0)
+    heading = (350 + np.cumsum(rng.normal(0, 0.5, n))) % 360
+    heading[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame(
+        {
+            "CoG": np.round(rng.uniform(0, 360, n), 2),
+            "Lat": np.round(lat, 7),
+            "Lon": np.round(lon, 7),
+            "VX": np.round(rng.normal(0, 10, n), 2),
+            "VY": np.round(rng.normal(0, 10, n), 2),
+            "VZ": np.round(rng.normal(0, 1, n), 2),
+            "relPosHeading": np.round(heading, 5),
+            "epoch_ns": epoch_ns,
+        }
+    )
+
+
+def decode(raw):
+    messages, stats = ubx.scan(np.frombuffer(raw, dtype=np.uint8))
+    return ubx.to_clean_frame(messages), stats
+
+
+def assert_same_samples(got, clean):
+    np.testing.assert_array_equal(got["epoch_ns"], clean["epoch_ns"])
+    np.testing.assert_allclose(got["Lat"], clean["Lat"], atol=1e-7)
+    np.testing.assert_allclose(got["Lon"], clean["Lon"], atol=1e-7)
+    np.testing.assert_allclose(got["CoG"], clean["CoG"], atol=1e-5)
+    # Velocities go through NED at mm/s resolution
+    for column in ("VX", "VY", "VZ"):
+        np.testing.assert_allclose(got[column], clean[column], atol=2e-3)
+    np.testing.assert_allclose(
+        got["relPosHeading"], clean["relPosHeading"], atol=1e-5, equal_nan=True
+    )
+
+
+def test_round_trip(clean):
+    got, stats = decode(ubx.from_clean_frame(clean))
+    assert stats["frames"] == 2 * len(clean)
+    assert stats["bad_checksum"] == stats["overlapping"] == 0
+    assert_same_samples(got, clean)
+
+
+def test_placeholder_rows_are_not_encoded(clean):
+    with_placeholder = pd.concat(
+        [clean.iloc[:1].assign(epoch_ns=NAT_NS), clean], ignore_index=True
+    )
+    got, _ = decode(ubx.from_clean_frame(with_placeholder))
+    assert_same_samples(got, clean)
+
+
+def test_noise_and_corrupt_frames_are_skipped(clean):
+    # Garbage (including stray sync bytes) between epochs, and one NAV-PVT
+    # frame with a flipped payload byte, which must be dropped
+    rng = np.random.default_rng(1)
+    parts = []
+    for i in range(len(clean)):
+        raw = bytearray(ubx.from_clean_frame(clean.iloc[i : i + 1]))
+        if i == 100:
+            raw[ubx.HEADER_BYTES + 10] ^= 0xFF
+        parts.append(bytes(raw))
+        noise = rng.integers(0, 256, rng.integers(0, 40), dtype=np.uint8)
+        parts.append(ubx.SYNC + noise.tobytes())
+    got, stats = decode(b"".join(parts))
+    assert stats["bad_checksum"] >= 1
+    assert len(got) == len(clean) - 1
+    assert_same_samples(got, clean.drop(index=100).reset_index(drop=True))
+
+
+def test_frames_across_block_boundaries(clean, monkeypatch):
+    # Blocks smaller than a frame and not aligned to frames
+    raw = ubx.from_clean_frame(clean)
+    expected, _ = decode(raw)
+    monkeypatch.setattr(ubx, "BLOCK_BYTES", 61)
+    got, stats = decode(raw)
+    assert stats["overlapping"] == 0
+    pd.testing.assert_frame_equal(got, expected)
+
+
+def test_read_ubx_file(clean, tmp_path):
+    path = tmp_path / "rover.ubx"
+    path.write_bytes(ubx.from_clean_frame(clean))
+    assert_same_samples(ubx.read_ubx(str(path)), clean)
+    (tmp_path / "empty.ubx").write_bytes(b"")
+    assert ubx.read_ubx(str(tmp_path / "empty.ubx")).empty
+
+
+def test_read_ubx_chunks(clean, tmp_path, monkeypatch):
+    path = tmp_path / "rover.ubx"
+    path.write_bytes(ubx.from_clean_frame(clean))
+    expected = ubx.read_ubx(str(path))
+    monkeypatch.setattr(ubx, "BLOCK_BYTES", 4_000)
+    chunks = list(ubx.read_ubx_chunks(str(path), 300))
+    assert all(len(chunk) <= 300 + ubx.HOLD_BACK for chunk in chunks)
+    assert all(list(chunk.columns) == list(expected.columns) for chunk in chunks)
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks, ignore_index=True), expected.reset_index(drop=True)
+    )
+
+
+def test_base_log_has_no_heading_column(clean, tmp_path, monkeypatch):
+    # A base receiver logs NAV-PVT only; no chunk may grow a heading column
+    path = tmp_path / "base.ubx"
+    path.write_bytes(ubx.from_clean_frame(clean.drop(columns="relPosHeading")))
+    monkeypatch.setattr(ubx, "BLOCK_BYTES", 4_000)
+    chunks = list(ubx.read_ubx_chunks(str(path), 300))
+    assert all("relPosHeading" not in chunk.columns for chunk in chunks)
+    assert_same_samples(
+        pd.concat(chunks, ignore_index=True).assign(relPosHeading=np.nan),
+        clean.assign(relPosHeading=np.nan),
+    )
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.gps_time import NS_PER_SECOND
+from data.window_agg import WindowAggregator
+
+COLUMNS = ["a", "b"]
+
+
+@pytest.fixture
+def session():
+    # ~7 Hz samples with a few long gaps and missing values
+    rng = np.random.default_rng(0)
+    steps = rng.choice(
+        [143, 143, 142, 144, 5_000], size=5_000, p=[0.3, 0.3, 0.2, 0.19, 0.01]
+    )
+    epoch_ns = 1_725_489_206_084 * 1_000_000 + np.cumsum(steps) * 1_000_000
+    df = pd.DataFrame(
+        {
+            "a": rng.normal(size=len(steps)).astype(np.float32),
+            "b": rng.normal(size=len(steps)),
+        }
+    )
+    df.loc[rng.random(len(df)) < 0.1, "a"] = np.nan
+    df.loc[1000:1100, "b"] = np.nan
+    return df, epoch_ns
+
+
+def recompute(df, epoch_ns, start, end):
+    rows = slice(start, end)
+    return (
+        df.iloc[rows][COLUMNS]
+        .astype(np.float64)
+        .groupby(epoch_ns[rows] // NS_PER_SECOND * NS_PER_SECOND)
+        .mean()
+    )
+
+
+def test_incremental_matches_recompute(session):
+    df, epoch_ns = session
+    rng = np.random.default_rng(1)
+    agg = WindowAggregator(COLUMNS)
+    start, end = 0, 200
+    for _ in range(3_000):
+        move = rng.random()
+        if move < 0.6:
+            # Playback: slide by a few rows
+            step = int(rng.integers(0, 20))
+            start, end = start + step, end + step
+        elif move < 0.8:
+            # Window length changes at one edge
+            start += int(rng.integers(-50, 50))
+            end += int(rng.integers(-50, 50))
+        else:
+            # Seek anywhere
+            end = int(rng.integers(1, len(df)))
+            start = end - int(rng.integers(1, 500))
+        end = min(max(end, 1), len(df))
+        start = min(max(start, 0), end - 1)
+
+        agg.update(df, epoch_ns, start, end)
+        expected = recompute(df, epoch_ns, start, end)
+        got = agg.means()
+        np.testing.assert_array_equal(got.index, expected.index)
+        np.testing.assert_allclose(got.to_numpy(), expected.to_numpy(), atol=1e-9)
+
+
+def test_slide_costs_only_the_edges(session):
+    df, epoch_ns = session
+    agg = WindowAggregator(COLUMNS)
+    agg.update(df, epoch_ns, 0, 300)
+    agg.update(df, epoch_ns, 3, 303)
+    assert agg.rebuilds == 1
+    assert agg.last_rows == 6
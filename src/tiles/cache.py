@@ -0,0 +1,176 @@
+import contextlib
+import heapq
+import os
+import sqlite3
+import threading
+import time
+
+TILE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "tiles")
+DEFAULT_MAX_MB = 512
+
+
+def cache_path(style, tile_dir=TILE_DIR):
+    return os.path.join(tile_dir, f"{style}.mbtiles")
+
+
+class CacheLimit:
+    # A byte limit shared by the caches of several styles: once their total
+    # grows past max_bytes, the least recently used tiles of any style are
+    # evicted, down to 90% of the limit so eviction does not run again on
+    # every following insert
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 2**20):
+        self.max_bytes = max_bytes
+        self.caches = []
+        self._lock = threading.Lock()
+
+    def size_bytes(self):
+        return sum(cache.size_bytes() for cache in self.caches)
+
+    def evict(self):
+        with self._lock, contextlib.ExitStack() as stack:
+            if self.size_bytes() <= self.max_bytes:
+                return
+            for cache in self.caches:
+                stack.enter_context(cache._lock)
+            excess = self.size_bytes() - (self.max_bytes - self.max_bytes // 10)
+            victims = [[] for _ in self.caches]
+            tiles = [cache._by_access(i) for i, cache in enumerate(self.caches)]
+            for _, i, key, size in heapq.merge(*tiles):
+                victims[i].append((key, size))
+                excess -= size
+                if excess <= 0:
+                    break
+            # Finish the reads before deleting through the same connections
+            for reader in tiles:
+                reader.close()
+            for cache, keys in zip(self.caches, victims, strict=True):
+                cache._delete(keys)
+
+
+def open_caches(styles, tile_dir=TILE_DIR, max_bytes=DEFAULT_MAX_MB * 2**20):
+    # The caches of several styles under one shared limit, by style
+    limit = CacheLimit(max_bytes)
+    return {
+        style: TileCache(cache_path(style, tile_dir), limit=limit) for style in styles
+    }
+
+
+class TileCache:
+    # One MBTiles file per map style. The standard `tiles` table holds the
+    # images (TMS row order, as the format requires); `tile_access` records
+    # size and last use of each tile so the least recently used tiles can be
+    # evicted once the cache (or all caches sharing its limit) grows past
+    # max_bytes.
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_MB * 2**20, name=None, limit=None):
+        self.path = path
+        self.limit = limit or CacheLimit(max_bytes)
+        self.limit.caches.append(self)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # The tile server answers requests from several threads
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS tiles (
+                    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER,
+                    tile_data BLOB,
+                    PRIMARY KEY (zoom_level, tile_column, tile_row)
+                );
+                CREATE TABLE IF NOT EXISTS tile_access (
+                    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER,
+                    size INTEGER, accessed REAL,
+                    PRIMARY KEY (zoom_level, tile_column, tile_row)
+                );
+                CREATE INDEX IF NOT EXISTS tile_access_lru ON tile_access (accessed);
+                """
+            )
+            self._db.execute(
+                "INSERT OR IGNORE INTO metadata VALUES ('name', ?), ('format', 'png')",
+                (name or os.path.splitext(os.path.basename(path))[0],),
+            )
+            # Running total of tile bytes, kept in step by put() and _evict()
+            self._bytes = self._db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM tile_access"
+            ).fetchone()[0]
+
+    @staticmethod
+    def _key(z, x, y):
+        # XYZ (slippy map) row -> TMS row
+        return z, x, (1 << z) - 1 - y
+
+    def get(self, z, x, y):
+        key = self._key(z, x, y)
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT tile_data FROM tiles"
+                " WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                key,
+            ).fetchone()
+            if row is not None:
+                self._db.execute(
+                    "UPDATE tile_access SET accessed=?"
+                    " WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                    (time.time(), *key),
+                )
+        return None if row is None else row[0]
+
+    def __contains__(self, zxy):
+        with self._lock:
+            return (
+                self._db.execute(
+                    "SELECT 1 FROM tiles"
+                    " WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                    self._key(*zxy),
+                ).fetchone()
+                is not None
+            )
+
+    def put(self, z, x, y, data):
+        key = self._key(z, x, y)
+        with self._lock, self._db:
+            old = self._db.execute(
+                "SELECT size FROM tile_access"
+                " WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                key,
+            ).fetchone()
+            self._bytes += len(data) - (old[0] if old else 0)
+            self._db.execute(
+                "INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", (*key, data)
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO tile_access VALUES (?, ?, ?, ?, ?)",
+                (*key, len(data), time.time()),
+            )
+        self.limit.evict()
+
+    def size_bytes(self):
+        return self._bytes
+
+    def _by_access(self, tag):
+        # (accessed, tag, key, size) of every tile, least recently used first
+        for z, x, y, size, accessed in self._db.execute(
+            "SELECT zoom_level, tile_column, tile_row, size, accessed FROM tile_access"
+            " ORDER BY accessed"
+        ):
+            yield accessed, tag, (z, x, y), size
+
+    def _delete(self, victims):
+        if not victims:
+            return
+        with self._db:
+            for table in ("tiles", "tile_access"):
+                self._db.executemany(
+                    f"DELETE FROM {table}"
+                    " WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                    [key for key, _ in victims],
+                )
+        self._bytes -= sum(size for _, size in victims)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
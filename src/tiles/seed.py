@@ -0,0 +1,122 @@
+import argparse
+import logging
+import math
+import os
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from data.batch import SESSIONS_DIR, bounding_box
+from data.catalog import read_catalog
+from data.data_cleaning import DATA_DIR
+from tiles.cache import DEFAULT_MAX_MB, TILE_DIR, open_caches
+from tiles.sources import TILE_SOURCES, upstream_url
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "side-slipper-tile-cache/1.0"
+# Public tile services do not allow bulk downloads; refuse large seeds unless
+# explicitly forced
+MAX_TILES = 5000
+
+
+def fetch_tile(style, z, x, y, timeout=10):
+    request = urllib.request.Request(
+        upstream_url(style, z, x, y), headers={"User-Agent": USER_AGENT}
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+def tile_xy(lat, lon, z):
+    # Web Mercator tile containing a point
+    n = 1 << z
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_r = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_r)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_for_bbox(bbox, zooms, margin=0.1):
+    # All tiles covering the box (grown by `margin` of its size on each side)
+    dlat = (bbox["lat_max"] - bbox["lat_min"]) * margin
+    dlon = (bbox["lon_max"] - bbox["lon_min"]) * margin
+    for z in zooms:
+        x0, y0 = tile_xy(bbox["lat_max"] + dlat, bbox["lon_min"] - dlon, z)
+        x1, y1 = tile_xy(bbox["lat_min"] - dlat, bbox["lon_max"] + dlon, z)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield z, x, y
+
+
+def seed(cache, style, bbox, zooms, workers=4, force=False):
+    # Download the missing tiles for bbox into the cache. Returns
+    # (tiles wanted, fetched, failed).
+    wanted = list(tiles_for_bbox(bbox, zooms))
+    if len(wanted) > MAX_TILES and not force:
+        raise ValueError(
+            f"{len(wanted)} tiles requested (limit {MAX_TILES}); "
+            "narrow the zoom range or pass --force"
+        )
+    missing = [zxy for zxy in wanted if zxy not in cache]
+
+    def fetch(zxy):
+        try:
+            cache.put(*zxy, fetch_tile(style, *zxy))
+            return True
+        except OSError as e:
+            logger.warning("Tile %s/%d/%d/%d failed: %s", style, *zxy, e)
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fetched = sum(pool.map(fetch, missing))
+    return len(wanted), fetched, len(missing) - fetched
+
+
+def parse_zooms(text):
+    # "12-17" or "15"
+    low, _, high = text.partition("-")
+    return range(int(low), int(high or low) + 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pre-fetch map tiles covering a session into the local cache"
+    )
+    parser.add_argument("--store", default=os.path.join(DATA_DIR, "merged_cleaned"))
+    parser.add_argument("--session", help="Session id from the batch catalog")
+    parser.add_argument("--style", default="Default", choices=list(TILE_SOURCES))
+    parser.add_argument("--zooms", type=parse_zooms, default=parse_zooms("12-17"))
+    parser.add_argument("--tile-dir", default=TILE_DIR)
+    parser.add_argument("--max-mb", type=int, default=DEFAULT_MAX_MB)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.session:
+        entry = next(
+            e for e in read_catalog(SESSIONS_DIR) if e["session_id"] == args.session
+        )
+        bbox = entry["bbox"]
+    else:
+        bbox = bounding_box(args.store)
+    if bbox is None:
+        raise SystemExit("The session has no base position fix to seed tiles for")
+
+    max_zoom = TILE_SOURCES[args.style]["max_zoom"]
+    zooms = range(args.zooms.start, min(args.zooms.stop, max_zoom + 1))
+    # The other styles are opened too: they share the --max-mb limit
+    caches = open_caches(TILE_SOURCES, args.tile_dir, args.max_mb * 2**20)
+    cache = caches[args.style]
+    wanted, fetched, failed = seed(
+        cache, args.style, bbox, zooms, workers=args.workers, force=args.force
+    )
+    logger.info(
+        "%d tiles for zooms %d-%d: %d fetched, %d failed, cache %.1f MB",
+        wanted,
+        zooms.start,
+        zooms.stop - 1,
+        fetched,
+        failed,
+        cache.size_bytes() / 2**20,
+    )
@@ -0,0 +1,97 @@
+import argparse
+import logging
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tiles.cache import DEFAULT_MAX_MB, TILE_DIR, open_caches
+from tiles.seed import fetch_tile
+from tiles.sources import TILE_SOURCES
+
+logger = logging.getLogger(__name__)
+
+TILE_PATH = re.compile(r"^/(\w+)/(\d+)/(\d+)/(\d+)(?:\.\w+)?$")
+
+
+def content_type(data):
+    return "image/jpeg" if data[:3] == b"\xff\xd8\xff" else "image/png"
+
+
+class TileServer(ThreadingHTTPServer):
+    # Serves /<style>/<z>/<x>/<y> from the tile cache. Misses are fetched
+    # upstream and stored (read-through) unless the server runs offline.
+    daemon_threads = True
+
+    def __init__(self, address, tile_dir=TILE_DIR, max_mb=DEFAULT_MAX_MB, online=True):
+        super().__init__(address, TileHandler)
+        self.online = online
+        # max_mb covers the caches of all styles together
+        self.caches = open_caches(TILE_SOURCES, tile_dir, max_mb * 2**20)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class TileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        match = TILE_PATH.match(self.path)
+        if not match or match.group(1) not in self.server.caches:
+            self.send_error(404)
+            return
+        style = match.group(1)
+        z, x, y = (int(v) for v in match.groups()[1:])
+
+        cache = self.server.caches[style]
+        data = cache.get(z, x, y)
+        if data is None and self.server.online:
+            try:
+                data = fetch_tile(style, z, x, y)
+                cache.put(z, x, y, data)
+            except OSError as e:
+                logger.warning("Tile %s/%d/%d/%d failed: %s", style, z, x, y, e)
+        if data is None:
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type(data))
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "public, max-age=86400")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def start_background(host="127.0.0.1", port=8765, **kwargs):
+    # Run a tile server on a daemon thread (used by the dashboard for
+    # SIDE_SLIPPER_TILE_SERVER=local); returns the server
+    server = TileServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve cached map tiles locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tile-dir", default=TILE_DIR)
+    parser.add_argument("--max-mb", type=int, default=DEFAULT_MAX_MB)
+    parser.add_argument(
+        "--offline", action="store_true", help="Never fetch missing tiles upstream"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    server = TileServer(
+        (args.host, args.port),
+        tile_dir=args.tile_dir,
+        max_mb=args.max_mb,
+        online=not args.offline,
+    )
+    logger.info("Serving tiles from %s at %s", args.tile_dir, server.url)
+    server.serve_forever()
@@ -0,0 +1,58 @@
+import os
+
+# Upstream tile services for each map style. "{s}" is a subdomain and "{r}"
+# the optional retina suffix, both filled in by Leaflet in the browser and by
+# upstream_url() when tiles are fetched for the local cache.
+TILE_SOURCES = {
+    "Default": {
+        "url": "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png",
+        "attr": "© OpenStreetMap contributors",
+        "name": "OpenStreetMap",
+        "max_zoom": 19,
+    },
+    "Streets": {
+        "url": "https://mt1.google.com/vt/lyrs=m&x={x}&y={y}&z={z}",
+        "attr": "Google",
+        "name": "Google Maps",
+        "max_zoom": 20,
+    },
+    "Satellite": {
+        "url": "https://mt1.google.com/vt/lyrs=s&x={x}&y={y}&z={z}",
+        "attr": "Google",
+        "name": "Google Satellite",
+        "max_zoom": 20,
+    },
+    "Terrain": {
+        "url": "https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png",
+        "attr": (
+            "Map data: © OpenStreetMap contributors, SRTM | "
+            "Map style: © OpenTopoMap (CC-BY-SA)"
+        ),
+        "name": "OpenTopoMap",
+        "max_zoom": 15,
+    },
+    "Dark": {
+        "url": "https://{s}.basemaps.cartocdn.com/dark_all/{z}/{x}/{y}{r}.png",
+        "attr": "© OpenStreetMap contributors © CARTO",
+        "name": "CARTO Dark",
+        "max_zoom": 16,
+    },
+}
+
+# Where the browser should load tiles from. Unset: straight from the upstream
+# services. "local": a tile server started inside the dashboard process.
+# Anything else: the base URL of a running `python -m tiles.server`.
+TILE_SERVER = os.environ.get("SIDE_SLIPPER_TILE_SERVER")
+# For "local": the address the server listens on and, for viewers on other
+# machines, the base URL their browsers reach it at (e.g. a reverse-proxied
+# path such as "/tiles"). By default tiles are only visible on this machine.
+TILE_HOST = os.environ.get("SIDE_SLIPPER_TILE_HOST", "127.0.0.1")
+TILE_PUBLIC_URL = os.environ.get("SIDE_SLIPPER_TILE_PUBLIC_URL")
+
+
+def upstream_url(style, z, x, y):
+    return TILE_SOURCES[style]["url"].format(s="a", r="", z=z, x=x, y=y)
+
+
+def local_url(server_url, style):
+    return f"{server_url.rstrip('/')}/{style}/{{z}}/{{x}}/{{y}}"